@@ -1,6 +1,15 @@
 import logging
 
 from ._evaluation import Evaluation
+from .execution import (
+    AdaptiveConcurrency,
+    CompletionCache,
+    LocalBatchSubmitter,
+    OpenAIBatchSubmitter,
+    RateLimiter,
+    RetryPolicy,
+    iter_rows,
+)
 from .model import TokenUsage
 from .post import frame_from_evals
 from .prep import OutputMode
@@ -1,11 +1,42 @@
+import asyncio
+import collections
+import contextlib
+import functools
+import inspect
+import itertools
 import json
 import logging
 import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Sequence
 
+from evaluation_instruments.execution import (
+    AdaptiveConcurrency,
+    BatchSubmitter,
+    CompletionCache,
+    DryRunReport,
+    LogSink,
+    RateLimiter,
+    RetryPolicy,
+    RunJournal,
+    TokenBudget,
+    batch_request,
+    count_prompt_tokens,
+    estimate_tokens,
+    is_rate_limit_error,
+    iter_rows,
+    journal_key,
+    read_batch_results,
+    read_response_log,
+)
 from evaluation_instruments.model import TokenUsage
+from evaluation_instruments.post import extract_json
+from evaluation_instruments.prep import parse_json
 
 logger = logging.getLogger("evaluation")
 
@@ -26,8 +57,9 @@ class Evaluation:
 
     The default post_process_fn assumes the OpenAI format, and will extract a response from
     response['choices'][0]['message']['content'] and attempt to parse it as its own json object.
-    It will also parse response['usage'] into a TokenUsage object which will be used to abort a run after the
-    first request exceeding the capacity specified (default 10_000 tokens).
+    It will also parse response['usage'] into a TokenUsage object. Before each request the estimated prompt and
+    completion tokens are reserved against the capacity specified (default 10_000 tokens), and the run stops
+    instead of starting a request that is projected to exceed it.
 
 
     Parameters
@@ -44,14 +76,36 @@ class Evaluation:
         token usage.
     log_enabled : bool, optional
         a flag when true will log raw responses from completion to tmp/, by default True
+        Responses are appended to rolling JSONL segments in evaluation_logs/ by a background thread.
     model_args : dict, optional
         a dictionary of additional kwargs to pass to the completion function, by default {}
     max_tokens : _type_, optional
         a capacity limit for an individual dataset evaluation, by default 10_000
-        will stop the evaluation loop after the first request exceeding this limit
+        will stop the evaluation loop before the first request projected to exceed this limit
     log_prefix : Optional[str], optional
         An optional prefix for the log directory within the temporary logging path, by default None.
         Useful for organizing logs from different evaluation runs.
+    cache : Optional[CompletionCache], optional
+        A persistent cache of raw completions keyed on (model, messages, model_args), by default None
+        Cached responses are passed through the post_fn but do not count toward usage or capacity.
+    checkpoint_dir : Optional[str | Path], optional
+        The directory holding the journals of runs started with a run_id, by default None
+        When not provided, journals are kept in evaluation_checkpoints/ within the temporary directory.
+    rate_limiter : Optional[RateLimiter], optional
+        Paces requests to requests-per-minute and tokens-per-minute quotas, by default None
+        The same limiter can be shared by several Evaluation objects that use one provider deployment.
+        Every attempt is paced, including the retries and hedged duplicates of the retry_policy.
+    retry_policy : Optional[RetryPolicy], optional
+        Retries, times out and hedges each request, by default None
+        When provided, rows whose request still fails are left out of the outputs and recorded in failures,
+        a dictionary of the exceptions keyed by sample index for the latest run, instead of being raised.
+    log_compression : Optional[str], optional
+        Compresses the segments of the response log with "gzip" or "zstd", by default None
+        zstd requires the zstandard package.
+    response_format : Optional[dict], optional
+        Constrains completions to a JSON schema, such as from the response_format of an instrument, by default None
+        It is forwarded in the model_args; with a "json_schema" or "json_object" response_format, whether passed
+        here or in the model_args, the default post_fn parses the content directly instead of scanning for braces.
     """
 
     def __init__(
@@ -63,6 +117,12 @@ class Evaluation:
         model_args: dict = {},
         max_tokens: int = 10_000,
         log_prefix: Optional[str] = None,
+        cache: Optional[CompletionCache] = None,
+        checkpoint_dir: Optional[str | Path] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        log_compression: Optional[str] = None,
+        response_format: Optional[dict] = None,
     ):
         self.prep_fn = prep_fn
         self.completion_fn = completion_fn
@@ -70,10 +130,22 @@ class Evaluation:
 
         self.log_enabled = log_enabled
         self._model_args = model_args or {}
+        if response_format is not None:
+            self._model_args = {**self._model_args, "response_format": response_format}
         self._log_prefix = log_prefix
-        
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.failures: dict = {}
+        self.invalid: dict = {}
+        self._checkpoint_dir = (
+            Path(checkpoint_dir) if checkpoint_dir else Path(tempfile.gettempdir()) / "evaluation_checkpoints"
+        )
 
         self.tmp_dir: Optional[Path] = None
+        self._tmp_dir_lock = threading.Lock()
+        self._log_compression = log_compression
+        self._log_sink: Optional[LogSink] = None
         self.capacity: TokenUsage = TokenUsage(None, None, max_tokens)
 
         logger.debug(f"Set up with {log_enabled=} and capacity {max_tokens}")
@@ -113,14 +185,89 @@ class Evaluation:
     def toggle_logging(self):
         self._log_enabled = not self._log_enabled
 
-    def run_dataset(self, df: "pd.DataFrame", model: str = None, capacity: int = None) -> tuple[dict, TokenUsage]:
+    @property
+    def structured_output(self) -> bool:
+        """Whether the model_args constrain completions to JSON through a response_format."""
+        response_format = self._model_args.get("response_format")
+        return isinstance(response_format, dict) and response_format.get("type") in STRUCTURED_OUTPUT_TYPES
+
+    def run_dataset(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str = None,
+        capacity: int = None,
+        workers: Optional[int | AdaptiveConcurrency] = None,
+        run_id: Optional[str] = None,
+    ) -> tuple[dict, TokenUsage]:
         """
         Run the evaluation on a dataset, returning a dictionary of responses and a TokenUsage object.
 
         Parameters
         ----------
-        df : pd.DataFrame
-            The dataset to evaluate, expected to be a DataFrame.
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, a DataFrame or any other source of rows accepted by iter_rows, such as a pyarrow
+            Table, an iterable of records or a chunked reader, which is iterated lazily.
+            Individual rows will be passed to the prep_fn in the evaluation loop.
+        model : str, optional
+            The model to use for evaluation, by default None
+            Passed as the first argument to the completion function.
+        capacity : int, optional
+            The maximum token capacity for the evaluation, by default None
+            If not provided, will use the default capacity set in the class.
+        workers : Optional[int], optional
+            When provided, rows are evaluated on a thread pool of this many workers, by default None
+            Intended for synchronous completion functions; prep_fn, completion_fn and post_fn must be thread-safe.
+            Rows that would exceed the capacity are not started, but rows already in flight are still collected.
+            An AdaptiveConcurrency controller instead varies the number of requests in flight, up to its maximum.
+        run_id : Optional[str], optional
+            When provided, each completed row is appended to a checkpoint journal named for the run, by default None
+            Calling again with the same run_id skips the journaled rows, restoring their responses and usage.
+        """
+        return _collect(self._iter_results(df, model, capacity, workers, run_id))
+
+    def iter_dataset(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str = None,
+        capacity: int = None,
+        workers: Optional[int | AdaptiveConcurrency] = None,
+        run_id: Optional[str] = None,
+    ) -> Iterator[tuple]:
+        """
+        Evaluate a dataset lazily, yielding (sample_ix, response, usage) as each row completes.
+
+        Accepts the same arguments as run_dataset. Responses are not retained, so memory stays flat regardless of
+        the size of the dataset. With workers, rows are yielded in the order they complete rather than row order.
+        Stopping iteration early stops dispatching new rows.
+
+        Yields
+        ------
+        tuple
+            The DataFrame index of the row, the parsed response, and the TokenUsage of the request.
+        """
+        for _, sample_ix, response, usage in self._iter_results(df, model, capacity, workers, run_id):
+            yield sample_ix, response, usage
+
+    async def arun_dataset(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str = None,
+        capacity: int = None,
+        max_concurrency: int | AdaptiveConcurrency = 8,
+        run_id: Optional[str] = None,
+    ) -> tuple[dict, TokenUsage]:
+        """
+        Run the evaluation on a dataset concurrently, keeping up to max_concurrency requests in flight.
+
+        Intended for awaitable completion functions such as litellm.acompletion; a synchronous completion_fn
+        is run on a worker thread so it does not block the event loop.
+        Outputs are keyed by the DataFrame index and ordered as the rows of the DataFrame, matching run_dataset.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, a DataFrame or any other source of rows accepted by iter_rows, such as a pyarrow
+            Table, an iterable of records or a chunked reader, which is iterated lazily.
             Individual rows will be passed to the prep_fn in the evaluation loop.
         model : str, optional
             The model to use for evaluation, by default None
@@ -128,87 +275,860 @@ class Evaluation:
         capacity : int, optional
             The maximum token capacity for the evaluation, by default None
             If not provided, will use the default capacity set in the class.
+            Requests that would exceed it are not started, but requests already in flight are still collected.
+        max_concurrency : int, optional
+            The maximum number of requests in flight at once, by default 8
+            An AdaptiveConcurrency controller instead varies the number of requests in flight, up to its maximum.
+        run_id : Optional[str], optional
+            When provided, each completed row is appended to a checkpoint journal named for the run, by default None
+            Calling again with the same run_id skips the journaled rows, restoring their responses and usage.
+        """
+        return _collect([item async for item in self._aiter_results(df, model, capacity, max_concurrency, run_id)])
+
+    async def aiter_dataset(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str = None,
+        capacity: int = None,
+        max_concurrency: int | AdaptiveConcurrency = 8,
+        run_id: Optional[str] = None,
+    ) -> AsyncIterator[tuple]:
+        """
+        Evaluate a dataset concurrently, yielding (sample_ix, response, usage) as each row completes.
+
+        Accepts the same arguments as arun_dataset. Rows are yielded in the order they complete, and responses
+        are not retained. Closing the generator early, such as with contextlib.aclosing, cancels the requests
+        still in flight.
+
+        Yields
+        ------
+        tuple
+            The DataFrame index of the row, the parsed response, and the TokenUsage of the request.
+        """
+        async for _, sample_ix, response, usage in self._aiter_results(df, model, capacity, max_concurrency, run_id):
+            yield sample_ix, response, usage
+
+    def write_batch(
+        self, df: "pd.DataFrame | Iterable", path: str | Path, model: str = None, capacity: int = None
+    ) -> int:
+        """
+        Render each row of a dataset as a request in an OpenAI-style batch input file.
+
+        Each line holds the prep_fn output as the messages, along with the model and model_args, and a custom_id
+        identifying the row by its DataFrame index. Writing stops before the first row projected to exceed the
+        capacity, as run_dataset does.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, a DataFrame or any other source of rows accepted by iter_rows.
+        path : str | Path
+            The batch input file to write.
+        model : str, optional
+            The model to use for evaluation, by default None
+        capacity : int, optional
+            The maximum token capacity for the evaluation, by default None
+            If not provided, will use the default capacity set in the class.
+
+        Returns
+        -------
+        int
+            The number of requests written.
+        """
+        return len(self._write_batch(df, path, model, capacity))
+
+    def _write_batch(self, df, path: str | Path, model: str, capacity: int) -> list:
+        """Writes the batch input file, returning the index of each row written in order."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
+        run = self._start_run(model, max_usage)
+        budget = run.budget
+        written = []
+        with open(path, "w", encoding="utf-8") as f:
+            for sample in self._admitted(iter_rows(df), run.invalid):
+                prompt = self.prep_fn(sample)
+                if budget.reserve(prompt) is None:
+                    logger.warning(f"Aborting batch. Projected usage exceeds capacity: {budget.capacity}")
+                    break
+
+                request = batch_request(sample.Index, model, prompt, self._model_args)
+                f.write(json.dumps(request, default=str) + "\n")
+                written.append(sample.Index)
+
+        logger.info(f"Wrote {len(written)} batch requests to {path}")
+        return written
+
+    def ingest_batch(self, path: str | Path) -> tuple[dict, TokenUsage]:
+        """
+        Parse an OpenAI-style batch output file through the post_fn, returning (outputs, usage) like run_dataset.
+
+        Outputs are keyed by the DataFrame index recovered from each custom_id, in the order of the file.
+        Requests that failed within the batch are left out of the outputs and recorded in failures.
+
+        Parameters
+        ----------
+        path : str | Path
+            The batch output file.
+        """
+        self.failures = {}
+        results = []
+        try:
+            for position, (sample_ix, raw_output, error) in enumerate(read_batch_results(path)):
+                if error is not None:
+                    logger.warning(f"{sample_ix}-Evaluation failed: {error!r}")
+                    self.failures[sample_ix] = error
+                    continue
+
+                response, usage = self._post_fn(sample_ix, raw_output)
+                results.append((position, sample_ix, response, TokenUsage(**usage)))
+        finally:
+            self._close_log_sink()
+
+        return _collect(results)
+
+    def replay_logs(
+        self, log_dir: Optional[str | Path] = None, df: "pd.DataFrame | Iterable" = None, workers: int = 4
+    ) -> tuple[dict, TokenUsage]:
+        """
+        Parse the raw responses of a response log through the post_fn, returning (outputs, usage) like run_dataset.
+
+        No requests are sent, so a run can be parsed again after changing the post_fn. The latest response logged
+        for each sample is used, read with read_response_log from either the segments written by the LogSink or the
+        one file per response written by earlier versions. Logging is paused while replaying, so the responses are
+        not logged a second time. As with ingest_batch, samples whose response fails to parse are left out of the
+        outputs and recorded in failures.
+
+        Parameters
+        ----------
+        log_dir : Optional[str | Path], optional
+            The response log directory, by default the tmp_dir of this evaluation
+        df : pd.DataFrame | Iterable, optional
+            When provided, only its rows are replayed and the outputs follow its row order, by default None
+            Without it the outputs follow the order responses were logged, keyed by the logged sample indices.
+        workers : int, optional
+            The number of threads reading log files, by default 4
+        """
+        log_dir = log_dir or self.tmp_dir
+        if log_dir is None:
+            raise ValueError("No log_dir provided and this evaluation has not logged any responses")
+        if Path(log_dir) == self.tmp_dir:
+            self.flush_logs()
+
+        positions = _logged_positions(df) if df is not None else None
+        self.failures = {}
+        results = []
+        log_enabled, self.log_enabled = self.log_enabled, False
+        try:
+            for position, (sample_ix, raw_output) in enumerate(read_response_log(log_dir, workers)):
+                if positions is not None:
+                    if (located := positions(sample_ix)) is None:
+                        continue
+                    position, sample_ix = located
+
+                try:
+                    response, usage = self._post_fn(sample_ix, raw_output)
+                except Exception as error:
+                    logger.warning(f"{sample_ix}-Replay failed: {error!r}")
+                    self.failures[sample_ix] = error
+                    continue
+                results.append((position, sample_ix, response, TokenUsage(**usage)))
+        finally:
+            self.log_enabled = log_enabled
+
+        logger.info(f"Replayed {len(results)} responses from {log_dir}")
+        return _collect(results)
+
+    def run_batch(
+        self,
+        df: "pd.DataFrame | Iterable",
+        submitter: BatchSubmitter,
+        model: str = None,
+        capacity: int = None,
+        batch_dir: Optional[str | Path] = None,
+        poll_interval: float = 60.0,
+    ) -> tuple[dict, TokenUsage]:
+        """
+        Run the evaluation on a dataset through a batch endpoint, returning the same results as run_dataset.
+
+        The rows are written with write_batch and sent with the submitter, which is polled until the batch has
+        finished before its output is parsed with ingest_batch. Batch endpoints trade latency for cost and
+        throughput, so this suits large evaluations that can wait for results.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, a DataFrame or any other source of rows accepted by iter_rows.
+        submitter : BatchSubmitter
+            Sends the batch to a provider and retrieves its output, such as OpenAIBatchSubmitter.
+            LocalBatchSubmitter runs the batch through a completion function instead.
+        model : str, optional
+            The model to use for evaluation, by default None
+        capacity : int, optional
+            The maximum token capacity for the evaluation, by default None
+        batch_dir : Optional[str | Path], optional
+            The directory for the batch input and output files, by default a new temporary directory
+        poll_interval : float, optional
+            The seconds between checks for the batch output, by default 60.0
         """
-        if df is None or len(df) == 0:
-            logger.warning("Empty DataFrame provided for evaluation.")
+        if (samples := _nonempty_rows(df)) is None:
+            return {}, TokenUsage(0, 0, 0)
+
+        batch_dir = Path(batch_dir) if batch_dir else Path(tempfile.mkdtemp(prefix="evaluation_batch_"))
+        input_path, output_path = batch_dir / "requests.jsonl", batch_dir / "results.jsonl"
+        if not (written := self._write_batch(samples, input_path, model, capacity)):
             return {}, TokenUsage(0, 0, 0)
 
-        tmp_dir = None
-        outputs = {}
+        batch_id = submitter.submit(input_path)
+        while not submitter.retrieve(batch_id, output_path):
+            logger.debug(f"Waiting for batch {batch_id}")
+            time.sleep(poll_interval)
+
+        outputs, usage = self.ingest_batch(output_path)
+        return {sample_ix: outputs[sample_ix] for sample_ix in written if sample_ix in outputs}, usage
+
+    def dry_run(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str = None,
+        capacity: int = None,
+        tokenizer: Optional[Callable[[Any], int]] = None,
+        processes: Optional[int] = None,
+        percentiles: Sequence[float] = (50, 90, 99, 100),
+    ) -> DryRunReport:
+        """
+        Project the usage of a run by resolving every prompt with the prep_fn, without calling the completion_fn.
+
+        Completions are projected at the max_completion_tokens or max_tokens of the model_args, or 0 without
+        either. Use the report to size the capacity and concurrency of the run and to find oversized prompts
+        before they are sent; a projection beyond the capacity is logged as a warning.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to evaluate, a DataFrame or any other source of rows accepted by iter_rows.
+        model : str, optional
+            The model the run would use, by default None
+        capacity : int, optional
+            The maximum token capacity to check the projection against, by default the capacity set in the class
+        tokenizer : Callable, optional
+            Counts the tokens of a message array, by default estimate_tokens at about four characters per token
+            Bind a model-specific counter, such as partial(litellm.token_counter, model), for an exact count.
+        processes : Optional[int], optional
+            When provided, prompts are resolved on a process pool of this many processes, by default None
+            The prep_fn and tokenizer must then be picklable, such as functions defined at the top level of a module.
+        percentiles : Sequence[float], optional
+            The percentiles of the usage of a single row to report, by default (50, 90, 99, 100)
+
+        Returns
+        -------
+        DryRunReport
+            The projected usage of each row, of the whole run, and of a row at each percentile.
+        """
+        self.invalid = {}
+        samples = self._admitted(_nonempty_rows(df) or iter(()), self.invalid)
+        prompt_tokens = dict(count_prompt_tokens(samples, self.prep_fn, tokenizer or estimate_tokens, processes))
+
+        completion_tokens = self._model_args.get("max_completion_tokens", self._model_args.get("max_tokens")) or 0
+        report = DryRunReport.from_prompt_tokens(prompt_tokens, completion_tokens, percentiles)
+
+        max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
+        logger.info(f"Projected usage of {len(report.rows)} rows for {model}: {report.total}")
+        if report.total > max_usage:
+            logger.warning(f"Projected usage exceeds capacity: {report.total} > {max_usage}")
+        return report
+
+    def _iter_results(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str,
+        capacity: int,
+        workers: Optional[int | AdaptiveConcurrency],
+        run_id: Optional[str],
+    ) -> Iterator[tuple]:
+        """Yields (position, sample_ix, response, usage) for each completed row, stopping at capacity."""
+        if (samples := _nonempty_rows(df)) is None:
+            return
+
+        concurrency = None
+        if isinstance(workers, AdaptiveConcurrency):
+            concurrency, workers = workers, workers.maximum
+        if workers is not None and workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+
+        max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
+        run = self._start_run(model, max_usage, run_id)
+        run.concurrency = concurrency
+        rows = enumerate(self._admitted(samples, run.invalid))
+
+        if workers is None:
+            results = self._iter_sequential(rows, run)
+        else:
+            results = self._iter_threaded(rows, run, workers)
+
         accumulated_usage = TokenUsage(0, 0, 0)
+        try:
+            for position, result in results:
+                if result is _SAMPLE_FAILED or self._check_refused(result, run):
+                    continue
+
+                sample_ix, response, usage = result
+                accumulated_usage += usage
+                yield position, sample_ix, response, usage
+
+                self._check_capacity(sample_ix, accumulated_usage, run)
+        finally:
+            results.close()
+            self._close_log_sink()
+
+    def validate(self, df: "pd.DataFrame | Iterable") -> dict:
+        """
+        Check every row of a dataset with the validation hooks of the prep_fn, without running the evaluation.
+
+        Prep functions reading files, such as those wrapped by prep.json_from_column, carry hooks checking that
+        the file of each row exists and has the required fields. The run methods skip the rows that fail them and
+        record them in invalid; this reports them up front.
+
+        Parameters
+        ----------
+        df : pd.DataFrame | Iterable
+            The dataset to check, a DataFrame or any other source of rows accepted by iter_rows.
+
+        Returns
+        -------
+        dict
+            The reason each invalid row fails, keyed by its index; empty when every row is valid or the prep_fn
+            has no validation hooks.
+        """
+        self.invalid = {}
+        for _ in self._admitted(iter_rows(df), self.invalid):
+            pass
+        return self.invalid
+
+    def _admitted(self, samples: Iterator, invalid: dict) -> Iterator:
+        """Yields the rows to prepare, checked by the hooks of the prep_fn and read ahead, recording the invalid."""
+        return self._checked(self._prefetching(self._validated(samples, invalid)), invalid)
+
+    def _validated(self, samples: Iterator, invalid: dict) -> Iterator:
+        """
+        Checks rows with the validation hook of the prep_fn a chunk at a time, leaving out and recording the invalid.
+
+        Checking a chunk at once lets the hook list directories in bulk; a DataFrame smaller than a chunk is checked
+        in full before its first row is prepared, so the hook should not read the rows, see _checked.
+        """
+        validate = getattr(self.prep_fn, "validate", None)
+        if not (inspect.isfunction(validate) or inspect.ismethod(validate)):
+            yield from samples
+            return
+
+        while chunk := list(itertools.islice(samples, VALIDATION_CHUNK)):
+            failed = validate(chunk)
+            if failed:
+                invalid.update(failed)
+                examples = "; ".join(f"{sample_ix}: {reason}" for sample_ix, reason in list(failed.items())[:3])
+                logger.warning(f"Skipping {len(failed)} invalid rows of {len(chunk)}, such as {examples}")
+            yield from (sample for sample in chunk if sample.Index not in failed)
+
+    def _checked(self, samples: Iterator, invalid: dict) -> Iterator:
+        """
+        Checks each row with the check hook of the prep_fn just before it is prepared, leaving out and recording the
+        invalid.
+
+        The hook may read the row, such as the required fields of its file, so it follows the prefetch of the row and
+        the prep_fn finds the file it loads already read.
+        """
+        check = getattr(self.prep_fn, "check", None)
+        if not (inspect.isfunction(check) or inspect.ismethod(check)):
+            yield from samples
+            return
+
+        for sample in samples:
+            if (reason := check(sample)) is None:
+                yield sample
+                continue
+            invalid[sample.Index] = reason
+            logger.warning(f"{sample.Index}-Skipping invalid row: {reason}")
+
+    def _prefetching(self, samples: Iterator) -> Iterator:
+        """
+        Passes each row to the prefetch hook of the prep_fn readahead rows before it is prepared.
+
+        Prep functions reading files, such as those wrapped by prep.json_from_column, carry the hook so the reads
+        overlap with the completions in flight.
+        """
+        prefetch = getattr(self.prep_fn, "prefetch", None)
+        readahead = getattr(self.prep_fn, "readahead", 0)
+        if not callable(prefetch) or not isinstance(readahead, int) or readahead < 1:
+            yield from samples
+            return
+
+        window = collections.deque()
+        for sample in samples:
+            prefetch(sample)
+            window.append(sample)
+            if len(window) > readahead:
+                yield window.popleft()
+        yield from window
+
+    def _iter_sequential(self, rows: Iterator, run: "_RunContext") -> Iterator[tuple]:
+        """Evaluates rows one at a time on the calling thread."""
+        for position, sample in rows:
+            if run.aborted:
+                break
+            yield position, self._evaluate_sample(sample, run)
+
+    def _iter_threaded(self, rows: Iterator, run: "_RunContext", workers: int) -> Iterator[tuple]:
+        """
+        Evaluates rows on a thread pool, keeping at most workers rows in flight.
+
+        Results are handed back to the calling thread as they complete, so the accumulated usage and outputs are
+        never shared with the workers.
+        """
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluation") as executor:
+            while True:
+                # Only submit as many rows as there are workers so an abort leaves little in flight
+                while not run.aborted and len(pending) < workers:
+                    position, sample = next(rows, (None, None))
+                    if sample is None:
+                        break
+                    pending[executor.submit(self._evaluate_sample, sample, run)] = position
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position = pending.pop(future)
+                    yield position, future.result()
+
+    async def _aiter_results(
+        self,
+        df: "pd.DataFrame | Iterable",
+        model: str,
+        capacity: int,
+        max_concurrency: int | AdaptiveConcurrency,
+        run_id: Optional[str],
+    ) -> AsyncIterator[tuple]:
+        """The awaitable counterpart of _iter_results, evaluating rows on max_concurrency worker tasks."""
+        if (samples := _nonempty_rows(df)) is None:
+            return
+
+        concurrency = None
+        if isinstance(max_concurrency, AdaptiveConcurrency):
+            concurrency, max_concurrency = max_concurrency, max_concurrency.maximum
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+
         max_usage = self.capacity if not capacity else TokenUsage(None, None, capacity)
+        run = self._start_run(model, max_usage, run_id)
+        run.concurrency = concurrency
+        rows = enumerate(self._admitted(samples, run.invalid))
+        queue = asyncio.Queue(maxsize=max_concurrency)
+
+        async def worker():
+            # Workers share the row iterator; each pulls the next row once its previous request completes
+            try:
+                for position, sample in rows:
+                    if run.aborted:
+                        break
+                    result = await self._aevaluate_sample(sample, run)
+                    await queue.put((position, result))
+                    if result is None:  # refused by the budget
+                        break
+            except Exception as error:
+                await queue.put(error)
+                return
+            await queue.put(_WORKER_DONE)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+        accumulated_usage = TokenUsage(0, 0, 0)
+        try:
+            running = len(tasks)
+            while running:
+                item = await queue.get()
+                if item is _WORKER_DONE:
+                    running -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+
+                position, result = item
+                if result is _SAMPLE_FAILED or self._check_refused(result, run):
+                    continue
+
+                sample_ix, response, usage = result
+                accumulated_usage += usage
+                yield position, sample_ix, response, usage
+
+                self._check_capacity(sample_ix, accumulated_usage, run)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._close_log_sink()
+
+    @staticmethod
+    def _check_refused(result: Optional[tuple], run: "_RunContext") -> bool:
+        """Stops dispatching when the budget refuses a request, returning True if the result was refused."""
+        if result is not None:
+            return False
 
-        for sample in df.itertuples():
-            sample_ix = sample.Index
+        if not run.aborted:
+            logger.warning(f"Aborting run. Projected usage exceeds capacity: {run.budget.capacity}")
+        run.aborted = True
+        return True
 
-            # Resolve prompt
-            prompt = self.prep_fn(sample)
+    @staticmethod
+    def _check_capacity(sample_ix, accumulated_usage: TokenUsage, run: "_RunContext"):
+        """Stops dispatching when the actual usage has gone beyond capacity."""
+        if not run.aborted and accumulated_usage > run.budget.capacity:
+            logger.warning(
+                f"Aborting run after {sample_ix}. Capacity exceeded: {accumulated_usage} > {run.budget.capacity}"
+            )
+            run.aborted = True
 
-            # Delegate
-            raw_output = self.completion_fn(model=model, messages=prompt, **self._model_args)
+    def _start_run(self, model: str, max_usage: TokenUsage, run_id: Optional[str] = None) -> "_RunContext":
+        """
+        Creates the state for a single run.
+
+        The budget guesses completions at the requested max tokens until observed. When resuming a run_id,
+        the journaled usage is committed to the budget up front so the capacity covers the whole run.
+        """
+        completion_tokens = self._model_args.get("max_completion_tokens", self._model_args.get("max_tokens"))
+        run = _RunContext(model=model, budget=TokenBudget(max_usage, completion_tokens=completion_tokens))
+        self.failures = run.failures
+        self.invalid = run.invalid
+
+        if run_id is not None:
+            run.journal = RunJournal(self._checkpoint_dir / f"{run_id}.jsonl")
+            run.restored = run.journal.load()
+            if run.restored:
+                logger.info(f"Resuming run {run_id} with {len(run.restored)} completed samples")
+            for _, usage in run.restored.values():
+                run.budget.commit(usage)
+
+        return run
+
+    def _evaluate_sample(self, sample, run: "_RunContext") -> Optional[tuple]:
+        """
+        Runs a single row through prep_fn, completion_fn and post_fn, returning (sample_ix, response, usage).
+
+        Returns None without calling the completion_fn if the budget refuses the request, and _SAMPLE_FAILED if the
+        request failed under the retry_policy.
+        """
+        sample_ix = sample.Index
+        if (restored := self._restore_sample(sample_ix, run)) is not None:
+            return restored
+
+        model, budget = run.model, run.budget
+
+        # Resolve prompt
+        prompt = self.prep_fn(sample)
+
+        cache_key, cached = self._lookup_cache(model, prompt)
+        if cached is not None:
+            return self._post_cached(sample_ix, cached, run)
 
+        reservation = budget.reserve(prompt)
+        if reservation is None:
+            return None
+
+        # Delegate
+        try:
+            try:
+                raw_output = self._request(model, prompt, run, budget.reserved(reservation).total_tokens)
+            except Exception as error:
+                if self.retry_policy is None:
+                    raise
+                budget.release(reservation)
+                return self._fail_sample(sample_ix, error, run)
+            self._store_cache(cache_key, raw_output)
             response, usage = self._post_fn(sample_ix, raw_output)
-            accumulated_usage += TokenUsage(**usage)
+        except BaseException:
+            budget.release(reservation)
+            raise
 
-            outputs[sample_ix] = response
-            logger.debug(f"{sample_ix}-Completed evaluation")
+        return self._settle_sample(sample_ix, response, TokenUsage(**usage), reservation, run)
 
-            # abort if beyond capacity
-            if accumulated_usage > max_usage:
-                logger.warning(f"Aborting run after {sample_ix}. Capacity exceeded: {accumulated_usage} > {max_usage}")
-                break
+    async def _aevaluate_sample(self, sample, run: "_RunContext") -> Optional[tuple]:
+        """The awaitable counterpart of _evaluate_sample."""
+        sample_ix = sample.Index
+        if (restored := self._restore_sample(sample_ix, run)) is not None:
+            return restored
+
+        model, budget = run.model, run.budget
+
+        prompt = self.prep_fn(sample)
+
+        cache_key, cached = self._lookup_cache(model, prompt)
+        if cached is not None:
+            return self._post_cached(sample_ix, cached, run)
+
+        reservation = budget.reserve(prompt)
+        if reservation is None:
+            return None
+
+        try:
+            try:
+                raw_output = await self._arequest(model, prompt, run, budget.reserved(reservation).total_tokens)
+            except Exception as error:
+                if self.retry_policy is None:
+                    raise
+                budget.release(reservation)
+                return self._fail_sample(sample_ix, error, run)
+            self._store_cache(cache_key, raw_output)
+            response, usage = self._post_fn(sample_ix, raw_output)
+        except BaseException:
+            budget.release(reservation)
+            raise
+
+        return self._settle_sample(sample_ix, response, TokenUsage(**usage), reservation, run)
+
+    def _request(self, model: str, prompt, run: "_RunContext", tokens: int):
+        """
+        Sends the prompt to the completion_fn, through the retry_policy when set.
+
+        Each attempt, including retries and hedged duplicates, is admitted by the rate_limiter with the estimated
+        tokens of the request. A throttled attempt is refunded its tokens, as the provider rejected it unprocessed.
+        """
+
+        def admit():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(tokens)
+
+        def attempt():
+            with self._refund_throttled(tokens), self._track_request(run):
+                return self.completion_fn(model=model, messages=prompt, **self._model_args)
+
+        if self.retry_policy is None:
+            admit()
+            return attempt()
+        return self.retry_policy.call(attempt, admit=admit)
 
-        if self.tmp_dir is not None:
-            logger.info(f"Dumped raw content to {tmp_dir}")
+    async def _arequest(self, model: str, prompt, run: "_RunContext", tokens: int):
+        """The awaitable counterpart of _request."""
 
-        return outputs, accumulated_usage
+        async def admit():
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(tokens)
+
+        async def attempt():
+            with self._refund_throttled(tokens):
+                async with self._atrack_request(run):
+                    return await self._acomplete(model=model, messages=prompt, **self._model_args)
+
+        if self.retry_policy is None:
+            await admit()
+            return await attempt()
+        return await self.retry_policy.acall(attempt, admit=admit)
+
+    @contextlib.contextmanager
+    def _refund_throttled(self, tokens: int):
+        """Returns the tokens of an attempt failing with a rate-limit error to the rate_limiter."""
+        try:
+            yield
+        except Exception as error:
+            if self.rate_limiter is not None and is_rate_limit_error(error):
+                self.rate_limiter.record(tokens, 0)
+            raise
+
+    @contextlib.contextmanager
+    def _track_request(self, run: "_RunContext"):
+        """Holds a slot of the adaptive concurrency window for a request, reporting its latency and throttling."""
+        if run.concurrency is None:
+            yield
+            return
+
+        run.concurrency.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as error:
+            if is_rate_limit_error(error):
+                run.concurrency.record(time.monotonic() - start, throttled=True)
+            raise
+        else:
+            run.concurrency.record(time.monotonic() - start)
+        finally:
+            run.concurrency.release()
+
+    @contextlib.asynccontextmanager
+    async def _atrack_request(self, run: "_RunContext"):
+        """The awaitable counterpart of _track_request."""
+        if run.concurrency is None:
+            yield
+            return
+
+        await run.concurrency.aacquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as error:
+            if is_rate_limit_error(error):
+                run.concurrency.record(time.monotonic() - start, throttled=True)
+            raise
+        else:
+            run.concurrency.record(time.monotonic() - start)
+        finally:
+            run.concurrency.release()
+
+    def _settle_sample(self, sample_ix, response, usage: TokenUsage, reservation: int, run: "_RunContext") -> tuple:
+        """
+        Reconciles the estimated usage of a completed request with its actual usage.
+
+        The rate_limiter is corrected for the attempt whose response was used; failed attempts and the losers of a
+        hedge keep their estimated tokens, as their usage is not known.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.record(run.budget.reserved(reservation).total_tokens, usage.total_tokens)
+        run.budget.reconcile(reservation, usage)
+
+        return self._complete_sample(sample_ix, response, usage, run)
+
+    def _restore_sample(self, sample_ix, run: "_RunContext") -> Optional[tuple]:
+        """
+        Returns the journaled (sample_ix, response, usage) of a row completed by a previous run, if any.
+
+        A post_fn with a restore hook, such as one wrapped by post.validated, rebuilds the response from its journaled
+        fields, so restored rows have the same type as the rows evaluated by this run.
+        """
+        if not run.restored:
+            return None
+
+        entry = run.restored.get(journal_key(sample_ix))
+        if entry is None:
+            return None
+
+        logger.debug(f"{sample_ix}-Restored evaluation from checkpoint")
+        response, usage = entry
+        if (restore := getattr(self.post_fn, "restore", None)) is not None:
+            response = restore(sample_ix, response)
+        return sample_ix, response, usage
+
+    def _complete_sample(self, sample_ix, response, usage: TokenUsage, run: "_RunContext") -> tuple:
+        """Journals a completed row when checkpointing."""
+        if run.journal is not None:
+            run.journal.append(sample_ix, response, usage)
+        logger.debug(f"{sample_ix}-Completed evaluation")
+
+        return sample_ix, response, usage
+
+    def _fail_sample(self, sample_ix, error: Exception, run: "_RunContext"):
+        """Records a row whose request failed despite the retry_policy, leaving it out of the outputs."""
+        logger.warning(f"{sample_ix}-Evaluation failed: {error!r}")
+        run.failures[sample_ix] = error
+
+        return _SAMPLE_FAILED
+
+    def _lookup_cache(self, model: str, prompt) -> tuple[Optional[str], Optional[dict]]:
+        """Returns the cache key for the request and the cached raw output, if any."""
+        if self.cache is None:
+            return None, None
+
+        cache_key = self.cache.key(model, prompt, self._model_args)
+        return cache_key, self.cache.get(cache_key)
+
+    def _store_cache(self, cache_key: Optional[str], raw_output):
+        if cache_key is not None:
+            self.cache.put(cache_key, raw_output)
+
+    def _post_cached(self, sample_ix, cached, run: "_RunContext") -> tuple:
+        """Parses a cached raw output; no tokens were spent so usage is zero."""
+        response, _ = self._post_fn(sample_ix, cached)
+        logger.debug(f"{sample_ix}-Served evaluation from cache")
+
+        return self._complete_sample(sample_ix, response, TokenUsage(0, 0, 0), run)
+
+    async def _acomplete(self, **kwargs):
+        """Awaits the completion_fn, delegating synchronous functions to a worker thread."""
+        if _is_async_callable(self.completion_fn):
+            return await self.completion_fn(**kwargs)
+
+        raw_output = await asyncio.to_thread(self.completion_fn, **kwargs)
+        if inspect.isawaitable(raw_output):
+            raw_output = await raw_output
+        return raw_output
 
     def _dump_to_temp(self, sample_ix, raw_content) -> Optional[Path]:
         """
-        Dumps the raw content to a file in a temporary directory, if logging is enabled.
+        Queues the raw content to the response log in a temporary directory, if logging is enabled.
+
+        Responses are appended to rolling JSONL segments by a LogSink on a background thread, so logging does not
+        block the evaluation loop. Runs close the sink before returning, finishing its segment; after dumping
+        directly, call flush_logs to write the queued responses or close to also finish the segment.
 
         Parameters
         ----------
         sample_ix :
             the index from the dataset frame
         raw_content :
-            the content to be dumped; attempts to serialize as json if dict, otherwise writes as text
+            the content to be dumped; serialized as json if dict, otherwise written as text
 
         Returns
         -------
         Path
-            the temporary directory where the file was dumped
+            the temporary directory holding the log
         """
 
         if not self.log_enabled:
             return None
 
-        datestamp = datetime.now().strftime("%Y%m%d-%Hh")  # Generate a timestamp in the format YYYYMMDD-hhmm
+        if self._log_sink is None:
+            # Workers may race to create the directory; only the first one sets it
+            with self._tmp_dir_lock:
+                if self._log_sink is None:
+                    # Later runs keep appending to the directory of the first one
+                    tmp_dir = self.tmp_dir or self._log_directory()
+                    self._log_sink = LogSink(tmp_dir, compression=self._log_compression)
+                    self.tmp_dir = tmp_dir
+
+        self._log_sink.write(sample_ix, raw_content)
+        return self.tmp_dir
+
+    def flush_logs(self):
+        """Waits until the queued raw responses have been written to the response log."""
+        if self._log_sink is not None:
+            self._log_sink.flush()
+
+    def close(self):
+        """
+        Writes the queued raw responses and stops the background thread of the response log.
+
+        The current segment is finished and listed in index.jsonl. Runs close the log themselves before returning,
+        so this is only needed after calling post_process_default or _dump_to_temp directly. The evaluation can
+        still be run afterwards, appending new segments to the same directory.
+        """
+        self._close_log_sink()
+
+    def __enter__(self):
+        return self
 
-        if self.tmp_dir is None:
-            log_base_dir = Path(tempfile.gettempdir()) / "evaluation_logs"
-            if self._log_prefix:
-                tmp_dir = log_base_dir / f"{self._log_prefix}_{datestamp}"
-            else:
-                tmp_dir = log_base_dir / f"{datestamp}"
-            tmp_dir.mkdir(parents=True, exist_ok=True)
-            self.tmp_dir = tmp_dir
+    def __exit__(self, *exc_info):
+        self.close()
 
-        timestamp = datetime.now().strftime("%H%M%S")  # Generate a timestamp in the format hhmmss
-        filepath = self.tmp_dir / f"{sample_ix}_raw_{timestamp}.json"
+    def _close_log_sink(self):
+        with self._tmp_dir_lock:
+            log_sink, self._log_sink = self._log_sink, None
+        if log_sink is not None:
+            log_sink.close()
+            logger.info(f"Dumped raw content to {self.tmp_dir}")
 
-        with open(filepath, "w") as f:
-            # Write the raw content to the file
-            if isinstance(raw_content, dict):
-                json.dump(raw_content, f)
-            else:
-                f.write(str(raw_content))
+    def _log_directory(self) -> Path:
+        datestamp = datetime.now().strftime("%Y%m%d-%Hh")  # Generate a timestamp in the format YYYYMMDD-hh
+        log_base_dir = Path(tempfile.gettempdir()) / "evaluation_logs"
+        if self._log_prefix:
+            return log_base_dir / f"{self._log_prefix}_{datestamp}"
+        return log_base_dir / f"{datestamp}"
 
     def post_process_default(self, sample_ix, openai_json: dict) -> tuple[dict, TokenUsage]:
         """
         The default post-processing function, assuming OpenAI responses of choices plus a usage node.
 
-        This function will extract the first choice's message content and parse it as JSON.
+        This function will extract the first choice's message content and parse the JSON object within it with
+        extract_json, which tolerates code fences, surrounding prose and stray braces. When the model_args hold a
+        structured output response_format, the content is parsed directly as it can only be the JSON object.
         It will also extract the usage information from the response.
 
         Parameters
@@ -235,7 +1155,9 @@ class Evaluation:
 
         try:
             raw_content = openai_json["choices"][ix]["message"]["content"]
-            response = json.loads(raw_content[raw_content.find("{") : raw_content.rfind("}") + 1])  # noqa: E203
+            response = parse_json(raw_content) if self.structured_output else extract_json(raw_content)
+            if not isinstance(response, dict):
+                raise ValueError("The response content is not a JSON object")
         except Exception:
             logger.info(f"Failed to parse {sample_ix} response content as JSON.")
             response = {}
@@ -246,4 +1168,74 @@ class Evaluation:
         return response, usage
 
 
+@dataclass
+class _RunContext:
+    """State shared by the rows of a single run."""
+
+    model: Optional[str]
+    budget: TokenBudget
+    journal: Optional[RunJournal] = None
+    restored: dict = field(default_factory=dict)
+    aborted: bool = False
+    concurrency: Optional[AdaptiveConcurrency] = None
+    failures: dict = field(default_factory=dict)
+    invalid: dict = field(default_factory=dict)
+
+
+# The response_format types that constrain the message content to a single JSON object
+STRUCTURED_OUTPUT_TYPES = ("json_schema", "json_object")
+
+# The rows checked at once by the validation hook of the prep_fn
+VALIDATION_CHUNK = 10_000
+
+_WORKER_DONE = object()
+_SAMPLE_FAILED = object()
+
+
+def _nonempty_rows(df) -> Optional[Iterator]:
+    """Iterates the rows of a dataset with iter_rows, or warns and returns None if it has no rows."""
+    rows = iter_rows(df)
+    if (first := next(rows, None)) is None:
+        logger.warning("Empty DataFrame provided for evaluation.")
+        return None
+    return itertools.chain([first], rows)
+
+
+def _logged_positions(df) -> Callable[[Any], Optional[tuple]]:
+    """
+    Maps the sample indices found in a response log to the (position, index) of the rows of a dataset.
+
+    Segments keep indices as JSON, matched through journal_key, while legacy file names only hold their text.
+    """
+    by_key, by_name = {}, {}
+    for position, sample in enumerate(iter_rows(df)):
+        by_key.setdefault(journal_key(sample.Index), (position, sample.Index))
+        by_name.setdefault(str(sample.Index), (position, sample.Index))
+
+    def locate(sample_ix) -> Optional[tuple]:
+        located = by_key.get(journal_key(sample_ix))
+        return located if located is not None else by_name.get(str(sample_ix))
+
+    return locate
+
+
+def _collect(results) -> tuple[dict, TokenUsage]:
+    """Gathers (position, sample_ix, response, usage) results into outputs in row order and their total usage."""
+    completed = {}
+    accumulated_usage = TokenUsage(0, 0, 0)
+    for position, sample_ix, response, usage in results:
+        completed[position] = (sample_ix, response)
+        accumulated_usage += usage
+
+    outputs = {sample_ix: response for _, (sample_ix, response) in sorted(completed.items())}
+    return outputs, accumulated_usage
+
+
+def _is_async_callable(fn) -> bool:
+    """Checks if calling fn returns an awaitable, unwrapping partials and callable objects."""
+    while isinstance(fn, functools.partial):
+        fn = fn.func
+    return inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, "__call__", None))
+
+
 __all__ = ["Evaluation"]
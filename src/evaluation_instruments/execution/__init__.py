@@ -0,0 +1,11 @@
+from ._batch import BatchSubmitter, LocalBatchSubmitter, OpenAIBatchSubmitter, batch_request, read_batch_results
+from ._budget import TokenBudget, estimate_tokens
+from ._cache import CompletionCache
+from ._checkpoint import RunJournal, journal_key
+from ._concurrency import AdaptiveConcurrency, is_rate_limit_error
+from ._dry_run import DryRunReport, count_prompt_tokens
+from ._log_sink import LogSink
+from ._rate_limit import RateLimiter
+from ._replay import read_response_log
+from ._retry import RetryPolicy, is_retryable_error
+from ._rows import iter_rows
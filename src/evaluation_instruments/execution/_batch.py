@@ -0,0 +1,178 @@
+import json
+import logging
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from ._cache import _serialize
+from ._checkpoint import journal_key
+
+logger = logging.getLogger("evaluation")
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+def batch_request(sample_ix: Any, model: str, messages, model_args: dict) -> dict:
+    """Builds one line of an OpenAI-style batch input file, identifying the row by its custom_id."""
+    return {
+        "custom_id": journal_key(sample_ix),
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": {"model": model, "messages": messages, **model_args},
+    }
+
+
+def read_batch_results(path: str | Path) -> Iterator[tuple[Any, Optional[dict], Optional[Exception]]]:
+    """
+    Reads an OpenAI-style batch output file.
+
+    Yields
+    ------
+    tuple
+        The sample index decoded from the custom_id, the response body if the request succeeded, and an
+        exception describing the failure otherwise.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            entry = json.loads(line)
+            sample_ix = _decode_custom_id(entry["custom_id"])
+            response = entry.get("response") or {}
+
+            if entry.get("error"):
+                error = entry["error"]
+                yield sample_ix, None, RuntimeError(f"{error.get('code')}: {error.get('message')}")
+            elif response.get("status_code", 200) != 200:
+                yield sample_ix, None, RuntimeError(f"Batch request failed with status {response['status_code']}")
+            else:
+                yield sample_ix, response["body"], None
+
+
+def _decode_custom_id(custom_id: str) -> Any:
+    """Reverses journal_key, keeping custom_ids written by other tools as they are."""
+    try:
+        sample_ix = json.loads(custom_id)
+    except json.JSONDecodeError:
+        return custom_id
+    return tuple(sample_ix) if isinstance(sample_ix, list) else sample_ix
+
+
+class BatchSubmitter:
+    """
+    The interface for sending a batch input file to a provider and fetching its results.
+
+    Subclasses implement submit, which starts a batch and returns its id, and retrieve, which writes the output
+    file once the batch has finished.
+    """
+
+    def submit(self, input_path: Path) -> str:
+        """Starts a batch from the input file, returning the batch id."""
+        raise NotImplementedError
+
+    def retrieve(self, batch_id: str, output_path: Path) -> bool:
+        """
+        Writes the output file of a finished batch to output_path.
+
+        Returns
+        -------
+        bool
+            True once the output has been written, False while the batch is still running.
+        """
+        raise NotImplementedError
+
+
+class LocalBatchSubmitter(BatchSubmitter):
+    """
+    Runs a batch input file through a completion function on submit, standing in for a batch endpoint.
+
+    Useful for tests and for checking a batch file before sending it to a provider. Errors raised by the
+    completion function are written as failed entries of the output file.
+
+    Parameters
+    ----------
+    completion_fn : callable
+        The completion function called with model, messages and the rest of each request body.
+    output_dir : Optional[str | Path], optional
+        The directory holding output files until retrieved, by default a new temporary directory
+    """
+
+    def __init__(self, completion_fn: Callable, output_dir: Optional[str | Path] = None):
+        self.completion_fn = completion_fn
+        self.output_dir = Path(output_dir) if output_dir else Path(tempfile.mkdtemp(prefix="evaluation_batch_"))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+
+        with open(input_path, "r", encoding="utf-8") as requests, open(
+            self._output_path(batch_id), "w", encoding="utf-8"
+        ) as results:
+            for line in requests:
+                if line.strip():
+                    results.write(json.dumps(self._complete(json.loads(line))) + "\n")
+
+        logger.debug(f"Completed local batch {batch_id}")
+        return batch_id
+
+    def retrieve(self, batch_id: str, output_path: Path) -> bool:
+        shutil.copyfile(self._output_path(batch_id), output_path)
+        return True
+
+    def _complete(self, request: dict) -> dict:
+        body = dict(request["body"])
+        entry = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"]}
+        try:
+            raw_output = self.completion_fn(model=body.pop("model"), messages=body.pop("messages"), **body)
+        except Exception as error:
+            return {**entry, "response": None, "error": {"code": type(error).__name__, "message": str(error)}}
+
+        return {**entry, "response": {"status_code": 200, "body": json.loads(_serialize(raw_output))}, "error": None}
+
+    def _output_path(self, batch_id: str) -> Path:
+        return self.output_dir / f"{batch_id}_output.jsonl"
+
+
+class OpenAIBatchSubmitter(BatchSubmitter):
+    """
+    Sends batch input files to the OpenAI Batch API.
+
+    Parameters
+    ----------
+    client : openai.OpenAI
+        The client used to upload files and manage batches.
+    completion_window : str, optional
+        The window within which the batch should complete, by default "24h"
+    """
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_path: Path) -> str:
+        with open(input_path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id, endpoint=CHAT_COMPLETIONS_URL, completion_window=self.completion_window
+        )
+        logger.info(f"Submitted batch {batch.id}")
+        return batch.id
+
+    def retrieve(self, batch_id: str, output_path: Path) -> bool:
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} ended with status {batch.status}")
+        if batch.status != "completed":
+            return False
+
+        # Failed requests are reported in a separate error file with the same line format
+        with open(output_path, "wb") as f:
+            for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+                if file_id:
+                    content = self.client.files.content(file_id).content
+                    f.write(content if content.endswith(b"\n") else content + b"\n")
+        return True
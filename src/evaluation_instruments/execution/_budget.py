@@ -0,0 +1,175 @@
+import logging
+import math
+import threading
+from typing import Any, Callable, Optional
+
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(messages: Any) -> int:
+    """
+    Estimates the number of prompt tokens in a message array by character count.
+
+    This is a fast approximation of roughly four characters per token for English text, and does not
+    account for any per-message overhead of a specific provider.
+
+    Parameters
+    ----------
+    messages : Any
+        A LiteLLM style message array, a string, or any object whose string form is sent to the model.
+
+    Returns
+    -------
+    int
+        The estimated number of tokens.
+    """
+    if isinstance(messages, str):
+        n_chars = len(messages)
+    elif isinstance(messages, list):
+        n_chars = 0
+        for message in messages:
+            content = message.get("content", "") if isinstance(message, dict) else message
+            if isinstance(content, list):  # content parts, ex. [{"type": "text", "text": ...}]
+                n_chars += sum(
+                    len(part.get("text", "")) if isinstance(part, dict) else len(str(part)) for part in content
+                )
+            else:
+                n_chars += len(str(content))
+    else:
+        n_chars = len(str(messages))
+
+    return math.ceil(n_chars / CHARS_PER_TOKEN)
+
+
+class TokenBudget:
+    """
+    A ledger that reserves the estimated cost of a request before it is dispatched.
+
+    Each request reserves an estimate of its prompt tokens plus the expected completion tokens, and the
+    reservation is reconciled against the actual usage once the response is parsed. A reservation that would
+    take the committed plus outstanding usage beyond the capacity is refused, and all later reservations are
+    refused as well so that a run stops dispatching rather than skipping rows.
+
+    The expected completion tokens start at completion_tokens and then follow the mean of the observed
+    completions.
+
+    Parameters
+    ----------
+    capacity : TokenUsage
+        The token capacity for the run; any None attribute is unbounded.
+    estimator : Callable, optional
+        A function mapping a message array to a number of prompt tokens, by default estimate_tokens
+    completion_tokens : int, optional
+        The expected completion tokens before any response has been observed, by default 0
+    """
+
+    def __init__(self, capacity: TokenUsage, estimator: Callable = None, completion_tokens: Optional[int] = None):
+        self.capacity = capacity
+        self._estimator = estimator or estimate_tokens
+        self._initial_completion_tokens = completion_tokens or 0
+
+        self._lock = threading.Lock()
+        self._committed = TokenUsage(0, 0, 0)
+        self._reservations: dict[int, TokenUsage] = {}
+        self._next_id = 0
+        self._completion_total = 0
+        self._completion_count = 0
+        self._exhausted = False
+
+    @property
+    def committed(self) -> TokenUsage:
+        """The actual usage of all reconciled requests."""
+        return self._committed
+
+    @property
+    def outstanding(self) -> TokenUsage:
+        """The estimated usage of all requests that are reserved but not yet reconciled."""
+        with self._lock:
+            return self._outstanding()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether a reservation has been refused, or the committed usage has exceeded the capacity."""
+        return self._exhausted
+
+    def estimate(self, messages: Any) -> TokenUsage:
+        """Estimates the usage of a request for the given messages."""
+        prompt_tokens = self._estimator(messages)
+        if self._completion_count:
+            completion_tokens = math.ceil(self._completion_total / self._completion_count)
+        else:
+            completion_tokens = self._initial_completion_tokens
+
+        return TokenUsage(prompt_tokens, completion_tokens)
+
+    def reserve(self, messages: Any) -> Optional[int]:
+        """
+        Reserves the estimated usage for a request, returning a reservation id or None if refused.
+
+        Parameters
+        ----------
+        messages : Any
+            The message array that will be sent to the model.
+
+        Returns
+        -------
+        Optional[int]
+            An id to pass to reconcile or release, or None when the request would exceed the capacity.
+        """
+        estimate = self.estimate(messages)
+
+        with self._lock:
+            if self._exhausted:
+                return None
+
+            projected = self._committed + self._outstanding() + estimate
+            if projected > self.capacity:
+                logger.info(f"Refusing request. Projected usage exceeds capacity: {projected} > {self.capacity}")
+                self._exhausted = True
+                return None
+
+            reservation = self._next_id
+            self._next_id += 1
+            self._reservations[reservation] = estimate
+
+        return reservation
+
+    def reserved(self, reservation: int) -> Optional[TokenUsage]:
+        """The estimated usage held by an outstanding reservation."""
+        with self._lock:
+            return self._reservations.get(reservation)
+
+    def reconcile(self, reservation: int, usage: TokenUsage):
+        """Replaces a reservation with the actual usage of the completed request."""
+        with self._lock:
+            self._reservations.pop(reservation, None)
+            self._commit(usage)
+
+    def commit(self, usage: TokenUsage):
+        """Commits usage that was spent outside of a reservation, such as by an earlier attempt at the run."""
+        with self._lock:
+            self._commit(usage)
+
+    def release(self, reservation: int):
+        """Drops a reservation without committing usage, such as when the request failed."""
+        with self._lock:
+            self._reservations.pop(reservation, None)
+
+    def _commit(self, usage: TokenUsage):
+        self._committed += usage
+        if usage.completion_tokens is not None:
+            self._completion_total += usage.completion_tokens
+            self._completion_count += 1
+
+        if self._committed > self.capacity:
+            self._exhausted = True
+
+    def _outstanding(self) -> TokenUsage:
+        outstanding = TokenUsage(0, 0, 0)
+        for estimate in self._reservations.values():
+            outstanding += estimate
+        return outstanding
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger("evaluation")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed);
+"""
+
+
+class CompletionCache:
+    """
+    A persistent, content-addressed cache of raw completion responses backed by SQLite.
+
+    Entries are keyed on a hash of the model, message array and model kwargs, so identical requests are served
+    from disk. Responses are stored as JSON; provider response objects are converted as in the default
+    post-processing. When the stored responses exceed max_bytes, the least recently used entries are evicted.
+
+    The cache can be shared by multiple Evaluation objects and worker threads.
+
+    Parameters
+    ----------
+    path : str | Path, optional
+        The SQLite database file, by default evaluation_cache/completions.sqlite in the temporary directory
+    max_bytes : int, optional
+        The maximum total size of stored responses, by default 1 GiB
+    """
+
+    def __init__(self, path: Optional[str | Path] = None, max_bytes: int = 1 << 30):
+        if path is None:
+            path = Path(tempfile.gettempdir()) / "evaluation_cache" / "completions.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: Optional[str], messages: Any, model_args: Optional[dict] = None) -> str:
+        """Hashes a request into its cache key."""
+        request = {"model": model, "messages": messages, "model_args": model_args or {}}
+        serialized = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached response for the key, or None if not present."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return row[0]
+
+    def put(self, key: str, raw_output: Any):
+        """Stores a raw completion response, evicting least recently used entries beyond max_bytes."""
+        value = _serialize(raw_output)
+        size = len(value.encode("utf-8"))
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._size += size - (previous[0] if previous else 0)
+            self._evict()
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """The total size in bytes of the stored responses."""
+        return self._size
+
+    def close(self):
+        self._conn.close()
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY accessed").fetchall():
+            if self._size <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._size -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} cached completions")
+
+
+def _serialize(raw_output: Any) -> str:
+    """Converts a completion response to JSON text, accepting provider response objects."""
+    try:  # Many providers have their own response objects, try to convert
+        raw_output = raw_output.json()
+    except AttributeError:
+        pass
+
+    if isinstance(raw_output, str):
+        return raw_output
+    return json.dumps(raw_output, default=str)
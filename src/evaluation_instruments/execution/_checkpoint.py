@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from evaluation_instruments.model import TokenUsage
+
+logger = logging.getLogger("evaluation")
+
+
+def journal_key(sample_ix: Any) -> str:
+    """Normalizes a DataFrame index value to the key used in the journal."""
+    return json.dumps(sample_ix, default=_to_serializable)
+
+
+class RunJournal:
+    """
+    An append-only journal of completed samples, used to checkpoint and resume a run.
+
+    Each completed sample is appended as a JSON line of {"sample_ix", "response", "usage"} and flushed to disk
+    before the next one, so a run that dies loses at most the line being written. A partially written final
+    line is ignored when the journal is loaded.
+
+    Parameters
+    ----------
+    path : str | Path
+        The journal file, created along with its parent directories if needed.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str, tuple[Any, TokenUsage]]:
+        """
+        Reads the journal, returning the response and usage of each completed sample keyed by journal_key.
+
+        If a sample was journaled more than once, the latest entry is kept.
+        """
+        completed = {}
+        if not self.path.is_file():
+            return completed
+
+        with self.path.open("r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring unreadable line {line_no} of checkpoint {self.path}")
+                    continue
+                completed[journal_key(entry["sample_ix"])] = (entry["response"], TokenUsage(**entry["usage"]))
+
+        return completed
+
+    def append(self, sample_ix: Any, response: Any, usage: TokenUsage):
+        """Durably records a completed sample."""
+        line = json.dumps(
+            {
+                "sample_ix": sample_ix,
+                "response": response,
+                "usage": {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens,
+                    "cached_tokens": usage.cached_tokens,
+                },
+            },
+            default=_to_serializable,
+        )
+
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """Deletes the journal so the next run starts over."""
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+
+
+def _to_serializable(value: Any) -> Any:
+    """Converts numpy scalars, pydantic records and other values that json can't serialize directly."""
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
@@ -0,0 +1,227 @@
+import asyncio
+import collections
+import logging
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger("evaluation")
+
+# The successful requests observed before latency spikes are detected
+MIN_LATENCIES = 10
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Checks if an exception raised by a completion function signals throttling, such as an HTTP 429."""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status == 429:
+        return True
+    return any("ratelimit" in cls.__name__.lower() for cls in type(error).__mro__)
+
+
+class AdaptiveConcurrency:
+    """
+    An AIMD controller for the number of requests kept in flight.
+
+    The limit grows additively, by increase after each full window of successful requests, while latency stays
+    within latency_tolerance times the baseline latency. It shrinks multiplicatively by decrease on a rate-limit
+    error or a latency spike, at most once per cooldown so that a burst of failures from the same congestion
+    only counts once.
+
+    The baseline is a high percentile of the latencies of the last latency_window successful requests, so the
+    spread of ordinary latencies, such as longer completions taking longer, stays within it. A spike is
+    spike_requests consecutive requests slower than latency_tolerance times the baseline; a single slow request
+    is not taken as congestion.
+
+    The controller also acts as the in-flight window: acquire or aacquire before sending a request, and
+    release after it completes. Every change of the limit is appended to history as (seconds since start, limit).
+
+    Parameters
+    ----------
+    initial : int, optional
+        The starting limit, by default 4
+    minimum : int, optional
+        The smallest limit, by default 1
+    maximum : int, optional
+        The largest limit, and the number of workers used by the thread-pool mode, by default 64
+    increase : int, optional
+        The additive increase per window of successes, by default 1
+    decrease : float, optional
+        The multiplicative factor applied on throttling, by default 0.5
+    latency_tolerance : float, optional
+        The multiple of the baseline latency above which a request is slow, by default 2.0
+    latency_percentile : float, optional
+        The percentile of recent latencies taken as the baseline, by default 90
+    latency_window : int, optional
+        The number of recent successful requests the baseline is taken over, by default 100
+    spike_requests : int, optional
+        The consecutive slow requests treated as a latency spike, by default 3
+    cooldown : Optional[float], optional
+        Seconds after a decrease during which further signals do not decrease again, by default the baseline latency
+    clock : Callable, optional
+        The monotonic clock in seconds, by default time.monotonic
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: int = 1,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_percentile: float = 90,
+        latency_window: int = 100,
+        spike_requests: int = 3,
+        cooldown: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError(f"Expected 1 <= minimum <= initial <= maximum, got {minimum}, {initial}, {maximum}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"decrease must be between 0 and 1, got {decrease}")
+        if not 0 < latency_percentile <= 100:
+            raise ValueError(f"latency_percentile must be between 0 and 100, got {latency_percentile}")
+        if latency_window < 1:
+            raise ValueError(f"latency_window must be at least 1, got {latency_window}")
+        if spike_requests < 1:
+            raise ValueError(f"spike_requests must be at least 1, got {spike_requests}")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.latency_percentile = latency_percentile
+        self.spike_requests = spike_requests
+        self.cooldown = cooldown
+
+        self._clock = clock
+        self._start = clock()
+        self._condition = threading.Condition()
+        self._waiters: list[asyncio.Future] = []
+        self._limit = initial
+        self._in_flight = 0
+        self._successes = 0
+        self._latencies: collections.deque = collections.deque(maxlen=latency_window)
+        self._baseline: Optional[float] = None
+        self._pending: list[float] = []
+        self._last_decrease: Optional[float] = None
+
+        self.history: list[tuple[float, int]] = [(0.0, initial)]
+
+    @property
+    def limit(self) -> int:
+        """The current number of requests allowed in flight."""
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def baseline_latency(self) -> Optional[float]:
+        return self._baseline
+
+    def try_acquire(self) -> bool:
+        """Takes a slot in the window if one is free."""
+        with self._condition:
+            if self._in_flight >= self._limit:
+                return False
+            self._in_flight += 1
+            return True
+
+    def acquire(self):
+        """Blocks until a slot in the window is free, then takes it."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    async def aacquire(self):
+        """Waits without blocking the event loop until a slot in the window is free, then takes it."""
+        while not self.try_acquire():
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            with self._condition:
+                self._waiters.append(waiter)
+            # A slot may have been released before the waiter was registered
+            if self._in_flight < self._limit:
+                self._wake(waiter)
+            await waiter
+
+    def release(self):
+        """Returns a slot to the window."""
+        with self._condition:
+            self._in_flight -= 1
+            self._notify()
+
+    def record(self, latency: float, throttled: bool = False):
+        """
+        Updates the limit from the outcome of a completed request.
+
+        Parameters
+        ----------
+        latency : float
+            The seconds the request took.
+        throttled : bool, optional
+            Whether the request failed with a rate-limit error, by default False
+        """
+        with self._condition:
+            if throttled:
+                self._decrease("throttled")
+                return
+
+            # Slow latencies join the baseline once the run of slow requests ends, so they cannot mask it
+            self._pending.append(latency)
+            if self._baseline is not None and latency > self.latency_tolerance * self._baseline:
+                if len(self._pending) >= self.spike_requests:
+                    self._observe()
+                    self._decrease(f"latency spike of {self.spike_requests} requests, the last {latency:.2f}s")
+                return
+            self._observe()
+
+            self._successes += 1
+            if self._successes >= self._limit:
+                self._successes = 0
+                self._set_limit(self._limit + self.increase)
+
+    def _observe(self):
+        """Adds the latencies of the pending successful requests to the recent latencies and updates the baseline."""
+        self._latencies.extend(self._pending)
+        self._pending = []
+        if len(self._latencies) < min(MIN_LATENCIES, self._latencies.maxlen):
+            return
+        ordered = sorted(self._latencies)
+        self._baseline = ordered[max(0, math.ceil(self.latency_percentile / 100 * len(ordered)) - 1)]
+
+    def _decrease(self, reason: str):
+        now = self._clock()
+        cooldown = self.cooldown if self.cooldown is not None else (self._baseline or 0.0)
+        if self._last_decrease is not None and now - self._last_decrease < cooldown:
+            return
+
+        self._last_decrease = now
+        self._successes = 0
+        logger.debug(f"Reducing concurrency from {self._limit}: {reason}")
+        self._set_limit(int(self._limit * self.decrease))
+
+    def _set_limit(self, limit: int):
+        limit = max(self.minimum, min(self.maximum, limit))
+        if limit == self._limit:
+            return
+
+        self._limit = limit
+        self.history.append((self._clock() - self._start, limit))
+        self._notify()
+
+    def _notify(self):
+        self._condition.notify_all()
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            self._wake(waiter)
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future):
+        loop = waiter.get_loop()
+        loop.call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(None))
@@ -0,0 +1,105 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+from evaluation_instruments.model import TokenUsage
+
+from ._rows import _row_type
+
+
+@dataclass
+class DryRunReport:
+    """
+    The projected usage of a run, from rendering every prompt without calling the completion function.
+
+    Attributes
+    ----------
+    rows : dict
+        The projected TokenUsage of each row, keyed by its index.
+    total : TokenUsage
+        The projected usage of the whole run.
+    percentiles : dict
+        The projected TokenUsage of a single row at each requested percentile, such as {50: ..., 99: ...}.
+    """
+
+    rows: dict = field(default_factory=dict)
+    total: TokenUsage = field(default_factory=lambda: TokenUsage(0, 0, 0))
+    percentiles: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_prompt_tokens(
+        cls, prompt_tokens: dict, completion_tokens: int, percentiles: Sequence[float] = (50, 90, 99, 100)
+    ) -> "DryRunReport":
+        """
+        Projects the usage of each row from its prompt tokens and the expected completion tokens.
+
+        Percentiles are taken by nearest rank over the rows, so the 100th percentile is the largest row.
+        """
+        rows = {
+            sample_ix: TokenUsage(tokens, completion_tokens, tokens + completion_tokens)
+            for sample_ix, tokens in prompt_tokens.items()
+        }
+        total = TokenUsage(0, 0, 0)
+        for usage in rows.values():
+            total += usage
+
+        ordered = sorted(rows.values(), key=lambda usage: usage.prompt_tokens)
+        report = {}
+        for percentile in percentiles if ordered else ():
+            if not 0 <= percentile <= 100:
+                raise ValueError(f"percentiles must be between 0 and 100, got {percentile}")
+            report[percentile] = ordered[min(len(ordered) - 1, int(percentile / 100 * len(ordered)))]
+
+        return cls(rows=rows, total=total, percentiles=report)
+
+
+def count_prompt_tokens(
+    rows: Iterator,
+    prep_fn: Callable,
+    tokenizer: Callable[[Any], int],
+    processes: Optional[int] = None,
+    chunksize: int = 64,
+) -> Iterator[tuple[Any, int]]:
+    """
+    Yields (sample_ix, prompt_tokens) for each row, rendering its prompt with prep_fn.
+
+    With processes, rows are sent to a process pool in chunks of chunksize, keeping a few chunks per process in
+    flight so that a large dataset is not read into memory at once. The prep_fn and tokenizer must then be
+    picklable, such as functions defined at the top level of a module.
+    """
+    if processes is None:
+        for sample in rows:
+            yield sample.Index, tokenizer(prep_fn(sample))
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Chunks are collected in the order they were sent, keeping the rows in order
+        pending = collections.deque()
+        chunks = _chunked(rows, chunksize)
+        while True:
+            while len(pending) < 2 * processes and (chunk := next(chunks, None)) is not None:
+                pending.append(executor.submit(_count_chunk, chunk, prep_fn, tokenizer))
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+
+def _chunked(rows: Iterator, chunksize: int) -> Iterator[list]:
+    """Groups rows into lists of picklable (fields, values) pairs, as the namedtuple types of rows may not be."""
+    chunk = []
+    for sample in rows:
+        chunk.append((sample._fields[1:], tuple(sample)))
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _count_chunk(chunk: list, prep_fn: Callable, tokenizer: Callable[[Any], int]) -> list[tuple[Any, int]]:
+    counts = []
+    for fields, values in chunk:
+        sample = _row_type(fields)(*values)
+        counts.append((sample.Index, tokenizer(prep_fn(sample))))
+    return counts
@@ -0,0 +1,224 @@
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+from ._checkpoint import _to_serializable
+
+logger = logging.getLogger("evaluation")
+
+SEGMENT_PREFIX = "responses-"
+INDEX_NAME = "index.jsonl"
+COMPRESSION_SUFFIXES = {None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class LogSink:
+    """
+    Appends raw responses to rolling JSONL segments from a background thread.
+
+    write only queues the response, so logging costs the evaluation loop almost nothing; the background thread
+    serializes queued responses in batches and appends them to the current segment, starting a new segment once
+    it holds segment_bytes of JSON. Each line holds {"sample_ix", "logged", "response"}, where logged is the
+    epoch time the response was queued.
+
+    Segments are named responses-{number}-{sink id}, numbered on from the segments already in the directory, so a
+    reused directory is appended to, and tagged with an id unique to the sink, so sinks sharing a directory, such as
+    those of concurrent evaluations logging in the same hour, never write to the same segment.
+
+    When a segment is finished, a line describing it is appended to index.jsonl in the same directory, with the
+    segment name, its number of entries and the sample indices it holds in order.
+
+    Parameters
+    ----------
+    directory : str | Path
+        The directory holding the segments, created if needed.
+    compression : Optional[str], optional
+        None, "gzip", or "zstd" which requires the zstandard package, by default None
+    segment_bytes : int, optional
+        The uncompressed size after which a new segment is started, by default 64 MiB
+    """
+
+    def __init__(self, directory: str | Path, compression: Optional[str] = None, segment_bytes: int = 64 * 2**20):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"compression must be one of {list(COMPRESSION_SUFFIXES)}, got {compression!r}")
+        if compression == "zstd":
+            _import_zstandard()
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.segment_bytes = segment_bytes
+
+        self._queue = queue.SimpleQueue()
+        self._sink_id = uuid.uuid4().hex[:8]
+        self._segment_number = self._next_segment_number()
+        self._file = None
+        self._segment_entries: list = []
+        self._segment_size = 0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="evaluation-log-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, sample_ix: Any, raw_content: Any):
+        """Queues a raw response to be appended; dictionaries are written as JSON and anything else as text."""
+        if self._closed:
+            raise RuntimeError("Cannot write to a closed LogSink")
+        self._queue.put((sample_ix, time.time(), raw_content))
+
+    def flush(self):
+        """Waits until every queued response has been written and flushed to disk."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+        self._raise_error()
+
+    def close(self):
+        """Writes the queued responses, finishes the current segment and stops the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        self._raise_error()
+
+    @property
+    def segments(self) -> list[Path]:
+        """The segment files written so far by this sink, in order."""
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*-{self._sink_id}.*"), key=_segment_number)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is queued so it is written in one pass
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                stop = self._write_batch(batch)
+            except BaseException as error:  # keep draining so flush and close do not wait forever
+                logger.error(f"Failed to write response logs to {self.directory}: {error!r}")
+                self._error = error
+                stop = any(item is _CLOSE for item in batch)
+                for item in batch:
+                    if isinstance(item, tuple) and item[0] is _FLUSH:
+                        item[1].set()
+            if stop:
+                return
+
+    def _write_batch(self, batch: list) -> bool:
+        """Writes a batch of queued items, returning True once the sink is closed."""
+        for item in batch:
+            if item is _CLOSE:
+                self._finish_segment()
+                return True
+            if item[0] is _FLUSH:
+                if self._file is not None:
+                    self._file.flush()
+                item[1].set()
+                continue
+
+            sample_ix, logged, raw_content = item
+            response = raw_content if isinstance(raw_content, dict) else str(raw_content)
+            entry = {"sample_ix": sample_ix, "logged": logged, "response": response}
+            self._append(sample_ix, json.dumps(entry, default=_to_serializable).encode("utf-8") + b"\n")
+
+        if self._file is not None:
+            self._file.flush()
+        return False
+
+    def _append(self, sample_ix: Any, line: bytes):
+        if self._file is None:
+            self._file = self._open_segment()
+        self._file.write(line)
+        self._segment_entries.append(sample_ix)
+        self._segment_size += len(line)
+
+        if self._segment_size >= self.segment_bytes:
+            self._finish_segment()
+
+    def _open_segment(self):
+        path = self._segment_path()
+        if self.compression == "gzip":
+            return gzip.open(path, "ab")
+        if self.compression == "zstd":
+            zstandard = _import_zstandard()
+            return _ZstdSegment(path, zstandard)
+        return open(path, "ab")
+
+    def _finish_segment(self):
+        if self._file is None:
+            return
+
+        self._file.close()
+        entry = {"segment": self._segment_path().name, "entries": len(self._segment_entries)}
+        entry["sample_ix"] = self._segment_entries
+        # One unbuffered append, so the lines of sinks sharing the index are not interleaved
+        with open(self.directory / INDEX_NAME, "ab", buffering=0) as index:
+            index.write((json.dumps(entry, default=_to_serializable) + "\n").encode("utf-8"))
+
+        self._file = None
+        self._segment_entries = []
+        self._segment_size = 0
+        self._segment_number += 1
+
+    def _segment_path(self) -> Path:
+        name = f"{SEGMENT_PREFIX}{self._segment_number:05d}-{self._sink_id}{COMPRESSION_SUFFIXES[self.compression]}"
+        return self.directory / name
+
+    def _next_segment_number(self) -> int:
+        """Continues after the segments already in the directory, so a reused directory is appended to."""
+        numbers = [_segment_number(path) for path in self.directory.glob(f"{SEGMENT_PREFIX}*")]
+        return max(numbers, default=-1) + 1
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+def _segment_number(path: Path) -> int:
+    """The number of a segment, from names such as responses-00003-1f2e3d4c.jsonl or responses-00003.jsonl."""
+    return int(path.name[len(SEGMENT_PREFIX) :].split(".")[0].split("-")[0])  # noqa: E203
+
+
+class _ZstdSegment:
+    """A zstd compressed segment, flushed a block at a time so partially written segments stay readable."""
+
+    def __init__(self, path: Path, zstandard):
+        self._zstandard = zstandard
+        self._raw = open(path, "ab")
+        self._writer = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+
+    def write(self, data: bytes):
+        self._writer.write(data)
+
+    def flush(self):
+        self._writer.flush(self._zstandard.FLUSH_BLOCK)
+        self._raw.flush()
+
+    def close(self):
+        self._writer.close()
+        self._raw.close()
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("zstd compression of response logs requires the zstandard package") from error
+    return zstandard
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger("evaluation")
+
+
+class _Bucket:
+    """A token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._updated = now
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available; amounts beyond the capacity only wait for a full bucket."""
+        deficit = min(amount, self.capacity) - self.level
+        return max(0.0, deficit / self._rate)
+
+
+class RateLimiter:
+    """
+    Paces requests to requests-per-minute and tokens-per-minute quotas using token buckets.
+
+    Before each request, acquire waits until the request bucket holds one request and the token bucket holds the
+    estimated tokens, then debits both. Once the response is parsed, record corrects the token bucket by the
+    difference between the estimate and the actual usage.
+
+    A single RateLimiter can be shared by several Evaluation objects and worker threads so that they respect
+    the same provider deployment quota together. Each bucket starts full, allowing a burst of up to one minute
+    of quota.
+
+    Parameters
+    ----------
+    requests_per_minute : Optional[float], optional
+        The request quota, by default None for unlimited
+    tokens_per_minute : Optional[float], optional
+        The token quota, by default None for unlimited
+    clock : Callable, optional
+        The monotonic clock in seconds, by default time.monotonic
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        for name, value in (("requests_per_minute", requests_per_minute), ("tokens_per_minute", tokens_per_minute)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive, got {value}")
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._requests = _Bucket(requests_per_minute, now) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute, now) if tokens_per_minute else None
+
+        self.waited: float = 0.0
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        Debits one request and the estimated tokens if available.
+
+        Parameters
+        ----------
+        tokens : int, optional
+            The estimated tokens of the request, by default 0
+
+        Returns
+        -------
+        float
+            0 if the request was admitted, otherwise the seconds to wait before trying again.
+        """
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+
+            if wait > 0:
+                return wait
+
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0):
+        """Blocks until a request with the estimated tokens can be sent within the quotas."""
+        while (wait := self.try_acquire(tokens)) > 0:
+            self._record_wait(wait)
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        """Waits without blocking the event loop until a request can be sent within the quotas."""
+        while (wait := self.try_acquire(tokens)) > 0:
+            self._record_wait(wait)
+            await asyncio.sleep(wait)
+
+    def record(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrects the token bucket once the actual usage of an admitted request is known."""
+        if self._tokens is None or actual_tokens is None:
+            return
+
+        with self._lock:
+            # The level may go negative, delaying later requests until the overdraw is repaid
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated_tokens - actual_tokens)
+
+    def _record_wait(self, wait: float):
+        with self._lock:
+            self.waited += wait
+        logger.debug(f"Rate limited, waiting {wait:.2f}s")
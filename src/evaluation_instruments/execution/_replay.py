@@ -0,0 +1,238 @@
+import collections
+import json
+import logging
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from ._log_sink import INDEX_NAME, SEGMENT_PREFIX, _segment_number
+
+logger = logging.getLogger("evaluation")
+
+# Responses logged one file per sample before segments, such as 12_raw_093015.json
+LEGACY_PATTERN = re.compile(r"^(?P<sample_ix>.+)_raw_(?P<timestamp>\d{6})\.json$")
+
+# The legacy files read by a single task, as they are small
+LEGACY_CHUNK = 64
+
+_READ_SIZE = 2**20
+
+
+def read_response_log(directory: str | Path, workers: int = 4) -> Iterator[tuple[Any, Any]]:
+    """
+    Yields (sample_ix, raw_response) for the latest response logged for each sample in a response log directory.
+
+    Both layouts are read: the rolling segments written by LogSink, which may be compressed or still being written,
+    and the {sample_ix}_raw_{hhmmss}.json files written one per response by earlier versions. When a sample was
+    logged more than once, only its latest response is yielded, taken from the order of the segments or, for
+    legacy files, from the timestamp in their name.
+
+    Files are read and decoded on a thread pool of workers, keeping a few tasks per worker in flight, and responses
+    are yielded in the order they were logged without reading the whole directory into memory.
+
+    Parameters
+    ----------
+    directory : str | Path
+        The response log directory, such as Evaluation.tmp_dir.
+    workers : int, optional
+        The number of threads reading files, by default 4
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise FileNotFoundError(f"No response log directory at {directory}")
+
+    legacy, segments = _scan(directory)
+    if legacy and segments:
+        logger.debug(f"Reading {len(legacy)} legacy files alongside {len(segments)} segments in {directory}")
+
+    # Legacy responses are superseded by any response for the same sample in a segment
+    selected = _select_segment_lines(directory, segments, workers)
+    superseded = {sample_ix for lines in selected.values() for sample_ix in lines.values()}
+    legacy = [(sample_ix, path) for sample_ix, path in legacy if sample_ix not in superseded]
+
+    tasks = [
+        (_read_legacy, legacy[start : start + LEGACY_CHUNK])  # noqa: E203
+        for start in range(0, len(legacy), LEGACY_CHUNK)
+    ]
+    tasks += [(_read_segment, (path, selected[path.name])) for path in segments if selected[path.name]]
+    yield from _ordered(tasks, workers)
+
+
+def _scan(directory: Path) -> tuple[list[tuple[Any, Path]], list[Path]]:
+    """Lists the latest legacy file of each sample, in the order they were logged, and the segments in order."""
+    latest, segments = {}, []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(SEGMENT_PREFIX):
+                segments.append(Path(entry.path))
+            elif (match := LEGACY_PATTERN.match(entry.name)) is not None:
+                sample_ix = _decode_logged_ix(match["sample_ix"])
+                if sample_ix not in latest or match["timestamp"] > latest[sample_ix][0]:
+                    latest[sample_ix] = (match["timestamp"], Path(entry.path))
+
+    legacy = [(sample_ix, path) for sample_ix, (_, path) in sorted(latest.items(), key=lambda item: item[1][0])]
+    return legacy, sorted(segments, key=_segment_order)
+
+
+def _select_segment_lines(directory: Path, segments: list[Path], workers: int) -> dict[str, dict[int, Any]]:
+    """
+    Finds the line holding the latest response of each sample, as {segment name: {line number: sample_ix}}.
+
+    Finished segments are described by the index, so only segments missing from it, such as the one a running
+    evaluation is appending to, are read to find their samples.
+    """
+    indexed = _read_index(directory)
+    unindexed = [path for path in segments if path.name not in indexed]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluation-replay") as executor:
+        for path, sample_ixs in zip(unindexed, executor.map(_segment_ixs, unindexed)):
+            indexed[path.name] = sample_ixs
+
+    latest = {}
+    for path in segments:
+        for line_number, sample_ix in enumerate(indexed[path.name]):
+            if sample_ix is not None:
+                latest[sample_ix] = (path.name, line_number)
+
+    selected = {path.name: {} for path in segments}
+    for sample_ix, (name, line_number) in latest.items():
+        selected[name][line_number] = sample_ix
+    return selected
+
+
+def _read_index(directory: Path) -> dict[str, list]:
+    index_path = directory / INDEX_NAME
+    if not index_path.exists():
+        return {}
+
+    indexed = {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring a malformed line in {index_path}")
+                continue
+            indexed[entry["segment"]] = [_hashable(sample_ix) for sample_ix in entry["sample_ix"]]
+    return indexed
+
+
+def _segment_ixs(path: Path) -> list:
+    return [_hashable(entry["sample_ix"]) if entry is not None else None for entry in _segment_entries(path)]
+
+
+def _read_segment(task: tuple[Path, dict[int, Any]]) -> list[tuple[Any, Any]]:
+    path, lines = task
+    responses = []
+    for line_number, entry in enumerate(_segment_entries(path)):
+        if line_number in lines and entry is not None:
+            responses.append((lines[line_number], entry["response"]))
+    return responses
+
+
+def _read_legacy(files: list[tuple[Any, Path]]) -> list[tuple[Any, Any]]:
+    responses = []
+    for sample_ix, path in files:
+        content = path.read_text(encoding="utf-8")
+        try:
+            responses.append((sample_ix, json.loads(content)))
+        except json.JSONDecodeError:
+            # Responses that were not dictionaries were logged as text
+            responses.append((sample_ix, content))
+    return responses
+
+
+def _segment_entries(path: Path) -> Iterator[dict | None]:
+    """
+    Yields the entry on each complete line of a segment, or None for a line that cannot be decoded.
+
+    A segment still being written, or cut short by a crash, ends in a partial line or compressed block, which is
+    left out so the responses before it can still be read.
+    """
+    pending = b""
+    for chunk in _decompressed_chunks(path):
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring a malformed line in {path}")
+                yield None
+    if pending:
+        logger.debug(f"Ignoring a partially written line at the end of {path}")
+
+
+def _decompressed_chunks(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        if path.suffix == ".gz":
+            yield from _gzip_chunks(f, path)
+        elif path.suffix == ".zst":
+            yield from _zstd_chunks(f, path)
+        else:
+            while chunk := f.read(_READ_SIZE):
+                yield chunk
+
+
+def _gzip_chunks(f, path: Path) -> Iterator[bytes]:
+    """Decompresses gzip members as they are read; unlike gzip.open, tolerates a member that was not finished."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while data := f.read(_READ_SIZE):
+        while data:
+            try:
+                yield decompressor.decompress(data)
+            except zlib.error as error:
+                logger.warning(f"Stopped reading {path} at corrupt data: {error}")
+                return
+            data = decompressor.unused_data
+            if decompressor.eof:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = b""
+
+
+def _zstd_chunks(f, path: Path) -> Iterator[bytes]:
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("Reading zstd compressed response logs requires the zstandard package") from error
+
+    reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+    try:
+        while chunk := reader.read(_READ_SIZE):
+            yield chunk
+    except zstandard.ZstdError as error:
+        logger.debug(f"Stopped reading {path} at an unfinished frame: {error}")
+
+
+def _ordered(tasks: list[tuple[Callable, Any]], workers: int) -> Iterator[tuple[Any, Any]]:
+    """Runs the tasks on a thread pool, yielding their responses in task order with a bounded number in flight."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluation-replay") as executor:
+        pending = collections.deque()
+        tasks = iter(tasks)
+        while True:
+            while len(pending) < 2 * workers and (task := next(tasks, None)) is not None:
+                pending.append(executor.submit(*task))
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+
+def _segment_order(path: Path) -> tuple[int, float]:
+    # Segments of sinks sharing the directory may have the same number; the last modified holds the later responses
+    return _segment_number(path), path.stat().st_mtime
+
+
+def _decode_logged_ix(name: str) -> Any:
+    """Recovers the sample index from a legacy file name, keeping names that are not JSON as strings."""
+    try:
+        return _hashable(json.loads(name))
+    except json.JSONDecodeError:
+        return name
+
+
+def _hashable(sample_ix: Any) -> Any:
+    """Turns the JSON arrays of tuple indices, such as those of a MultiIndex, back into tuples."""
+    return tuple(_hashable(value) for value in sample_ix) if isinstance(sample_ix, list) else sample_ix
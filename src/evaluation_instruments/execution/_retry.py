@@ -0,0 +1,256 @@
+import asyncio
+import collections
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Awaitable, Callable, Optional
+
+from ._concurrency import is_rate_limit_error
+
+logger = logging.getLogger("evaluation")
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Checks if an exception raised by a completion function is transient, such as a timeout or server error."""
+    if isinstance(error, (TimeoutError, ConnectionError)) or is_rate_limit_error(error):
+        return True
+
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int) and (status in (408, 409) or status >= 500):
+        return True
+
+    names = [cls.__name__.lower() for cls in type(error).__mro__]
+    return any(marker in name for name in names for marker in ("timeout", "connection", "unavailable"))
+
+
+class RetryPolicy:
+    """
+    Retries, times out and hedges the requests sent to the completion function.
+
+    Each attempt is abandoned after timeout seconds with a TimeoutError. An attempt failing with an error accepted
+    by retry_on is tried again, up to max_attempts in total, after an exponential backoff with full jitter: a random
+    delay of up to backoff * 2 ** (attempt - 1) seconds, capped at max_backoff.
+
+    With hedge_quantile set, once hedge_min_samples latencies have been observed, an attempt still running after
+    that quantile of the recent latencies is duplicated and whichever request returns first is used. A hedged
+    duplicate spends tokens that are not counted in the usage of the run, so the quantile should stay high.
+
+    A synchronous attempt that times out or loses a hedge cannot be interrupted; it is left to finish on a daemon
+    thread and its result is discarded.
+
+    Parameters
+    ----------
+    max_attempts : int, optional
+        The total number of attempts per request, by default 3
+    timeout : Optional[float], optional
+        The seconds before an attempt is abandoned, by default None for no timeout
+    backoff : float, optional
+        The upper bound in seconds of the delay before the first retry, by default 1.0
+    max_backoff : float, optional
+        The largest delay in seconds between attempts, by default 30.0
+    retry_on : Callable, optional
+        Decides if an exception is worth retrying, by default is_retryable_error
+    hedge_quantile : Optional[float], optional
+        The latency quantile after which a duplicate request is sent, by default None for no hedging
+    hedge_min_samples : int, optional
+        The number of observed latencies required before hedging, by default 20
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        timeout: Optional[float] = None,
+        backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        retry_on: Callable[[BaseException], bool] = is_retryable_error,
+        hedge_quantile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+    ):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout}")
+        if hedge_quantile is not None and not 0 < hedge_quantile < 1:
+            raise ValueError(f"hedge_quantile must be between 0 and 1, got {hedge_quantile}")
+
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=1000)
+
+        self.retries: int = 0
+        self.hedges: int = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """The jittered delay in seconds after the given failed attempt, counting from 1."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """The seconds after which an attempt is hedged, or None while hedging is off or there are too few samples."""
+        if self.hedge_quantile is None:
+            return None
+
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    def call(self, request: Callable[[], object], admit: Optional[Callable[[], object]] = None):
+        """
+        Calls request until it succeeds or the policy gives up, re-raising the last error.
+
+        Parameters
+        ----------
+        request : Callable
+            Sends a single attempt and returns its result.
+        admit : Optional[Callable], optional
+            Called before each attempt and each hedged duplicate is sent, such as RateLimiter.acquire, by default
+            None. The time it blocks an attempt does not count towards the timeout.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self._attempt(request, admit)
+            except Exception as error:
+                if attempt == self.max_attempts or not self.retry_on(error):
+                    raise
+                delay = self._retrying(attempt, error)
+            time.sleep(delay)
+
+    async def acall(self, request: Callable[[], Awaitable], admit: Optional[Callable[[], Awaitable]] = None):
+        """The awaitable counterpart of call, where request and admit return awaitables."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await self._aattempt(request, admit)
+            except Exception as error:
+                if attempt == self.max_attempts or not self.retry_on(error):
+                    raise
+                delay = self._retrying(attempt, error)
+            await asyncio.sleep(delay)
+
+    def _attempt(self, request: Callable[[], object], admit: Optional[Callable[[], object]]):
+        if admit is not None:
+            admit()
+
+        start = time.monotonic()
+        hedge = self.hedge_delay()
+        if self.timeout is None and hedge is None:
+            result = request()
+        else:
+            result = self._race(request, admit, start, hedge)
+
+        self._record_latency(time.monotonic() - start)
+        return result
+
+    def _race(self, request: Callable[[], object], admit: Optional[Callable], start: float, hedge: Optional[float]):
+        """Runs request on daemon threads, hedging after the hedge delay and giving up at the timeout."""
+
+        def hedged():
+            if admit is not None:
+                admit()
+            return request()
+
+        pending = {_spawn(request)}
+        while True:
+            done, pending = wait(pending, timeout=self._next_deadline(start, hedge), return_when=FIRST_COMPLETED)
+            if (result := _first_result(done, pending)) is not _PENDING:
+                return result
+
+            hedge = self._check_deadlines(start, hedge, pending, lambda: _spawn(hedged))
+
+    async def _aattempt(self, request: Callable[[], Awaitable], admit: Optional[Callable[[], Awaitable]]):
+        if admit is not None:
+            await admit()
+
+        async def hedged():
+            if admit is not None:
+                await admit()
+            return await request()
+
+        start = time.monotonic()
+        hedge = self.hedge_delay()
+        pending = {asyncio.ensure_future(request())}
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, timeout=self._next_deadline(start, hedge), return_when=asyncio.FIRST_COMPLETED
+                )
+                if (result := _first_result(done, pending)) is not _PENDING:
+                    self._record_latency(time.monotonic() - start)
+                    return result
+
+                hedge = self._check_deadlines(start, hedge, pending, lambda: asyncio.ensure_future(hedged()))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _next_deadline(self, start: float, hedge: Optional[float]) -> Optional[float]:
+        """The seconds to wait before the timeout or the hedge delay is reached, whichever comes first."""
+        deadlines = [limit for limit in (self.timeout, hedge) if limit is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - (time.monotonic() - start))
+
+    def _check_deadlines(self, start: float, hedge: Optional[float], pending: set, spawn: Callable) -> Optional[float]:
+        """Raises once the timeout has passed and sends the hedge once due, returning the remaining hedge delay."""
+        elapsed = time.monotonic() - start
+        if self.timeout is not None and elapsed >= self.timeout:
+            raise TimeoutError(f"Request did not complete within {self.timeout}s")
+
+        if hedge is not None and elapsed >= hedge:
+            logger.debug(f"Hedging request still running after {elapsed:.2f}s")
+            with self._lock:
+                self.hedges += 1
+            pending.add(spawn())
+            return None
+        return hedge
+
+    def _retrying(self, attempt: int, error: Exception) -> float:
+        delay = self.backoff_delay(attempt)
+        with self._lock:
+            self.retries += 1
+        logger.info(f"Attempt {attempt} failed with {error!r}, retrying in {delay:.2f}s")
+        return delay
+
+    def _record_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+
+_PENDING = object()
+
+
+def _first_result(done: set, pending: set):
+    """Returns the first successful result, re-raises once every request failed, or _PENDING to keep waiting."""
+    error = None
+    for future in done:
+        if future.exception() is None:
+            return future.result()
+        error = future.exception()
+
+    if error is not None and not pending:
+        raise error
+    return _PENDING
+
+
+def _spawn(request: Callable[[], object]) -> Future:
+    """Runs request on a daemon thread, so an abandoned request does not hold up the interpreter at exit."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(request())
+        except BaseException as error:
+            future.set_exception(error)
+
+    threading.Thread(target=run, name="evaluation-request", daemon=True).start()
+    return future
@@ -0,0 +1,84 @@
+import collections
+import itertools
+from collections.abc import Mapping
+from typing import Any, Iterator, NamedTuple, Optional
+
+
+def iter_rows(source: Any, key: Optional[str] = None) -> Iterator[NamedTuple]:
+    """
+    Iterates a source of rows lazily, as the namedtuples DataFrame.itertuples passes to prep functions.
+
+    Each row has the fields of its record plus an Index identifying it in the outputs and checkpoints. Supported
+    sources are:
+        - pandas DataFrames, indexed by the DataFrame index
+        - pyarrow Tables, RecordBatches and RecordBatchReaders, or anything else with to_batches or to_pylist
+        - iterables of DataFrames, record batches, mappings or rows with an Index, mixed in any order, such as the
+          chunked readers of pandas.read_csv(chunksize=...) and pyarrow.parquet.ParquetFile.iter_batches()
+
+    Only one chunk of the source is held at a time, so datasets larger than memory can be evaluated.
+
+    Parameters
+    ----------
+    source : Any
+        The rows to iterate, or None for no rows.
+    key : Optional[str], optional
+        The field used as the Index of each row, by default None for the DataFrame index and otherwise the
+        position of the row in the source. A key stable across reruns is needed for checkpoints to resume.
+    """
+    if source is None:
+        return
+
+    position = itertools.count()
+    for chunk in _chunks(source):
+        if hasattr(chunk, "itertuples"):
+            yield from _frame_rows(chunk, key, position)
+        elif hasattr(chunk, "to_pylist"):
+            yield from _record_rows(chunk.to_pylist(), key, position)
+        elif isinstance(chunk, Mapping):
+            yield from _record_rows([chunk], key, position)
+        elif hasattr(chunk, "Index"):
+            next(position)
+            yield chunk
+        else:
+            raise TypeError(f"Cannot evaluate rows of type {type(chunk).__name__}")
+
+
+def _chunks(source: Any) -> Iterator:
+    """Splits a source into DataFrames, record batches or single rows."""
+    if hasattr(source, "itertuples") or (hasattr(source, "to_pylist") and not hasattr(source, "to_batches")):
+        yield source
+    elif hasattr(source, "to_batches"):
+        yield from source.to_batches()
+    elif isinstance(source, Mapping):
+        raise TypeError("Cannot evaluate a single mapping, pass an iterable of records instead")
+    else:
+        yield from source
+
+
+def _frame_rows(frame, key: Optional[str], position: Iterator[int]) -> Iterator[NamedTuple]:
+    rows = frame.itertuples()
+    if key is None:
+        for row in rows:
+            next(position)
+            yield row
+    else:
+        for sample_ix, row in zip(frame[key], rows):
+            next(position)
+            yield row._replace(Index=sample_ix)
+
+
+def _record_rows(records: list, key: Optional[str], position: Iterator[int]) -> Iterator[NamedTuple]:
+    for record in records:
+        row_type = _row_type(tuple(record))
+        sample_ix = next(position) if key is None else record[key]
+        yield row_type(sample_ix, *record.values())
+
+
+_ROW_TYPES: dict[tuple, type] = {}
+
+
+def _row_type(fields: tuple) -> type:
+    """A namedtuple type for records with the given fields, renaming invalid fields as DataFrame.itertuples does."""
+    if (row_type := _ROW_TYPES.get(fields)) is None:
+        row_type = _ROW_TYPES[fields] = collections.namedtuple("Row", ["Index", *fields], rename=True)
+    return row_type
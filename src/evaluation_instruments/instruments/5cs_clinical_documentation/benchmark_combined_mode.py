@@ -0,0 +1,109 @@
+"""
+Compares the combined single-call mode of the 5Cs instrument against the five-call pipeline.
+
+Both modes are run over the same notes with your completion function, reporting the token usage and wall time of
+each mode along with how often the combined grades agree with the five separate prompts:
+
+    from benchmark_combined_mode import benchmark
+    usage_df, agreement_df = benchmark(input_df, completion)
+
+Run as a script, the benchmark uses an offline stand-in for the model that grades every category 1 and counts
+prompt tokens estimated from the prompt text. This shows the prompt-token savings for your notes, optionally read
+from a CSV with 'noteid' and 'notes' columns, but says nothing about agreement:
+
+    python benchmark_combined_mode.py [notes.csv]
+"""
+
+import json
+import sys
+import time
+from typing import Dict
+
+import pandas as pd
+from run_5cs_pipeline import CATEGORY_PROMPTS, COMBINED_PROMPT_TYPES, PROMPT_TYPES, run_prompt_types
+
+from evaluation_instruments.execution import estimate_tokens
+
+
+def compare_grades(five_call: Dict, combined: Dict) -> pd.DataFrame:
+    """
+    Measures the agreement of the combined grades with the five-call grades.
+
+    Args:
+        five_call (Dict): The grades from the five-call pipeline, keyed by noteid.
+        combined (Dict): The grades from the combined mode, keyed by noteid.
+
+    Returns:
+        pd.DataFrame: For each category, the number of notes graded by both modes and the fraction that agree.
+    """
+    rows = []
+    for category in CATEGORY_PROMPTS:
+        pairs = [
+            (grades[category], combined[noteid][category])
+            for noteid, grades in five_call.items()
+            if category in grades and category in combined.get(noteid, {})
+        ]
+        agreement = sum(left == right for left, right in pairs) / len(pairs) if pairs else float("nan")
+        rows.append({"category": category, "notes": len(pairs), "agreement": agreement})
+
+    return pd.DataFrame(rows).set_index("category")
+
+
+def benchmark(input_df: pd.DataFrame, completion, **pipeline_kwargs) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs the five-call and combined modes over the same notes.
+
+    Args:
+        input_df (pd.DataFrame): The notes to grade, as expected by `run_pipeline`.
+        completion: The completion function, as expected by `run_pipeline`.
+        **pipeline_kwargs: Further arguments for `run_pipeline`, such as max_tokens or max_concurrency.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The token usage and seconds taken by each mode, and the agreement of
+        the combined grades with the five-call grades as returned by `compare_grades`.
+    """
+    pipeline_kwargs.setdefault("log_enabled", False)
+
+    grades, rows = {}, []
+    for mode, prompt_types in (("five_call", PROMPT_TYPES), ("combined", COMBINED_PROMPT_TYPES)):
+        start = time.perf_counter()
+        grades[mode], usage = run_prompt_types(input_df, completion, prompt_types, **pipeline_kwargs)
+        rows.append(
+            {
+                "mode": mode,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+                "seconds": time.perf_counter() - start,
+            }
+        )
+
+    usage_df = pd.DataFrame(rows).set_index("mode")
+    usage_df["prompt_reduction"] = usage_df.loc["five_call", "prompt_tokens"] / usage_df["prompt_tokens"]
+    return usage_df, compare_grades(grades["five_call"], grades["combined"])
+
+
+def offline_completion(model, messages, **kwargs) -> Dict:
+    """A stand-in for the model that grades every category 1, reporting estimated prompt tokens."""
+    content = json.dumps({category: 1 for category in CATEGORY_PROMPTS})
+    usage = {"prompt_tokens": estimate_tokens(messages), "completion_tokens": 0}
+    usage["total_tokens"] = usage["prompt_tokens"]
+    return {"choices": [{"message": {"content": content}}], "usage": usage}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        notes_df = pd.read_csv(sys.argv[1]).set_index("noteid")
+    else:
+        # Synthetic progress notes of increasing length, from a short note to a long one of ~8k tokens
+        sentence = "Patient seen and examined, labs and vitals reviewed, plan discussed with the team. "
+        notes_df = pd.DataFrame(
+            {"notes": [sentence * repeats for repeats in (10, 100, 400)]},
+            index=pd.Index(["short", "medium", "long"], name="noteid"),
+        )
+
+    print(f"Sending five-call and combined prompts for {len(notes_df)} notes (offline; agreement is not measured)")
+    for noteid in notes_df.index:
+        usage_df, _ = benchmark(notes_df.loc[[noteid]], offline_completion, max_tokens=10_000_000)
+        print(f"\n{noteid} ({estimate_tokens(notes_df.loc[noteid, 'notes'])} note tokens)")
+        print(usage_df[["prompt_tokens", "prompt_reduction"]].to_string())
@@ -1,3 +1,12 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pandas as pd
+
+import evaluation_instruments as ev
+
 COMPLETE_PROMPT = """
 # Complete note definition:
 
@@ -297,14 +306,53 @@ Clincal Note:
 {prompt_note}
 """
 
-from typing import List, Dict
-import evaluation_instruments as ev
-import logging
-import pandas as pd
-
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("evaluation")
 
+CATEGORY_PROMPTS = {
+    "complete": COMPLETE_PROMPT,
+    "clinical_assessment_reasoning": CLINICAL_ASSESSMENT_REASONING_PROMPT,
+    "contingent": CONTINGENT_PROMPT,
+    "concise": CONCISE_PROMPT,
+    "correct": CORRECT_PROMPT,
+}
+
+COMBINED_TASK = (
+    "\n###\n\nFINAL OUTPUT\n---------\n\n"
+    "Answer each of the five tasks above for the clinical note below, using chain-of-thought for each.\n\n"
+    "Return your final output as a single json object with the following: use the words complete, "
+    "clinical_assessment_reasoning, contingent, concise and correct as the keys and 1 or 0 as the value of each. "
+    "Make sure you have gone through all of the steps and ensure you have followed the output format I have "
+    "mentioned above. Your final classification is fed into a hospital safety-critical system so it must be as "
+    "accurate as possible. Think carefully, and give merit to notes that are deserving of a final classification "
+    "of 1.\n\n"
+    "Clinical Note:\n{prompt_note}\n"
+)
+
+
+def _criterion_section(number: int, category: str, prompt: str) -> str:
+    """
+    Extracts the definition, examples and task of a category prompt, leaving out its output format and note.
+
+    Args:
+        number (int): The position of the category in the combined prompt.
+        category (str): The category name, which is also its key in the output.
+        prompt (str): The single-category prompt.
+
+    Returns:
+        str: The section of the combined prompt for the category.
+    """
+    criteria = prompt.split("Return your final output as json")[0].strip()
+    criteria = criteria.replace("CURRENT TASK", f"TASK {number}: {category}")
+    return f"# PART {number}: {category}\n\n{criteria}\n\n"
+
+
+# The five category prompts share a single copy of the note, built from the prompts above so they stay in sync
+COMBINED_PROMPT = "".join(
+    _criterion_section(number, category, prompt).replace("{", "{{").replace("}", "}}")
+    for number, (category, prompt) in enumerate(CATEGORY_PROMPTS.items(), start=1)
+) + COMBINED_TASK
+
 
 def create_complete_prompt(note: str) -> List[Dict]:
     """
@@ -381,25 +429,163 @@ def create_correct_prompt(note: str) -> List[Dict]:
     return [{"role": "user", "content": prompt}]
 
 
-def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, max_tokens: int = 80_000) -> Dict:
+def create_combined_prompt(note: str) -> List[Dict]:
+    """
+    Generates a prompt message for evaluating all five categories of a given note in a single request.
+
+    The note is sent once along with the definitions and examples of every category, and the model is asked for
+    a single JSON object holding all five keys.
+
+    Args:
+        note (str): The clinical note or text to be evaluated.
+
+    Returns:
+        List[Dict]: A list containing a single dictionary, formatted as a user message
+                    for the generative model, containing the combined prompt.
+    """
+    prompt = COMBINED_PROMPT.format(prompt_note=note)
+    return [{"role": "user", "content": prompt}]
+
+
+# Each prompt creation function receives only the text of the 'notes' column rather than the whole row
+NOTE_COLUMNS = {"note": "notes"}
+
+# The prompt creation function of each category, run as separate requests
+PROMPT_TYPES = {
+    "complete": ev.prep.from_columns(create_complete_prompt, columns=NOTE_COLUMNS),
+    "clinical_assessment_reasoning": ev.prep.from_columns(
+        create_clinical_reasoning_assessment_prompt, columns=NOTE_COLUMNS
+    ),
+    "contingent": ev.prep.from_columns(create_contingent_prompt, columns=NOTE_COLUMNS),
+    "concise": ev.prep.from_columns(create_concise_prompt, columns=NOTE_COLUMNS),
+    "correct": ev.prep.from_columns(create_correct_prompt, columns=NOTE_COLUMNS)
+}
+
+# All five categories in a single request per note
+COMBINED_PROMPT_TYPES = {"combined": ev.prep.from_columns(create_combined_prompt, columns=NOTE_COLUMNS)}
+
+
+def create_cached_prompt_fxn(prompt: str):
+    """
+    Creates a prompt creation function that lays out a prompt for provider prompt caching.
+
+    The text before the note is sent as a prefix that is identical for every note, and the note with any text after
+    it as the suffix. The resulting content is the same as the prompt formatted with the note.
+
+    Args:
+        prompt (str): A prompt with a single {prompt_note} placeholder, such as COMPLETE_PROMPT.
+
+    Returns:
+        Callable: A function taking the note and returning the message array.
+    """
+    prefix, tail = prompt.format(prompt_note="\0").split("\0")
+
+    def create_prompt(note: str) -> List[Dict]:
+        return ev.prep.prefix_cached_messages(prefix, f"{note}{tail}")
+
+    return create_prompt
+
+
+# The prompt types laid out for provider prompt caching
+CACHED_PROMPT_TYPES = {
+    category: ev.prep.from_columns(create_cached_prompt_fxn(prompt), columns=NOTE_COLUMNS)
+    for category, prompt in CATEGORY_PROMPTS.items()
+}
+CACHED_COMBINED_PROMPT_TYPES = {
+    "combined": ev.prep.from_columns(create_cached_prompt_fxn(COMBINED_PROMPT), columns=NOTE_COLUMNS)
+}
+
+# Each category is graded 1 if the note meets it and 0 otherwise
+CATEGORY_SCORES = {category: ev.post.ScoreRange(0, 1) for category in CATEGORY_PROMPTS}
+
+
+def response_model(category: str = "combined") -> type:
+    """
+    Builds the pydantic model of a 5Cs response, a map of each graded category to 1 or 0.
+
+    Wrap the post_fn with ev.post.validated(post_fn, response_model(category)) to return typed records and flag
+    responses missing the category or holding another grade.
+
+    Args:
+        category (str): A key of CATEGORY_PROMPTS for a single-category prompt, or "combined" for the combined
+            prompt grading all five categories. Defaults to "combined".
+
+    Returns:
+        type: The model, whose model_validate checks a parsed response.
+    """
+    if category == "combined":
+        scores = CATEGORY_SCORES
+    elif category in CATEGORY_SCORES:
+        scores = {category: CATEGORY_SCORES[category]}
+    else:
+        raise ValueError(f"category must be 'combined' or one of {list(CATEGORY_SCORES)}, got {category!r}")
+
+    name = "".join(part.title() for part in category.split("_"))
+    return ev.post.response_model(f"FiveCs{name}Response", scores, default_mode=ev.OutputMode.SCORE)
+
+
+def response_format(category: str = "combined") -> dict:
+    """
+    Builds the JSON schema response_format constraining a 5Cs completion to its map of grades, see response_model.
+
+    The prompts ask for chain-of-thought before the json, which a provider enforcing the schema leaves out, so
+    grades may differ from those of unconstrained completions.
+
+    Args:
+        category (str): A key of CATEGORY_PROMPTS, or "combined" for the combined prompt. Defaults to "combined".
+
+    Returns:
+        dict: The response_format argument of a chat completion.
+    """
+    return ev.post.response_format(response_model(category))
+
+
+def run_pipeline(
+    input_df: pd.DataFrame,
+    completion,
+    log_enabled: bool = True,
+    max_tokens: int = 80_000,
+    rate_limiter: ev.RateLimiter = None,
+    max_concurrency: int | ev.AdaptiveConcurrency = 8,
+    combined: bool = False,
+    cache_prefix: bool = False,
+    prompt_cache_key: str = None,
+    structured_output: bool = False,
+) -> Dict:
     """
     Runs a pipeline of evaluations on an input DataFrame using various prompt types and a specified completion function.
 
-    This function iterates through a predefined set of prompt categories (complete, clinical_assessment_reasoning,
-    contingent, concise, correct), creates an `Evaluation` instance for each, and runs the input dataset through it.
-    The results from each evaluation are aggregated into a single dictionary, where each note ID is associated with
-    a dictionary of its grades across all evaluation categories. The `completion` function is used to generate
-    responses from a language model based on the prompts created for each category.
+    This function creates an `Evaluation` instance for each of a predefined set of prompt categories (complete,
+    clinical_assessment_reasoning, contingent, concise, correct) and runs the input dataset through all of them at
+    once. The requests of every category share one concurrency window, so the pipeline takes about as long as its
+    slowest category rather than the sum of all five. Grades are aggregated into a single dictionary as they
+    arrive, where each note ID is associated with a dictionary of its grades across all evaluation categories.
+    The `completion` function is used to generate responses from a language model based on the prompts created for
+    each category.
 
     Args:
-        - input_df (pd.DataFrame): The input dataset as a pandas DataFrame. This DataFrame should contain a 'noteid'
-            column and any other columns required by the prompt creation functions (e.g., text to be evaluated).
-            The 'noteid' column is used as the key in the output dictionary.
+        - input_df (pd.DataFrame): The input dataset as a pandas DataFrame, indexed by 'noteid' and with the text
+            to be evaluated in a 'notes' column. Only the 'notes' column is sent to the model; any other columns
+            are ignored. The 'noteid' index is used as the key in the output dictionary.
         - completion: A function that takes a model name and a list of messages as input and returns the completion
             from the language model. This function is responsible for interacting with the language model API.
             In this case, it is expected to return a JSON string representing the completion.
         - log_enabled (bool): Flag to enable or disable logging within the Evaluation instances.
         - max_tokens (int): Maximum number of tokens to be used by the Evaluation instances.
+        - rate_limiter (ev.RateLimiter): Optional limiter shared by all categories so that together they
+            respect the requests-per-minute and tokens-per-minute quotas of the model deployment.
+        - max_concurrency (int | ev.AdaptiveConcurrency): The number of requests kept in flight across all
+            categories, by default 8. An AdaptiveConcurrency controller instead adjusts the shared window to the
+            throttling and latency of the model deployment.
+        - combined (bool): Flag to grade all five categories with a single request per note, sending the note
+            once instead of five times. Grades may differ from the five separate prompts; see
+            benchmark_combined_mode.py to compare token usage and agreement on your own notes.
+        - cache_prefix (bool): Flag to send the definitions and examples of each prompt as a prefix marked for
+            provider prompt caching, separate from the note. The prompt text is unchanged.
+        - prompt_cache_key (str): Optional key passed to the model as prompt_cache_key, suffixed with the category,
+            to route requests sharing a prefix to the same provider cache.
+        - structured_output (bool): Flag to send the response_format of each category, constraining completions
+            to its map of grades for providers supporting structured outputs. See response_format.
 
     Returns:
         Dict: A dictionary where keys are 'noteid's (corresponding to the 'noteid' column in the input DataFrame)
@@ -408,18 +594,59 @@ def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, m
               Each inner dictionary contains the grades assigned to that note ID for each prompt category.
     """
     
+    # Define the types of prompts to run
+    if cache_prefix:
+        prompt_types = CACHED_COMBINED_PROMPT_TYPES if combined else CACHED_PROMPT_TYPES
+    else:
+        prompt_types = COMBINED_PROMPT_TYPES if combined else PROMPT_TYPES
+
+    aggregated_output, _ = run_prompt_types(
+        input_df,
+        completion,
+        prompt_types,
+        log_enabled,
+        max_tokens,
+        rate_limiter,
+        max_concurrency,
+        prompt_cache_key,
+        structured_output,
+    )
+    return aggregated_output
+
+
+def run_prompt_types(
+    input_df: pd.DataFrame,
+    completion,
+    prompt_types: Dict,
+    log_enabled: bool = True,
+    max_tokens: int = 80_000,
+    rate_limiter: ev.RateLimiter = None,
+    max_concurrency: int | ev.AdaptiveConcurrency = 8,
+    prompt_cache_key: str = None,
+    structured_output: bool = False,
+) -> tuple[Dict, ev.TokenUsage]:
+    """
+    Runs the input DataFrame through an `Evaluation` for each prompt type concurrently, see `run_pipeline`.
+
+    Args:
+        - prompt_types (Dict): The prompt creation function of each category, keyed by the category name.
+        - The remaining arguments are as described in `run_pipeline`.
+
+    Returns:
+        tuple[Dict, ev.TokenUsage]: The grades aggregated by noteid, and the token usage across all categories.
+    """
     aggregated_output = {}
+    aggregated_usage = ev.TokenUsage(0, 0, 0)
+    aggregated_lock = threading.Lock()
 
-    # Define the types of prompts to run
-    prompt_types = {
-        "complete": create_complete_prompt,
-        "clinical_assessment_reasoning": create_clinical_reasoning_assessment_prompt,
-        "contingent": create_contingent_prompt,
-        "concise": create_concise_prompt,
-        "correct": create_correct_prompt
-    }
-
-    for category, prompt_fxn in prompt_types.items():
+    # A single window bounds the requests in flight across every category
+    if isinstance(max_concurrency, ev.AdaptiveConcurrency):
+        window = max_concurrency
+    else:
+        window = ev.AdaptiveConcurrency(initial=max_concurrency, minimum=max_concurrency, maximum=max_concurrency)
+
+    def run_category(category, prompt_fxn):
+        nonlocal aggregated_usage
         logger.info(f"--- Running evaluation for: {category} ---")
 
         evaluator = ev.Evaluation(
@@ -427,18 +654,26 @@ def run_pipeline(input_df: pd.DataFrame, completion, log_enabled: bool = True, m
             prep_fn=prompt_fxn,
             log_enabled=log_enabled,
             max_tokens=max_tokens,
-            log_prefix=category # Use the category as the log_prefix
+            log_prefix=category, # Use the category as the log_prefix
+            rate_limiter=rate_limiter,
+            model_args=ev.prep.prompt_cache_args(f"{prompt_cache_key}-{category}") if prompt_cache_key else {},
+            response_format=response_format(category) if structured_output else None,
         )
 
-        # Assuming run_dataset returns a tuple of (output_dict, usage_info)
-        output, usage = evaluator.run_dataset(input_df)
+        # Merge each grade as soon as it arrives. For each noteid, initialize its entry in aggregated_output
+        # if it doesn't exist, then update it with the current category's grade data.
+        for noteid, grade_data, usage in evaluator.iter_dataset(input_df, workers=window):
+            with aggregated_lock:
+                aggregated_output.setdefault(noteid, {}).update(grade_data)
+                aggregated_usage += usage
 
-        # Aggregate the output. For each noteid in the current evaluation's output,
-        # initialize its entry in aggregated_output if it doesn't exist,
-        # then update it with the current category's grade data.
-        for noteid, grade_data in output.items():
-            if noteid not in aggregated_output:
-                aggregated_output[noteid] = {}
-            aggregated_output[noteid].update(grade_data)
+        logger.info(f"--- Finished evaluation for: {category} ---")
 
-    return aggregated_output
+    with ThreadPoolExecutor(max_workers=len(prompt_types), thread_name_prefix="5cs") as executor:
+        futures = [executor.submit(run_category, category, fxn) for category, fxn in prompt_types.items()]
+        for future in futures:
+            future.result()
+
+    # Grades arrive in completion order; present the notes in the order of the input
+    ordered = {noteid: aggregated_output[noteid] for noteid in input_df.index if noteid in aggregated_output}
+    return ordered, aggregated_usage
@@ -1,3 +1,8 @@
+import pandas as pd
+
+import evaluation_instruments.post as post
+import evaluation_instruments.prep as prep
+
 # fmt: off
 EPIC_SUMMARY_OF_CARE_RUBRIC = {
     "Tone": """
@@ -151,6 +156,38 @@ Rules to follow:
 OUTPUT:
 """
 
+# The same prompt reordered so the rubric and rules form a prefix shared by every sample, see to_cached_prompt
+CACHED_PREFIX = """
+You will read CLINICAL_DATA and a {OUTPUT_TEXT} created from it. Your task is to grade the {OUTPUT_TEXT}.
+
+Read the following RUBRIC_SET. Your task is to use this RUBRIC_SET to grade the {OUTPUT_TEXT}.
+
+<RUBRIC_SET>
+{RUBRIC_SET}
+<\\RUBRIC_SET>
+
+Rules to follow:
+{{instruction_set}}
+"""
+
+CACHED_SUFFIX = """
+Read the following CLINICAL_DATA. They were used to create a {OUTPUT_TEXT}.
+
+<CLINICAL_DATA>
+{{clinical_data}}
+<\\CLINICAL_DATA>
+
+Read the following {OUTPUT_TEXT}, which is a summary of the above CLINICAL_DATA. Your task is to grade this {OUTPUT_TEXT}.
+
+<{OUTPUT_TEXT}>
+{{output_to_evaluate}}
+<\\{OUTPUT_TEXT}>
+
+Now, it's time to grade the {OUTPUT_TEXT}, following the rules above.
+
+OUTPUT:
+"""
+
 INSTRUCTION_LIST = [
 "- Your task is to grade the SUMMARY OF INPATIENT CARE, based on the RUBRIC_SET and the CLINICAL_DATA being "
     "referenced.",
@@ -175,11 +212,9 @@ Here is your new role and persona:
 You are an expert grading machine, for clinical summaries of care.
 """
 # fmt: on
-import pandas as pd
-
-import evaluation_instruments.prep as prep
 OUTPUT_MODE = prep.OutputMode.EXPLAINED_SCORE
 
+
 def compile_clinical_data(sample: pd.Series) -> str:
     data = ""
     for key in sample.keys():
@@ -192,23 +227,67 @@ def compile_clinical_data(sample: pd.Series) -> str:
             data += f"[{id}] = {sample[key][id]}\n"
     return data
 
+
 def resolve_prompt(sample, mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> str:
-    prompt_pattern = prep.prompt_compilation(
+    prompt_pattern = prep.template_cache.prompt_compilation(
         PROMPT, pattern_kwargs={"OUTPUT_TEXT": "SUMMARY OF INPATIENT CARE"}, rubric_library=EPIC_SUMMARY_OF_CARE_RUBRIC
     )
 
-    instructions = prep.resolve_instructions(
-                            instructions=INSTRUCTION_LIST,
-                            details_overrides=DETAIL_INSTRUCTIONS,
-                            default_mode=OUTPUT_MODE,
-                            mode=mode,
-                            )
+    instructions = prep.template_cache.resolve_instructions(
+        instructions=INSTRUCTION_LIST,
+        details_overrides=DETAIL_INSTRUCTIONS,
+        default_mode=OUTPUT_MODE,
+        mode=mode,
+    )
 
-    return prompt_pattern.format(clinical_data=compile_clinical_data(sample),
-                                 output_to_evaluate=sample["summary"],
-                                 instruction_set=instructions)
+    return prompt_pattern.format(
+        clinical_data=compile_clinical_data(sample), output_to_evaluate=sample["summary"], instruction_set=instructions
+    )
 
-@prep.json_from_column(namedtuple_key="guid")
+
+@prep.json_from_column(namedtuple_key="guid", required_keys=["summary"])
 @prep.to_user_messages(system_message=SYSTEM_PROMPT)
 def to_prompt(sample):
     return resolve_prompt(sample)
+
+
+def resolve_prompt_parts(sample, mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> tuple[str, str]:
+    """Resolves the prompt as a prefix of the rubric and rules shared by every sample, and a sample-specific suffix."""
+    prefix_pattern = prep.template_cache.prompt_compilation(
+        CACHED_PREFIX,
+        pattern_kwargs={"OUTPUT_TEXT": "SUMMARY OF INPATIENT CARE"},
+        rubric_library=EPIC_SUMMARY_OF_CARE_RUBRIC,
+    )
+
+    instructions = prep.template_cache.resolve_instructions(
+        instructions=INSTRUCTION_LIST,
+        details_overrides=DETAIL_INSTRUCTIONS,
+        default_mode=OUTPUT_MODE,
+        mode=mode,
+    )
+
+    suffix_pattern = CACHED_SUFFIX.format(OUTPUT_TEXT="SUMMARY OF INPATIENT CARE")
+    return (
+        prefix_pattern.format(instruction_set=instructions),
+        suffix_pattern.format(clinical_data=compile_clinical_data(sample), output_to_evaluate=sample["summary"]),
+    )
+
+
+@prep.json_from_column(namedtuple_key="guid", required_keys=["summary"])
+def to_cached_prompt(sample):
+    """Resolves the messages laid out for provider prompt caching, with the rubric and rules ahead of the data."""
+    prefix, suffix = resolve_prompt_parts(sample)
+    return prep.prefix_cached_messages(prefix, suffix, system_message=SYSTEM_PROMPT)
+
+
+RUBRIC_SCORES = post.rubric_scores(EPIC_SUMMARY_OF_CARE_RUBRIC)
+
+
+def response_model(mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> type:
+    """Resolves the pydantic model of a summary of care response in the mode, to check with post.validated."""
+    return post.response_model("SummaryOfCareResponse", RUBRIC_SCORES, default_mode=OUTPUT_MODE, mode=mode)
+
+
+def response_format(mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> dict:
+    """Resolves the JSON schema response_format of a summary of care response in the mode, to constrain completions."""
+    return post.response_format(response_model(mode))
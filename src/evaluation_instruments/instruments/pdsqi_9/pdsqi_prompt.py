@@ -1,3 +1,8 @@
+import logging
+from typing import Any, Callable, Optional
+
+from evaluation_instruments import post, prep
+
 # fmt: off
 RUBRIC_SET = """
 <citation>
@@ -149,7 +154,40 @@ Rules to follow:
 {instruction_set}
 
 OUTPUT:
-""" # noqa: E501
+"""  # noqa: E501
+
+# The same prompt reordered so the rubric and rules form a prefix shared by every sample, see resolve_prompt
+CACHED_PREFIX_PATTERN = """Here is your new role and persona:
+You are an expert grading machine, for summaries of clinical notes.
+
+You will read CLINICAL_NOTES and a CLINICAL_SUMMARY of them, written for a clinician with a given specialty. Your task is to grade the CLINICAL_SUMMARY.
+
+Read the following RUBRIC_SET. Your task is to use this RUBRIC_SET to grade the CLINICAL_SUMMARY.
+
+<RUBRIC_SET>
+{RUBRIC_SET}
+<\\RUBRIC_SET>
+
+Rules to follow:
+{instruction_set}
+"""  # noqa: E501
+
+CACHED_SUFFIX_PATTERN = """Read the following CLINICAL_NOTES. They were used to create a CLINICAL_SUMMARY.
+
+<CLINICAL_NOTES>
+{prompt_notes}
+<\\CLINICAL_NOTES>
+
+Read the following CLINICAL_SUMMARY, which is a summary of the above CLINICAL_NOTES for a clinician with specialty {target_specialty}. Your task is to grade this CLINICAL_SUMMARY.
+
+<CLINICAL_SUMMARY>
+{summary_to_evaluate}
+<\\CLINICAL_SUMMARY>
+
+Now, it's time to grade the CLINICAL_SUMMARY, following the rules above.
+
+OUTPUT:
+"""  # noqa: E501
 
 INSTRUCTION_LIST = [
 "- Your task is to grade the CLINICAL_SUMMARY, based on the RUBRIC_SET and the CLINICAL_NOTES being summarized.",
@@ -177,44 +215,104 @@ SYSTEM_PROMPT = """
 You are a summarization quality expert that specializes in text analysis and reasoning. Please start your response with '<think>' at the beginning. Provide your reasoning when generating the final output.
 """
 # fmt: on
-import json
-import logging
-from typing import Any
-from evaluation_instruments import prep
 
 OUTPUT_MODE = prep.OutputMode.SCORE  # Default output mode
 
-def pdsqi_from_file(sample: Any, output_mode: str = 'default') -> list[dict]:
+# The fields each sample file must have, with non-empty values, for the sample to be evaluated
+REQUIRED_KEYS = ["summary", "notes", "target_specialty"]
+
+
+def _sample_path(sample: Any) -> str:
+    return f"{sample.guid}.json"
+
+
+@prep.validates(_sample_path, required_keys=REQUIRED_KEYS)
+@prep.json_loader.prefetches(_sample_path)
+def pdsqi_from_file(sample: Any, output_mode: str = "default", cache_prefix: bool = False) -> list[dict]:
     """
     Main function to resolve a prompt for PDSQI-9 evaluation from an entity-specific file.
+    Files are read through prep.json_loader, so an Evaluation reads the files of upcoming rows in the background,
+    and rows whose file is missing or has an empty field are skipped by the Evaluation before any request is sent.
     The file must be a JSON with keys:
 
     summary: the text to evaluate
     notes: a list of note text that were source for the summary
     target_specialty: the target medical specialty
 
+    To use other options or a packed dataset as a prep_fn, use pdsqi_prep_fn rather than functools.partial, which
+    would drop the prefetch and validation hooks.
+
     Parameters
     ----------
     sample : namedtuple
         Sample object containing guid for file lookup
     output_mode : OutputMode, optional
         Controls the output format (default: OutputMode.DEFAULT)
+    cache_prefix : bool, optional
+        Lays out the prompt for provider prompt caching, see resolve_prompt (default: False)
 
     Returns
     -------
     list[dict]
         The message array to send to the generative model
     """
-    with open(f"{sample.guid}.json", "r") as file:
-        raw_json = json.load(file)
+    return _resolve_record(prep.json_loader.load(_sample_path(sample)), output_mode, cache_prefix)
+
 
+def pdsqi_prep_fn(
+    output_mode: str = "default", cache_prefix: bool = False, packed_path: Optional[str] = None
+) -> Callable:
+    """
+    Binds the options of pdsqi_from_file into a prep_fn carrying the hooks of its data source.
+
+    Without packed_path, samples are read from {guid}.json in the working directory as by pdsqi_from_file. With it,
+    samples are read by guid from a file packed by prep.pack_json_dir, and rows are validated against the index of
+    the pack; there are no files to prefetch.
+
+    Parameters
+    ----------
+    output_mode : OutputMode, optional
+        Controls the output format (default: OutputMode.DEFAULT)
+    cache_prefix : bool, optional
+        Lays out the prompt for provider prompt caching, see resolve_prompt (default: False)
+    packed_path : str, optional
+        A file packed by prep.pack_json_dir to read the samples from (default: None)
+
+    Returns
+    -------
+    Callable
+        The prep_fn to pass to an Evaluation
+    """
+    if packed_path is None:
+
+        def prep_fn(sample: Any) -> list[dict]:
+            return pdsqi_from_file(sample, output_mode, cache_prefix)
+
+        return prep.validates(_sample_path, REQUIRED_KEYS)(prep.json_loader.prefetches(_sample_path)(prep_fn))
+
+    pack = prep.open_packed(packed_path)
+
+    def packed_prep_fn(sample: Any) -> list[dict]:
+        return _resolve_record(pack.load(sample.guid), output_mode, cache_prefix)
+
+    return prep.validates(lambda sample: sample.guid, REQUIRED_KEYS, pack=pack)(packed_prep_fn)
+
+
+def _resolve_record(raw_json: dict, output_mode: str, cache_prefix: bool) -> list[dict]:
     summary = raw_json["summary"]
     notes = list(raw_json["notes"].values())
     target_specialty = raw_json["target_specialty"]
 
-    return resolve_prompt(summary, notes, target_specialty, output_mode)
+    return resolve_prompt(summary, notes, target_specialty, output_mode, cache_prefix)
+
 
-def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty: str, output_mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> list[dict]:
+def resolve_prompt(
+    summary_to_evaluate: str,
+    notes: list[str],
+    target_specialty: str,
+    output_mode: prep.OutputMode = prep.OutputMode.DEFAULT,
+    cache_prefix: bool = False,
+) -> list[dict]:
     """
     Resolves the prompt for PDSQI-9 evaluation.
 
@@ -231,6 +329,10 @@ def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty:
         - DEFAULT: Use the global RETURN_EXPLANATION setting
         - SCORE_ONLY: Return only numeric scores
         - WITH_EXPLANATION: Return scores with explanations
+    cache_prefix : bool, optional
+        When True, the rubric and rules are moved ahead of the notes and summary so that they form a prefix
+        identical for every sample, marked for provider prompt caching. Pair with
+        model_args=prep.prompt_cache_args("pdsqi_9") for providers that accept a cache key. (default: False)
 
     Returns
     -------
@@ -240,27 +342,76 @@ def resolve_prompt(summary_to_evaluate: str, notes: list[str], target_specialty:
     if output_mode != prep.OutputMode.DEFAULT:
         logging.debug("Changing output mode from default deviates from the original published studies.")
 
-    instructions = prep.resolve_instructions(
+    instructions = prep.template_cache.resolve_instructions(
         instructions=INSTRUCTION_LIST,
         details_overrides=DETAIL_INSTRUCTIONS,
         default_mode=OUTPUT_MODE,
-        mode=output_mode
+        mode=output_mode,
     )
 
-    prompt_notes = "\n".join(
-        f"<NoteID:{i+1}>\n" f"Note: {note}\n" f"<\\NoteID:{i+1}>"
-        for i, note in enumerate(notes)
-    )
+    prompt_notes = "\n".join(f"<NoteID:{i+1}>\n" f"Note: {note}\n" f"<\\NoteID:{i+1}>" for i, note in enumerate(notes))
+
+    if cache_prefix:
+        logging.debug("Reordering the prompt for prefix caching deviates from the original published studies.")
+        prefix = CACHED_PREFIX_PATTERN.format(RUBRIC_SET=RUBRIC_SET, instruction_set=instructions)
+        suffix = CACHED_SUFFIX_PATTERN.format(
+            prompt_notes=prompt_notes, summary_to_evaluate=summary_to_evaluate, target_specialty=target_specialty
+        )
+        return prep.prefix_cached_messages(prefix, suffix, system_message=SYSTEM_PROMPT)
 
     prompt = BASE_PROMPT_PATTERN.format(
         prompt_notes=prompt_notes,
         summary_to_evaluate=summary_to_evaluate,
         RUBRIC_SET=RUBRIC_SET,
         target_specialty=target_specialty,
-        instruction_set=instructions
+        instruction_set=instructions,
     )
 
     return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}]
 
+
+RUBRIC_SCORES = post.rubric_scores(RUBRIC_SET)
+
+
+def response_model(output_mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> type:
+    """
+    Resolves the pydantic model of a PDSQI-9 response in the output mode.
+
+    Wrap the post_fn with post.validated(post_fn, response_model()) to return typed records and flag responses with
+    missing criteria or scores outside the rubric. The synthesized criterion also accepts "NA".
+
+    Parameters
+    ----------
+    output_mode : OutputMode|str, optional
+        The output mode the prompt was resolved with (default: OutputMode.DEFAULT)
+
+    Returns
+    -------
+    type
+        The pydantic model of a response
+    """
+    return post.response_model("PDSQI9Response", RUBRIC_SCORES, default_mode=OUTPUT_MODE, mode=output_mode)
+
+
+def response_format(output_mode: prep.OutputMode = prep.OutputMode.DEFAULT) -> dict:
+    """
+    Resolves the JSON schema response_format constraining a PDSQI-9 completion to the output mode.
+
+    Pass it as Evaluation(response_format=...) for providers supporting structured outputs. Models asked to start
+    with '<think>' by the SYSTEM_PROMPT, such as Deepseek R1, may not support it.
+
+    Parameters
+    ----------
+    output_mode : OutputMode|str, optional
+        The output mode the prompt was resolved with (default: OutputMode.DEFAULT)
+
+    Returns
+    -------
+    dict
+        The response_format argument of a chat completion
+    """
+    return post.response_format(response_model(output_mode))
+
+
 class InputError(Exception):
     pass
@@ -4,15 +4,25 @@ from typing import Optional
 
 @dataclass(init=False)
 class TokenUsage:
+    """
+    Token counts of one or more requests.
+
+    cached_tokens is the part of prompt_tokens served from a provider's prompt-prefix cache. When not given directly,
+    it is read from the prompt_tokens_details of OpenAI-style usage or the cache_read_input_tokens of Anthropic-style
+    usage. Any other usage keys are kept in other. Comparisons with == only consider the core counts.
+    """
+
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
 
     def __init__(
         self,
         prompt_tokens: Optional[int] = None,
         completion_tokens: Optional[int] = None,
         total_tokens: Optional[int] = None,
+        cached_tokens: Optional[int] = None,
         **kwargs,
     ):
         self.prompt_tokens = prompt_tokens
@@ -21,6 +31,8 @@ class TokenUsage:
         if self.total_tokens is None and (self.prompt_tokens is not None or self.completion_tokens is not None):
             self.total_tokens = (self.prompt_tokens or 0) + (self.completion_tokens or 0)
 
+        self.cached_tokens = cached_tokens if cached_tokens is not None else _cached_from_details(kwargs)
+
         if kwargs:
             self.other = kwargs
 
@@ -28,10 +40,11 @@ class TokenUsage:
         return f"Total Tokens={self.total_tokens}"
 
     def __repr__(self):
+        cached = "" if self.cached_tokens is None else f", cached_tokens={self.cached_tokens}"
         return (
             f"TokenUsage(prompt_tokens={self.prompt_tokens}, "
             f"completion_tokens={self.completion_tokens}, "
-            f"total_tokens={self.total_tokens})"
+            f"total_tokens={self.total_tokens}{cached})"
         )
 
     def __add__(self, other):
@@ -41,14 +54,15 @@ class TokenUsage:
 
         for attr in self.__dataclass_fields__:
             new_value = None
-            if getattr(self, attr) is not None or getattr(other, attr) is not None:
-                new_value = (getattr(self, attr) or 0) + (getattr(other, attr) or 0)
+            if getattr(self, attr) is not None or getattr(other, attr, None) is not None:
+                new_value = (getattr(self, attr) or 0) + (getattr(other, attr, None) or 0)
             setattr(new_obj, attr, new_value)
 
         return new_obj
 
     def validate_compatible(self, other):
-        for attr in self.__dataclass_fields__:
+        # cached_tokens is optional so objects with only the core counts remain comparable
+        for attr in ("prompt_tokens", "completion_tokens", "total_tokens"):
             if not hasattr(other, attr):
                 raise AttributeError(f"Comparison not supported with {type(other)}")
         return True
@@ -74,7 +88,7 @@ class TokenUsage:
 
         for attr in self.__dataclass_fields__:
             self_value = getattr(self, attr)
-            other_value = getattr(other, attr)
+            other_value = getattr(other, attr, None)
 
             if self_value is not None and other_value is not None:
                 if self_value > other_value:
@@ -90,7 +104,7 @@ class TokenUsage:
         any_larger = self == other  # equal is not strictly less than
         for attr in self.__dataclass_fields__:
             self_value = getattr(self, attr)
-            other_value = getattr(other, attr)
+            other_value = getattr(other, attr, None)
 
             if self_value is not None and other_value is not None:
                 if self_value > other_value:
@@ -99,3 +113,16 @@ class TokenUsage:
 
     def __le__(self, other):
         return self == other or self < other
+
+
+def _cached_from_details(usage: dict) -> Optional[int]:
+    """Reads the cached prompt tokens from provider-specific usage keys."""
+    details = usage.get("prompt_tokens_details")
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens")
+    else:
+        cached = getattr(details, "cached_tokens", None)
+
+    if cached is None:
+        cached = usage.get("cache_read_input_tokens")
+    return cached
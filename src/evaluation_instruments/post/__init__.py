@@ -1,11 +1,15 @@
 import pandas as pd
+from pydantic import BaseModel
+
+from ._extract import extract_json, iter_json_objects
+from ._schema import ScoreRange, response_format, response_model, rubric_scores, validated
 
 def frame_from_evals(full_output: dict) -> pd.DataFrame:
     """
     Convert the output of the evaluation into a DataFrame.
 
     Handles direct, singly valued rubric outputs as well as nested dictionaries of key-value
-    such as {score: int, explanation: str} pairs.
+    such as {score: int, explanation: str} pairs, and the typed records of a response model.
 
     Parameters
     ----------
@@ -21,6 +25,11 @@ def frame_from_evals(full_output: dict) -> pd.DataFrame:
     if not full_output:
         return pd.DataFrame()
 
+    # Responses validated by a response model are dumped back to dictionaries
+    full_output = {
+        row: output.model_dump() if isinstance(output, BaseModel) else output for row, output in full_output.items()
+    }
+
     # Assume that first item is representative of the structure.
     output0 = next(iter(full_output.values()), None)
 
@@ -0,0 +1,110 @@
+import re
+from typing import Iterator
+
+from evaluation_instruments.prep import parse_json
+
+# The only characters that change the state of the scanner; everything between them is skipped at regex speed
+_STRUCTURAL = re.compile(r'[{}"\\]')
+# An unclosed brace that starts like a JSON object is taken as a truncated object rather than prose
+_OBJECT_START = re.compile(r'\{\s*"')
+
+
+def extract_json(content: str) -> dict:
+    """
+    Extracts the JSON object from the text content of a model response.
+
+    The span from the first "{" to the last "}" is tried first, which covers bare and fenced objects and objects
+    surrounded by prose. When that span does not parse, such as when the prose holds stray braces or the response
+    holds several objects, the content is scanned once for balanced objects, ignoring braces within JSON strings.
+    A balanced span that does not parse is searched for the objects nested within it. When several objects are
+    found, as when a model answers each criterion separately, they are merged in order, so later keys win.
+
+    Parsing uses orjson when it is installed.
+
+    Parameters
+    ----------
+    content : str
+        The text content of the response.
+
+    Returns
+    -------
+    dict
+        The extracted object.
+
+    Raises
+    ------
+    ValueError
+        If the content holds no JSON object.
+    """
+    try:
+        parsed = parse_json(content[content.find("{") : content.rfind("}") + 1])  # noqa: E203
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+
+    found = None
+    for obj in iter_json_objects(content):
+        found = obj if found is None else {**found, **obj}
+    if found is None:
+        raise ValueError("No JSON object found in the response content")
+    return found
+
+
+def iter_json_objects(content: str) -> Iterator[dict]:
+    """
+    Yields each JSON object found in text, in order, with a single scan for balanced braces.
+
+    Braces within JSON strings are ignored. Outermost spans are parsed first, and only when one fails to parse
+    are the spans nested within it tried. Objects left open by a truncated response are skipped along with what
+    they hold, while an unclosed brace in prose does not hide the objects after it.
+    """
+    spans, unclosed = _balanced_spans(content)
+    outcome = {start: None if _OBJECT_START.match(content, start) else False for start in unclosed}
+    for start, end, parent in sorted(spans):
+        if parent is not None and outcome[parent] is not False:
+            # Within an object already found, or within an object that was cut off
+            outcome[start] = None
+            continue
+
+        try:
+            parsed = parse_json(content[start:end])
+        except ValueError:
+            parsed = None
+        outcome[start] = isinstance(parsed, dict)
+        if outcome[start]:
+            yield parsed
+
+
+def _balanced_spans(content: str) -> tuple[list[tuple[int, int, int | None]], list[int]]:
+    """
+    Finds each balanced {...} span as (start, end, start of the enclosing brace or None).
+
+    Also returns the positions of the braces that were never closed.
+    """
+    spans = []
+    opened = []
+    in_string = False
+    skip_to = 0
+    for match in _STRUCTURAL.finditer(content):
+        position = match.start()
+        if position < skip_to:
+            continue
+
+        char = content[position]
+        if in_string:
+            if char == "\\":
+                skip_to = position + 2
+            elif char == '"':
+                in_string = False
+        elif char == "{":
+            opened.append(position)
+        elif char == "}":
+            if opened:
+                start = opened.pop()
+                spans.append((start, position + 1, opened[-1] if opened else None))
+        elif char == '"' and opened:
+            # Quotes only delimit strings within braces, so quoted prose does not hide the objects after it
+            in_string = True
+
+    return spans, opened
@@ -0,0 +1,228 @@
+import functools
+import logging
+import re
+from typing import Annotated, Any, Callable, Literal, Mapping, NamedTuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model, model_validator
+
+from evaluation_instruments.prep import OutputMode
+from evaluation_instruments.prep.data_handler import _resolve_mode
+
+logger = logging.getLogger("evaluation")
+
+# A criterion of a rubric string, such as <citation> ... <\citation>
+_CRITERION = re.compile(r"<(\w+)>(.*?)<\\\1>", re.DOTALL)
+# A grade line within a criterion, such as "5 = All assertions can be traced back to the notes" or "NA = ..."
+_GRADE = re.compile(r"^\s*(\d+|[A-Z]+)\s*=", re.MULTILINE)
+
+
+class ScoreRange(NamedTuple):
+    """The grades of a rubric criterion: integers from lowest to highest, and any labels such as "NA"."""
+
+    lowest: int
+    highest: int
+    labels: tuple[str, ...] = ()
+
+
+class _RubricResponse(BaseModel):
+    """The base of response models, matching response keys to criteria regardless of case, such as "Citation"."""
+
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _match_case(cls, data: Any) -> Any:
+        if not isinstance(data, Mapping):
+            return data
+
+        names = {name.lower(): name for name in cls.model_fields}
+        matched = {}
+        for key, value in data.items():
+            name = names.get(key.lower(), key) if isinstance(key, str) else key
+            # A key spelled exactly as the field wins over one differing in case
+            if name not in matched or key == name:
+                matched[name] = value
+        return matched
+
+
+def rubric_scores(rubric: str | Mapping[str, str]) -> dict[str, ScoreRange]:
+    """
+    Reads the grades of each criterion of a rubric from its GRADES lines.
+
+    Parameters
+    ----------
+    rubric : str | Mapping[str, str]
+        Either a single string of <criterion> ... <\\criterion> sections, as the PDSQI-9 RUBRIC_SET, or a mapping
+        of criterion to its section, as the Epic rubrics.
+
+    Returns
+    -------
+    dict[str, ScoreRange]
+        The grades of each criterion, in rubric order.
+
+    Raises
+    ------
+    ValueError
+        If a criterion has no grade lines.
+    """
+    if isinstance(rubric, str):
+        sections = {match[1]: match[2] for match in _CRITERION.finditer(rubric)}
+    else:
+        sections = dict(rubric)
+
+    scores = {}
+    for criterion, section in sections.items():
+        grades = _GRADE.findall(section)
+        numbers = [int(grade) for grade in grades if grade.isdigit()]
+        if not numbers:
+            raise ValueError(f"Criterion {criterion} of the rubric has no grades")
+        labels = tuple(grade for grade in grades if not grade.isdigit())
+        scores[criterion] = ScoreRange(min(numbers), max(numbers), labels)
+    return scores
+
+
+def response_model(
+    name: str,
+    scores: Mapping[str, ScoreRange],
+    default_mode: OutputMode,
+    mode: OutputMode = OutputMode.DEFAULT,
+) -> type[BaseModel]:
+    """
+    Builds the pydantic model of a response to a rubric in an output mode.
+
+    Each criterion is a required field: an integer score within its range, or one of its labels such as "NA", for
+    OutputMode.SCORE, or an object of an explanation and such a score for OutputMode.EXPLAINED_SCORE. Keys match
+    the criteria regardless of case, and keys outside the rubric are dropped.
+    Models are cached, so the validator pydantic compiles for a model is built once and shared by every row.
+
+    Parameters
+    ----------
+    name : str
+        The name of the model class, such as "PDSQI9Response".
+    scores : Mapping[str, ScoreRange]
+        The grades of each criterion, see rubric_scores.
+    default_mode : OutputMode
+        The output mode to use if 'default' is specified, should be set by the instrument.
+    mode : OutputMode, optional
+        The output mode of the responses, by default 'default'
+
+    Returns
+    -------
+    type[BaseModel]
+        The model, whose model_validate checks a parsed response.
+    """
+    mode = _resolve_mode(OutputMode(mode), default_mode)
+    return _response_model(name, tuple((criterion, ScoreRange(*grades)) for criterion, grades in scores.items()), mode)
+
+
+@functools.lru_cache(maxsize=None)
+def _response_model(name: str, scores: tuple[tuple[str, ScoreRange], ...], mode: OutputMode) -> type[BaseModel]:
+    fields = {}
+    for criterion, grades in scores:
+        score = _explained_score(grades) if mode == OutputMode.EXPLAINED_SCORE else _score(grades)
+        fields[criterion] = (score, ...)
+
+    suffix = "Explained" if mode == OutputMode.EXPLAINED_SCORE else ""
+    return create_model(f"{name}{suffix}", __base__=_RubricResponse, **fields)
+
+
+def _score(grades: ScoreRange) -> Any:
+    score = Annotated[int, Field(ge=grades.lowest, le=grades.highest)]
+    return score | Literal[grades.labels] if grades.labels else score
+
+
+@functools.lru_cache(maxsize=None)
+def _explained_score(grades: ScoreRange) -> type[BaseModel]:
+    return create_model(
+        f"ExplainedScore{grades.lowest}To{grades.highest}{''.join(grades.labels)}",
+        __base__=_RubricResponse,
+        explanation=(str, ...),
+        score=(_score(grades), ...),
+    )
+
+
+def validated(post_fn: Callable, model: type[BaseModel]) -> Callable:
+    """
+    Wraps a post_fn so that each parsed response is validated with a response model.
+
+    Valid responses are returned as instances of the model. A response that is malformed, missing a criterion or
+    holding a score out of range is returned as parsed, so nothing is lost, and its ValidationError is recorded in
+    the invalid dictionary of the wrapper, keyed by sample index. Responses that failed to parse, returned as an
+    empty dict, are recorded as well.
+
+    The wrapper carries a restore hook validating a response already parsed, which Evaluation calls on the records
+    journaled by a checkpointed run, so resumed rows are returned as instances of the model like the others.
+
+    Parameters
+    ----------
+    post_fn : Callable
+        The post_fn to wrap, such as Evaluation.post_process_default.
+    model : type[BaseModel]
+        The response model, see response_model.
+
+    Returns
+    -------
+    Callable
+        The wrapped post_fn, with invalid and restore attributes.
+    """
+
+    def restore(sample_ix: Any, response: Any) -> Any:
+        try:
+            return model.model_validate(response)
+        except ValidationError as error:
+            logger.info(f"{sample_ix}-Response does not match {model.__name__}: {error.error_count()} errors")
+            validating.invalid[sample_ix] = error
+            return response
+
+    @functools.wraps(post_fn)
+    def validating(sample_ix: Any, raw_output: Any) -> tuple[Any, Any]:
+        response, usage = post_fn(sample_ix, raw_output)
+        return restore(sample_ix, response), usage
+
+    validating.invalid = {}
+    validating.restore = restore
+    return validating
+
+
+def response_format(model: type[BaseModel], strict: bool = True) -> dict:
+    """
+    Builds the OpenAI-style response_format constraining completions to the JSON schema of a response model.
+
+    Pass it in the model_args of an Evaluation, or as its response_format, so that providers supporting structured
+    outputs only return an object of the model, such as the bare map of integers of OutputMode.SCORE. The schema is
+    made strict: every criterion is required, no other keys are allowed and titles are left out to save tokens.
+
+    Parameters
+    ----------
+    model : type[BaseModel]
+        The response model, see response_model.
+    strict : bool, optional
+        Asks the provider to enforce the schema rather than follow it as guidance, by default True
+
+    Returns
+    -------
+    dict
+        The response_format argument of a chat completion.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model.__name__, "schema": _strict_schema(model.model_json_schema()), "strict": strict},
+    }
+
+
+def _strict_schema(schema: dict) -> dict:
+    """Closes every object of a schema and removes the keywords strict structured outputs reject or do not need."""
+    schema = {keyword: value for keyword, value in schema.items() if keyword != "title"}
+    if "const" in schema:
+        schema["enum"] = [schema.pop("const")]
+    if "properties" in schema:
+        schema["properties"] = {name: _strict_schema(value) for name, value in schema["properties"].items()}
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    if "$defs" in schema:
+        schema["$defs"] = {name: _strict_schema(value) for name, value in schema["$defs"].items()}
+    if "anyOf" in schema:
+        schema["anyOf"] = [_strict_schema(value) for value in schema["anyOf"]]
+    if "items" in schema:
+        schema["items"] = _strict_schema(schema["items"])
+    return schema
@@ -1,7 +1,15 @@
+from ._loader import JsonLoader, json_loader, parse_json
+from .pack import PackedJson, open_packed, pack_json_dir
+from ._validation import check_json_row, is_empty, validate_json_rows, validates
 from .data_handler import (
+    from_columns,
     json_from_column,
+    prefix_cached_messages,
+    prompt_cache_args,
     prompt_compilation,
     resolve_instructions,
     to_user_messages,
-    OutputMode
+    template_cache,
+    OutputMode,
+    TemplateCache,
 )
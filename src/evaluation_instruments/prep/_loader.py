@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is not installed
+    orjson = None
+
+logger = logging.getLogger("evaluation")
+
+_RAISE = object()
+
+
+def parse_json(content: bytes) -> Any:
+    """Parses JSON content, with orjson when it is installed and the standard library otherwise."""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json, for instance about NaN; defer to json for the result or the error
+            pass
+    return json.loads(content)
+
+
+class JsonLoader:
+    """
+    Loads JSON files, reading ahead on a background thread pool and keeping parsed payloads in an LRU cache.
+
+    Prep functions that read a file per row can hand upcoming rows to prefetch, so the file reads overlap with
+    the completions in flight rather than adding to them. The Evaluation calls the prefetch hook attached by
+    prefetches readahead rows before each row is prepared.
+
+    Loaded payloads are shared between callers and kept until evicted or cleared, so they should not be modified.
+    Each load checks the modification time and size of the file, so a file changed on disk since it was cached is
+    read again rather than returned stale.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        The number of parsed payloads kept, by default 256
+    readahead : int, optional
+        The number of rows to prefetch ahead of the row being prepared, by default 8
+    workers : int, optional
+        The number of threads reading files in the background, by default 4
+    """
+
+    def __init__(self, max_entries: int = 256, readahead: int = 8, workers: int = 4):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+
+        self.max_entries = max_entries
+        self.readahead = readahead
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        # The signature of the file each payload was read from, see _signature, and the payload
+        self._entries: OrderedDict[str, tuple[tuple, Any]] = OrderedDict()
+        self._pending: dict[str, Future] = {}
+        self._executor = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str | Path, default: Any = _RAISE) -> Any:
+        """
+        Returns the parsed contents of a JSON file, waiting on a prefetch of the file if one is running.
+
+        Parameters
+        ----------
+        path : str | Path
+            The JSON file to load.
+        default : Any, optional
+            Returned when the file does not exist; without a default FileNotFoundError is raised.
+        """
+        key = os.path.abspath(path)
+        try:
+            signature = _signature(key)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._pending.pop(key, None)
+            if default is _RAISE:
+                raise
+            return default
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+            future = self._pending.pop(key, None)
+
+        entry = _prefetched(future) if future is not None else None
+        if entry is None or entry[0] != signature:
+            try:
+                entry = _read(key)
+            except FileNotFoundError:
+                if default is _RAISE:
+                    raise
+                return default
+
+        self._store(key, entry)
+        return entry[1]
+
+    def prefetch(self, paths: Iterable[str | Path]):
+        """Starts reading the files in the background, skipping those already loaded or being read."""
+        for path in paths:
+            key = os.path.abspath(path)
+            with self._lock:
+                # A cached file that changed since is read again by load
+                if key in self._entries or key in self._pending:
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="evaluation-json")
+                # Evict abandoned reads so rows that are never loaded do not accumulate
+                if len(self._pending) >= self.max_entries:
+                    self._pending.pop(next(iter(self._pending)))
+                self._pending[key] = self._executor.submit(_read, key)
+
+    def prefetches(self, path_fn: Callable[[Any], str | Path]) -> Callable:
+        """
+        Decorates a prep function with the prefetch hook used by the Evaluation.
+
+        Parameters
+        ----------
+        path_fn : Callable
+            Returns the path of the file the prep function will load for a sample.
+        """
+
+        def decorator(fn):
+            fn.prefetch = lambda sample: self.prefetch([path_fn(sample)])
+            fn.readahead = self.readahead
+            return fn
+
+        return decorator
+
+    def clear(self):
+        """Removes all loaded payloads and abandons running prefetches."""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: str, entry: tuple[tuple, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _signature(path: str) -> tuple[int, int]:
+    """Identifies the version of a file on disk by its modification time and size."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read(path: str) -> tuple[tuple, Any]:
+    """Reads and parses a file, returning its signature as of the read along with the payload."""
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        return (stat.st_mtime_ns, stat.st_size), parse_json(file.read())
+
+
+def _prefetched(future: Future) -> Any:
+    """The entry read by a prefetch, or None if the file was missing when it ran."""
+    try:
+        return future.result()
+    except FileNotFoundError:
+        return None
+
+
+# The loader shared by the prep functions
+json_loader = JsonLoader()
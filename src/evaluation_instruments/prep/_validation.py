@@ -0,0 +1,179 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Optional
+
+from ._loader import JsonLoader, json_loader
+from .pack import PackedJson
+
+
+def is_empty(value: Any) -> bool:
+    """Checks if a field holds no content: None, a blank string, or an empty collection."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, tuple, dict, set)):
+        return len(value) == 0
+    return False
+
+
+def validate_json_rows(
+    samples: list,
+    path_fn: Callable[[Any], Any],
+    required_keys: Optional[Iterable[str]] = None,
+    loader: Optional[JsonLoader] = None,
+    pack: Optional[PackedJson] = None,
+) -> dict:
+    """
+    Checks that the JSON file of each sample exists and that its required keys are present and not empty.
+
+    File existence is checked against one listing of each directory rather than a lookup per file, or against
+    the index of a packed file. Files are only read when there are required keys, on the threads of the loader.
+
+    Parameters
+    ----------
+    samples : list
+        The rows to check, each with an Index.
+    path_fn : Callable
+        Returns the path of the file for a sample, or its record key when reading from a pack.
+    required_keys : Optional[Iterable[str]], optional
+        The keys each file must have with non-empty values, by default None to only check the files exist
+    loader : Optional[JsonLoader], optional
+        The loader used to read files, by default the shared prep.json_loader
+    pack : Optional[PackedJson], optional
+        A packed file to look records up in instead of reading files, by default None
+
+    Returns
+    -------
+    dict
+        The reason each invalid sample fails, keyed by its Index; valid samples are left out.
+    """
+    loader = json_loader if loader is None else loader
+    required_keys = list(required_keys or [])
+    located = [(sample.Index, path_fn(sample)) for sample in samples]
+
+    invalid, present = {}, []
+    exists = (lambda key: key in pack) if pack is not None else _DirectoryListing().exists
+    for sample_ix, path in located:
+        if exists(path):
+            present.append((sample_ix, path))
+        else:
+            invalid[sample_ix] = f"Missing file {path}"
+
+    if not required_keys or not present:
+        return invalid
+
+    load = pack.load if pack is not None else loader.load
+    with ThreadPoolExecutor(max_workers=loader.workers, thread_name_prefix="evaluation-validate") as executor:
+        payloads = executor.map(lambda entry: _load_or_error(load, entry[1]), present)
+        for (sample_ix, path), payload in zip(present, payloads):
+            if (reason := _check_payload(path, payload, required_keys)) is not None:
+                invalid[sample_ix] = reason
+
+    return invalid
+
+
+class _DirectoryListing:
+    """
+    Answers file existence from one listing per directory.
+
+    Names missing from the listing are checked on the filesystem, as a case-insensitive filesystem, such as those
+    of macOS and Windows, opens a file under a name that differs in case from the one listed.
+    """
+
+    def __init__(self):
+        self._listings: dict[str, set] = {}
+
+    def exists(self, path: Any) -> bool:
+        path = os.path.abspath(path)
+        directory, name = os.path.split(path)
+        if directory not in self._listings:
+            self._listings[directory] = set(os.listdir(directory)) if os.path.isdir(directory) else set()
+        return name in self._listings[directory] or os.path.isfile(path)
+
+
+def _load_or_error(load: Callable, path: Any) -> Any:
+    try:
+        return load(path)
+    except (OSError, KeyError, ValueError) as error:
+        return error
+
+
+def _check_payload(path: Any, payload: Any, required_keys: list[str]) -> Optional[str]:
+    if isinstance(payload, Exception):
+        return f"Unreadable file {path}: {payload}"
+    if not isinstance(payload, dict):
+        return f"File {path} does not hold a JSON object"
+
+    missing = [key for key in required_keys if key not in payload]
+    if missing:
+        return f"File {path} is missing keys {missing}"
+    empty = [key for key in required_keys if is_empty(payload[key])]
+    if empty:
+        return f"File {path} has empty fields {empty}"
+    return None
+
+
+def check_json_row(
+    sample: Any,
+    path_fn: Callable[[Any], Any],
+    required_keys: Iterable[str],
+    loader: Optional[JsonLoader] = None,
+    pack: Optional[PackedJson] = None,
+) -> Optional[str]:
+    """
+    Checks that the JSON file of a sample has its required keys present and not empty.
+
+    The file is read through the loader, so a file already prefetched is waited on rather than read again, and
+    the prep function loading it next finds the parsed payload in the cache.
+
+    Parameters
+    ----------
+    sample : Any
+        The row to check.
+    path_fn : Callable
+        Returns the path of the file for a sample, or its record key when reading from a pack.
+    required_keys : Iterable[str]
+        The keys the file must have with non-empty values.
+    loader : Optional[JsonLoader], optional
+        The loader used to read files, by default the shared prep.json_loader
+    pack : Optional[PackedJson], optional
+        A packed file to look records up in instead of reading files, by default None
+
+    Returns
+    -------
+    Optional[str]
+        The reason the sample fails, or None if it is valid.
+    """
+    loader = json_loader if loader is None else loader
+    path = path_fn(sample)
+    payload = _load_or_error(pack.load if pack is not None else loader.load, path)
+    if isinstance(payload, (FileNotFoundError, KeyError)):
+        return f"Missing file {path}"
+    return _check_payload(path, payload, list(required_keys))
+
+
+def validates(
+    path_fn: Callable[[Any], Any],
+    required_keys: Optional[Iterable[str]] = None,
+    loader: Optional[JsonLoader] = None,
+    pack: Optional[PackedJson] = None,
+) -> Callable:
+    """
+    Decorates a prep function with the validation hooks used by the Evaluation.
+
+    The validate hook checks a chunk of rows at once for missing files, see validate_json_rows, before any of
+    them is read. With required_keys, the check hook then checks the fields of each row as it is about to be
+    prepared, see check_json_row, so each file is read once and the first request is not held up reading every
+    file. The Evaluation skips the rows failing either hook, so no request is sent for a missing file or an empty
+    field.
+    """
+    required_keys = list(required_keys or [])
+
+    def decorator(fn):
+        fn.validate = lambda samples: validate_json_rows(samples, path_fn, loader=loader, pack=pack)
+        if required_keys:
+            fn.check = lambda sample: check_json_row(sample, path_fn, required_keys, loader, pack)
+        return fn
+
+    return decorator
@@ -1,10 +1,14 @@
-import json
 import logging
+import threading
 from functools import wraps
 from typing import Callable, Optional
 from pathlib import Path
 from enum import Enum
 
+from ._loader import JsonLoader, json_loader
+from ._validation import validates
+from .pack import is_packed, open_packed
+
 logger = logging.getLogger("evaluation")
 
 class OutputMode(Enum):
@@ -63,13 +67,25 @@ def resolve_instructions(instructions: list,
     return "\n".join([instr for instr in instructions if instr])
 
 
-def json_from_column(prompt_fn: Callable = None, namedtuple_key: str = None, data_path: Optional[str] = None):
+def json_from_column(
+    prompt_fn: Callable = None,
+    namedtuple_key: str = None,
+    data_path: Optional[str] = None,
+    loader: Optional[JsonLoader] = None,
+    required_keys: Optional[list[str]] = None,
+):
     """
     Handles reading a JSON file from a specified path then passing the contents to
     the relevant function. Allows the original function to act as if the JSON file
     contents were passed directly to it.
 
-    Can be used as a decorator or as a function.
+    Can be used as a decorator or as a function. The wrapped function carries the prefetch
+    hook of the loader, so the Evaluation reads the files of upcoming rows in the background.
+    When data_path is a file packed by prep.pack_json_dir, records are read from it by key instead.
+
+    The wrapped function also carries validation hooks, so the Evaluation skips rows whose file is missing
+    or whose required keys are missing or empty rather than sending their prompts. Called directly, a
+    missing file is still passed to the function as an empty dictionary.
 
     Parameters
     ----------
@@ -79,10 +95,22 @@ def json_from_column(prompt_fn: Callable = None, namedtuple_key: str = None, dat
     namedtuple_key : str
         The key to access the filename in the namedtuple, by default None
     data_path : str, optional
-        The path to the directory containing the JSON file, by default None
+        The path to the directory containing the JSON file, or to a packed file, by default None
+    loader : JsonLoader, optional
+        The loader reading and caching the files, by default the shared prep.json_loader
+    required_keys : list[str], optional
+        The keys each file must have with non-empty values for its row to be evaluated, by default None
     """
     if namedtuple_key is None:
         raise ValueError("namedtuple_key must be provided")
+    loader = json_loader if loader is None else loader
+    pack = open_packed(data_path) if data_path is not None and is_packed(data_path) else None
+
+    def json_path(sample: "namedtuple") -> Path:
+        filename = Path(getattr(sample, namedtuple_key)).with_suffix(".json")
+        if data_path:
+            filename = Path(data_path) / filename
+        return filename
 
     def decorator(fn):
         @wraps(fn)
@@ -98,19 +126,65 @@ def json_from_column(prompt_fn: Callable = None, namedtuple_key: str = None, dat
             if not filename:
                 return fn(filename)
 
-            filename = filename.with_suffix(".json")
-            if data_path:
-                filename = Path(data_path) / filename
-
-            if not filename.is_file():
-                raw_json = {}
-            else:  # Open the file and read its contents
-                with filename.open("r") as file:
-                    raw_json = json.load(file)
+            # Read the file contents, or an empty payload when the file is missing
+            if pack is not None:
+                raw_json = pack.load(getattr(sample, namedtuple_key), default={})
+            else:
+                raw_json = loader.load(json_path(sample), default={})
 
             # Call the original function with the file contents
             return fn(raw_json)
 
+        if pack is not None:
+            # Packed records are read from the memory map with no file to prefetch
+            return validates(lambda sample: getattr(sample, namedtuple_key), required_keys, loader, pack)(wrapped)
+        return validates(json_path, required_keys, loader)(loader.prefetches(json_path)(wrapped))
+
+    # When using as a function pass, wrap the first argument
+    if callable(prompt_fn):
+        return decorator(prompt_fn)
+
+    # When using as a decorator, the caller will apply it to the target function
+    return decorator
+
+
+def from_columns(prompt_fn: Callable = None, columns: Optional[dict | list] = None):
+    """
+    Handles selecting named columns from a sample and passing them as arguments to the relevant function.
+    Allows the original function to act as if only the values it needs were passed directly to it, rather than
+    the whole row.
+
+    Can be used as a decorator or as a function.
+
+    Parameters
+    ----------
+    prompt_fn : Callable
+        Function to be called with the column values, by default None
+        When used as a decorator, this is implicitly the target function.
+    columns : dict | list
+        A dictionary mapping argument names to column names, or a list of columns passed as arguments of the same
+        name. The DataFrame index is available as the column 'Index'. Column names must be valid identifiers,
+        as DataFrame.itertuples renames any others.
+    """
+    if not columns:
+        raise ValueError("columns must be provided")
+    column_map = dict(columns) if isinstance(columns, dict) else {column: column for column in columns}
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(sample: "namedtuple"):
+            """
+            The sample is expected to be a namedtuple with each of the mapped columns.
+
+            This is passed in by the evaluation loop for each row of the DataFrame.
+            """
+            try:
+                kwargs = {argument: getattr(sample, column) for argument, column in column_map.items()}
+            except AttributeError as error:
+                raise KeyError(f"Sample is missing a mapped column: {error}") from None
+
+            return fn(**kwargs)
+
         return wrapped
 
     # When using as a function pass, wrap the first argument
@@ -154,6 +228,55 @@ def to_user_messages(prompt_fn: Callable = None, system_message: Optional[str] =
     return decorator
 
 
+def prefix_cached_messages(
+    prefix: str, suffix: str, system_message: Optional[str] = None, cache_control: bool = True
+) -> list[dict]:
+    """
+    Lays out a prompt as a LiteLLM message array whose static part is a byte-identical prefix across rows.
+
+    Providers cache prompt prefixes, discounting the cached tokens, so the rubric and instructions shared by every
+    row should come first and the row-specific content last. The user message holds the prefix and suffix as
+    separate text parts. Providers that cache automatically, such as OpenAI, only need the prefix to be identical;
+    others, such as Anthropic, need the prefix marked with a cache_control breakpoint.
+
+    Parameters
+    ----------
+    prefix : str
+        The static part of the prompt, identical for every row.
+    suffix : str
+        The row-specific part of the prompt.
+    system_message : Optional[str], optional
+        When provided will insert this as the first message with role system, by default None
+    cache_control : bool, optional
+        Whether to mark the end of the prefix with an ephemeral cache_control breakpoint, by default True
+
+    Returns
+    -------
+    list[dict]
+        The message array to send to the generative model.
+    """
+    prefix_part = {"type": "text", "text": prefix}
+    if cache_control:
+        prefix_part["cache_control"] = {"type": "ephemeral"}
+
+    messages = [] if system_message is None else [{"role": "system", "content": system_message}]
+    messages.append({"role": "user", "content": [prefix_part, {"type": "text", "text": suffix}]})
+    return messages
+
+
+def prompt_cache_args(cache_key: str) -> dict:
+    """
+    Returns the model_args hinting a provider to route requests sharing a prompt prefix to the same cache.
+
+    Parameters
+    ----------
+    cache_key : str
+        A key shared by all requests with the same prefix, such as the instrument name.
+        Passed as prompt_cache_key, which OpenAI uses to improve cache hit rates.
+    """
+    return {"prompt_cache_key": cache_key}
+
+
 def prompt_compilation(
     prompt_pattern: str, pattern_kwargs: dict, rubric_library: dict, rubric_keys: Optional[list] = None
 ) -> str:
@@ -197,3 +320,71 @@ def prompt_compilation(
     general_prompt = prompt_pattern.format(**pattern_kwargs)
 
     return general_prompt
+
+
+class TemplateCache:
+    """
+    Memoizes the row-independent steps of resolving a prompt, prompt_compilation and resolve_instructions.
+
+    Both results only depend on their arguments, so an instrument resolving the same pattern for every row can
+    compile it once and leave only the final pattern.format for each row. Entries are keyed on the content of the
+    arguments, so a changed rubric library or instruction list compiles a new entry; call clear to release the
+    compiled entries, for instance after editing prompts interactively.
+    """
+
+    def __init__(self):
+        self._compiled: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def prompt_compilation(
+        self, prompt_pattern: str, pattern_kwargs: dict, rubric_library: dict, rubric_keys: Optional[list] = None
+    ) -> str:
+        """The memoized prompt_compilation; pattern_kwargs is not modified."""
+        key = (
+            "prompt",
+            prompt_pattern,
+            tuple(pattern_kwargs.items()),
+            tuple(rubric_library.items()),
+            None if rubric_keys is None else tuple(rubric_keys),
+        )
+        return self._get(
+            key, lambda: prompt_compilation(prompt_pattern, dict(pattern_kwargs), rubric_library, rubric_keys)
+        )
+
+    def resolve_instructions(
+        self,
+        instructions: list,
+        details_overrides: dict,
+        default_mode: OutputMode,
+        mode: OutputMode = OutputMode.DEFAULT,
+    ) -> str:
+        """The memoized resolve_instructions."""
+        key = ("instructions", tuple(instructions), tuple(details_overrides.items()), default_mode, mode)
+        return self._get(key, lambda: resolve_instructions(instructions, details_overrides, default_mode, mode))
+
+    def clear(self):
+        """Removes all compiled entries."""
+        with self._lock:
+            self._compiled.clear()
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def _get(self, key: tuple, compile_fn: Callable[[], str]) -> str:
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = compile_fn()
+        with self._lock:
+            self._compiled[key] = compiled
+        return compiled
+
+
+# The cache shared by the instruments
+template_cache = TemplateCache()
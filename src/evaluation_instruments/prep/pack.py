@@ -0,0 +1,180 @@
+"""
+Packs a directory of per-sample JSON files into a single JSONL file with an index of record offsets.
+
+Reading one record from the pack is a slice of a memory map rather than an open of its own file, which matters on
+network filesystems at hundreds of thousands of samples:
+
+    python -m evaluation_instruments.prep.pack examples/data examples/data.jsonl
+"""
+
+import argparse
+import json
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterator
+
+from ._loader import parse_json
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+_RAISE = object()
+
+
+def index_path(path: str | Path) -> Path:
+    """The index written alongside a packed file."""
+    return Path(f"{path}{INDEX_SUFFIX}")
+
+
+def record_key(name: Any) -> str:
+    """The key of a record, the relative file path without its .json suffix, as given by a sample or a file."""
+    return Path(name).with_suffix("").as_posix()
+
+
+def pack_json_dir(source_dir: str | Path, output_path: str | Path) -> int:
+    """
+    Packs every JSON file under source_dir into one JSONL file, writing its index alongside.
+
+    Each record is keyed on its path relative to source_dir without the .json suffix, so a file data/abc.json
+    packed from data is read back with the key "abc". Records are re-serialized compactly to fit on one line.
+
+    Parameters
+    ----------
+    source_dir : str | Path
+        The directory holding one JSON file per sample.
+    output_path : str | Path
+        The packed JSONL file to write; the index is written to the same path with .index.json appended.
+
+    Returns
+    -------
+    int
+        The number of records packed.
+    """
+    source_dir, output_path = Path(source_dir), Path(output_path)
+    files = sorted(file for file in source_dir.rglob("*.json") if not file.name.endswith(INDEX_SUFFIX))
+
+    records = {}
+    with open(output_path, "wb") as out:
+        for file in files:
+            record = json.dumps(parse_json(file.read_bytes()), ensure_ascii=False, separators=(",", ":"))
+            record = record.encode("utf-8")
+            records[record_key(file.relative_to(source_dir))] = (out.tell(), len(record))
+            out.write(record + b"\n")
+        size = out.tell()
+
+    with open(index_path(output_path), "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "size": size, "records": records}, f)
+
+    return len(records)
+
+
+class PackedJson:
+    """
+    Reads the records of a file written by pack_json_dir through a read-only memory map.
+
+    Records are parsed on every load; the map is safe to read from multiple threads.
+
+    Parameters
+    ----------
+    path : str | Path
+        The packed JSONL file, with its index alongside.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(index_path(self.path), "rb") as f:
+            index = json.loads(f.read())
+
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {index.get('version')} for {self.path}")
+        if index["size"] != self.path.stat().st_size:
+            raise ValueError(f"The index of {self.path} does not match its size, pack the directory again")
+
+        self._records = {key: tuple(entry) for key, entry in index["records"].items()}
+        self._file = open(self.path, "rb")
+        # An empty file cannot be mapped, and has no records to read
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if index["size"] else None
+
+    def load(self, key: Any, default: Any = _RAISE) -> Any:
+        """
+        Returns the parsed record for a key.
+
+        Parameters
+        ----------
+        key : Any
+            The record key, or a file name that record_key reduces to one.
+        default : Any, optional
+            Returned when there is no such record; without a default KeyError is raised.
+        """
+        entry = self._records.get(record_key(key))
+        if entry is None:
+            if default is _RAISE:
+                raise KeyError(f"No record {key!r} in {self.path}")
+            return default
+
+        offset, length = entry
+        return parse_json(self._map[offset : offset + length])  # noqa: E203
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __contains__(self, key: Any) -> bool:
+        return record_key(key) in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_opened: dict[str, PackedJson] = {}
+_opened_lock = threading.Lock()
+
+
+def open_packed(path: str | Path, reload: bool = False) -> PackedJson:
+    """
+    Returns a PackedJson for the path, shared by every caller so the file is mapped once.
+
+    Parameters
+    ----------
+    path : str | Path
+        The packed JSONL file.
+    reload : bool, optional
+        Maps the file again, needed after it has been repacked, by default False
+    """
+    key = os.path.abspath(path)
+    with _opened_lock:
+        # Readers still holding the previous map keep it until they are done with it
+        if reload or key not in _opened:
+            _opened[key] = PackedJson(key)
+        return _opened[key]
+
+
+def is_packed(path: str | Path) -> bool:
+    """Checks if a data path is a packed file rather than a directory of JSON files."""
+    return Path(path).is_file() and index_path(path).is_file()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source_dir", help="The directory holding one JSON file per sample")
+    parser.add_argument("output_path", help="The packed JSONL file to write")
+    args = parser.parse_args(argv)
+
+    count = pack_json_dir(args.source_dir, args.output_path)
+    print(f"Packed {count} records into {args.output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
+import asyncio
+import contextlib
+import io
 import json
-from unittest.mock import MagicMock, patch
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pandas as pd
 import pytest
 
+from evaluation_instruments import OutputMode, post, prep
 from evaluation_instruments._evaluation import Evaluation
+from evaluation_instruments.execution import (
+    AdaptiveConcurrency,
+    BatchSubmitter,
+    CompletionCache,
+    LocalBatchSubmitter,
+    RateLimiter,
+    RetryPolicy,
+    iter_rows,
+)
 from evaluation_instruments.model import TokenUsage
 
 def example_dict():
@@ -197,9 +212,9 @@ class TestEvaluation:
         # Run the dataset
         outputs, usage = sample_evaluation.run_dataset(df)
 
-        # Should stop after processing just 2 sample (15 is exact so continues)
-        assert len(outputs) == 2
-        assert usage.total_tokens == 30
+        # Should stop before the second sample; 15 used + ~3 prompt + 5 expected completion exceeds 15
+        assert len(outputs) == 1
+        assert usage.total_tokens == 15
 
     def test_adhoc_capacity_limit(self, sample_evaluation):
         """Test that run_dataset stops when capacity is reached."""
@@ -211,9 +226,30 @@ class TestEvaluation:
         # Run the dataset
         outputs, usage = sample_evaluation.run_dataset(df, capacity=35)
 
-        # Should stop after processing just 2 sample (15 is exact so continues)
-        assert len(outputs) == 3
-        assert usage.total_tokens == 45
+        # Should stop before the third sample; 30 used + ~8 projected exceeds 35
+        assert len(outputs) == 2
+        assert usage.total_tokens == 30
+
+    def test_capacity_limit_on_actual_usage(self, sample_evaluation):
+        """Test that run_dataset stops when actual usage exceeds an underestimated reservation."""
+        df = pd.DataFrame({"id": list(range(100)), "data": ["test"] * 100})
+
+        outputs, usage = sample_evaluation.run_dataset(df, capacity=10)
+
+        # The first request is projected at ~3 tokens but uses 15
+        assert len(outputs) == 1
+        assert usage.total_tokens == 15
+
+    def test_capacity_refuses_first_request(self, sample_evaluation):
+        """Test that a request projected beyond capacity is never sent."""
+        sample_evaluation.prep_fn = MagicMock(return_value="x" * 400)
+        df = pd.DataFrame({"id": list(range(3))})
+
+        outputs, usage = sample_evaluation.run_dataset(df, capacity=50)
+
+        assert outputs == {}
+        assert usage == TokenUsage(0, 0, 0)
+        sample_evaluation._completion_fn.assert_not_called()
 
     @pytest.mark.parametrize(
         "prop_name, expected_attr",
@@ -251,6 +287,1060 @@ class TestEvaluation:
         assert sample_evaluation.capacity.total_tokens == 150
 
 
+class TestThreadedRunDataset:
+    def test_workers_merge_outputs_in_row_order(self, sample_evaluation):
+        def slow_completion(model, messages, **kwargs):
+            # Later rows finish first so completion order differs from row order
+            time.sleep(0.005 * (10 - messages))
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: sample.id
+        sample_evaluation.completion_fn = slow_completion
+        df = pd.DataFrame({"id": list(range(10))}, index=[f"row{i}" for i in range(10)])
+
+        outputs, usage = sample_evaluation.run_dataset(df, workers=4)
+
+        assert list(outputs) == [f"row{i}" for i in range(10)]
+        assert sample_evaluation._post_fn.call_count == 10
+        assert usage == TokenUsage(100, 50, 150)
+
+    def test_workers_bound_in_flight(self, sample_evaluation):
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def counting_completion(model, messages, **kwargs):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return example_dict()
+
+        sample_evaluation.completion_fn = counting_completion
+        df = pd.DataFrame({"id": list(range(12))})
+
+        outputs, _ = sample_evaluation.run_dataset(df, workers=3)
+
+        assert len(outputs) == 12
+        assert 1 < peak <= 3
+
+    def test_workers_stop_submitting_after_capacity(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(100))})
+
+        outputs, usage = sample_evaluation.run_dataset(df, capacity=15, workers=1)
+
+        assert len(outputs) == 1
+        assert usage.total_tokens == 15
+
+    def test_workers_reserve_before_dispatch(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(100))})
+        sample_evaluation._model_args = {"max_tokens": 5}
+
+        outputs, usage = sample_evaluation.run_dataset(df, capacity=80, workers=16)
+
+        # Each request reserves ~8 tokens and uses 15, so in-flight requests can't overshoot by a full window
+        assert sample_evaluation._completion_fn.call_count < 16
+        assert len(outputs) == sample_evaluation._completion_fn.call_count
+
+    def test_workers_share_single_log_dir(self, sample_evaluation, tmp_path):
+        sample_evaluation.post_fn = sample_evaluation.post_process_default
+        sample_evaluation.log_enabled = True
+        df = pd.DataFrame({"id": list(range(20))})
+
+        with patch("tempfile.gettempdir", return_value=tmp_path):
+            outputs, _ = sample_evaluation.run_dataset(df, workers=8)
+
+        log_dirs = list((tmp_path / "evaluation_logs").iterdir())
+        assert len(log_dirs) == 1
+        (segment,) = log_dirs[0].glob("responses-*.jsonl")
+        lines = segment.read_text().splitlines()
+        assert sorted(json.loads(line)["sample_ix"] for line in lines) == list(range(20))
+        assert len(outputs) == 20
+
+    def test_invalid_workers(self, sample_evaluation):
+        with pytest.raises(ValueError, match="workers"):
+            sample_evaluation.run_dataset(pd.DataFrame({"id": [1]}), workers=0)
+
+
+class TestCompletionCache:
+    def test_rerun_served_from_cache(self, sample_evaluation, tmp_path):
+        sample_evaluation.cache = CompletionCache(tmp_path / "cache.sqlite")
+        sample_evaluation.prep_fn = lambda sample: [{"role": "user", "content": str(sample.id)}]
+        df = pd.DataFrame({"id": [1, 2, 2]})
+
+        first_outputs, first_usage = sample_evaluation.run_dataset(df, model="m")
+        second_outputs, second_usage = sample_evaluation.run_dataset(df, model="m")
+
+        # The duplicated prompt is cached on the first pass
+        assert sample_evaluation._completion_fn.call_count == 2
+        assert first_usage == TokenUsage(20, 10, 30)
+        assert second_usage == TokenUsage(0, 0, 0)
+        assert second_outputs == first_outputs
+        assert sample_evaluation._post_fn.call_count == 6
+
+    def test_cache_keyed_on_model(self, sample_evaluation, tmp_path):
+        sample_evaluation.cache = CompletionCache(tmp_path / "cache.sqlite")
+        df = pd.DataFrame({"id": [1]})
+
+        sample_evaluation.run_dataset(df, model="a")
+        sample_evaluation.run_dataset(df, model="b")
+
+        assert sample_evaluation._completion_fn.call_count == 2
+
+    def test_async_uses_cache(self, sample_evaluation, tmp_path):
+        sample_evaluation.cache = CompletionCache(tmp_path / "cache.sqlite")
+        sample_evaluation.completion_fn = AsyncMock(return_value=example_dict())
+        df = pd.DataFrame({"id": [1]})
+
+        asyncio.run(sample_evaluation.arun_dataset(df))
+        _, usage = asyncio.run(sample_evaluation.arun_dataset(df))
+
+        assert sample_evaluation.completion_fn.await_count == 1
+        assert usage == TokenUsage(0, 0, 0)
+
+
+class TestCheckpoint:
+    @staticmethod
+    def failing_after(n):
+        calls = 0
+
+        def completion(model, messages, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls > n:
+                raise RuntimeError("provider went away")
+            return example_dict()
+
+        return completion
+
+    def test_resume_skips_journaled_rows(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        df = pd.DataFrame({"id": list(range(5))}, index=list("abcde"))
+
+        sample_evaluation.completion_fn = self.failing_after(3)
+        with pytest.raises(RuntimeError):
+            sample_evaluation.run_dataset(df, run_id="run1")
+
+        sample_evaluation.completion_fn = MagicMock(return_value=example_dict())
+        outputs, usage = sample_evaluation.run_dataset(df, run_id="run1")
+
+        assert sample_evaluation.completion_fn.call_count == 2
+        assert list(outputs) == list("abcde")
+        assert usage == TokenUsage(50, 25, 75)
+        assert (tmp_path / "run1.jsonl").is_file()
+
+    def test_resume_validated_records(self, sample_evaluation, tmp_path):
+        model = post.response_model("Test", {"citation": post.ScoreRange(1, 5)}, OutputMode.EXPLAINED_SCORE)
+        sample_evaluation._checkpoint_dir = tmp_path
+        sample_evaluation.post_fn = post.validated(sample_evaluation.post_process_default, model)
+        df = pd.DataFrame({"id": list(range(3))}, index=list("abc"))
+        content = {"citation": {"explanation": "Traced to the notes.", "score": 4}}
+        response = {**example_dict(), "choices": [{"message": {"content": json.dumps(content)}}]}
+
+        failure = RuntimeError("provider went away")
+        sample_evaluation.completion_fn = MagicMock(side_effect=[response, response, failure])
+        with pytest.raises(RuntimeError):
+            sample_evaluation.run_dataset(df, run_id="run1")
+
+        sample_evaluation.completion_fn = MagicMock(return_value=response)
+        outputs, _ = sample_evaluation.run_dataset(df, run_id="run1")
+
+        # Journaled records are validated again, so they match the record completed after resuming
+        assert sample_evaluation.completion_fn.call_count == 1
+        assert all(type(output) is model for output in outputs.values())
+        assert outputs["a"] == outputs["b"] == outputs["c"]
+        assert outputs["a"].model_dump() == content
+        assert (post.frame_from_evals(outputs)[("citation", "score")] == 4).all()
+
+    def test_restored_usage_counts_toward_capacity(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        df = pd.DataFrame({"id": list(range(5))})
+        sample_evaluation.run_dataset(df.iloc[:2], run_id="run1")
+        sample_evaluation.completion_fn.reset_mock()
+
+        outputs, usage = sample_evaluation.run_dataset(df, run_id="run1", capacity=35)
+
+        # 30 restored + ~8 projected for the third row exceeds 35
+        assert sample_evaluation.completion_fn.call_count == 0
+        assert len(outputs) == 2
+        assert usage.total_tokens == 30
+
+    def test_other_run_id_starts_over(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        df = pd.DataFrame({"id": list(range(3))})
+
+        sample_evaluation.run_dataset(df, run_id="run1")
+        sample_evaluation.run_dataset(df, run_id="run2")
+
+        assert sample_evaluation.completion_fn.call_count == 6
+
+    def test_threaded_resume(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        df = pd.DataFrame({"id": list(range(6))})
+        sample_evaluation.run_dataset(df.iloc[:4], run_id="run1", workers=2)
+
+        outputs, usage = sample_evaluation.run_dataset(df, run_id="run1", workers=2)
+
+        assert sample_evaluation.completion_fn.call_count == 6
+        assert list(outputs) == list(range(6))
+        assert usage.total_tokens == 90
+
+    def test_async_resume(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        sample_evaluation.completion_fn = AsyncMock(return_value=example_dict())
+        df = pd.DataFrame({"id": list(range(4))})
+        asyncio.run(sample_evaluation.arun_dataset(df.iloc[:3], run_id="run1"))
+
+        outputs, usage = asyncio.run(sample_evaluation.arun_dataset(df, run_id="run1"))
+
+        assert sample_evaluation.completion_fn.await_count == 4
+        assert len(outputs) == 4
+        assert usage.total_tokens == 60
+
+    def test_checkpoint_dir_from_constructor(self, tmp_path):
+        evaluation = Evaluation(checkpoint_dir=tmp_path / "ckpt")
+        assert evaluation._checkpoint_dir == tmp_path / "ckpt"
+
+
+class TestRateLimiter:
+    def test_requests_paced_and_reconciled(self, sample_evaluation):
+        limiter = MagicMock(spec=RateLimiter)
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation.prep_fn = MagicMock(return_value="x" * 40)
+        df = pd.DataFrame({"id": [1, 2]})
+
+        sample_evaluation.run_dataset(df)
+
+        # The first request has no observed completions yet; the second expects 5
+        assert [c.args for c in limiter.acquire.call_args_list] == [(10,), (15,)]
+        assert [c.args for c in limiter.record.call_args_list] == [(10, 15), (15, 15)]
+
+    def test_shared_limiter_across_evaluations(self, sample_evaluation, sample_evaluation_obj):
+        limiter = RateLimiter(requests_per_minute=1200)
+        for _ in range(1200):  # drain the initial burst
+            limiter.acquire()
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation_obj.rate_limiter = limiter
+        df = pd.DataFrame({"id": [1, 2]})
+
+        start = time.monotonic()
+        sample_evaluation.run_dataset(df)
+        sample_evaluation_obj.run_dataset(df)
+
+        # 20 requests per second, so the four requests together wait ~0.2s
+        assert time.monotonic() - start >= 0.15
+
+    def test_async_uses_limiter(self, sample_evaluation):
+        limiter = RateLimiter(requests_per_minute=60)
+        for _ in range(60):
+            limiter.acquire()
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation.completion_fn = AsyncMock(return_value=example_dict())
+
+        asyncio.run(sample_evaluation.arun_dataset(pd.DataFrame({"id": [1]})))
+
+        assert limiter.waited > 0
+
+    def test_each_retry_acquires(self, sample_evaluation):
+        limiter = MagicMock(spec=RateLimiter)
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation.prep_fn = MagicMock(return_value="x" * 40)
+        sample_evaluation.completion_fn = MagicMock(side_effect=[ServerError(), RateLimitError(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        sample_evaluation.run_dataset(pd.DataFrame({"id": [1]}))
+
+        assert [c.args for c in limiter.acquire.call_args_list] == [(10,)] * 3
+        # The throttled attempt is refunded; the successful one is reconciled with its usage
+        assert [c.args for c in limiter.record.call_args_list] == [(10, 0), (10, 15)]
+
+    def test_retries_throttled(self, sample_evaluation):
+        limiter = RateLimiter(requests_per_minute=600)
+        for _ in range(600):  # drain the initial burst
+            limiter.acquire()
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation.completion_fn = MagicMock(side_effect=[ServerError(), ServerError(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        start = time.monotonic()
+        outputs, _ = sample_evaluation.run_dataset(pd.DataFrame({"id": [1]}))
+
+        # 10 requests per second, so the three attempts wait ~0.3s
+        assert list(outputs) == [0]
+        assert time.monotonic() - start >= 0.25
+        assert limiter.waited >= 0.25
+
+    def test_async_retries_throttled(self, sample_evaluation):
+        limiter = RateLimiter(requests_per_minute=600)
+        for _ in range(600):
+            limiter.acquire()
+        sample_evaluation.rate_limiter = limiter
+        sample_evaluation.completion_fn = AsyncMock(side_effect=[ServerError(), ServerError(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        outputs, _ = asyncio.run(sample_evaluation.arun_dataset(pd.DataFrame({"id": [1]})))
+
+        assert list(outputs) == [0]
+        assert limiter.waited >= 0.25
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class TestAdaptiveConcurrency:
+    def test_threaded_window_grows(self, sample_evaluation):
+        def completion(model, messages, **kwargs):
+            time.sleep(0.01)
+            return example_dict()
+
+        sample_evaluation.completion_fn = completion
+        controller = AdaptiveConcurrency(initial=1, maximum=4)
+        df = pd.DataFrame({"id": list(range(20))})
+
+        outputs, _ = sample_evaluation.run_dataset(df, workers=controller)
+
+        assert len(outputs) == 20
+        assert controller.limit == 4
+        assert [limit for _, limit in controller.history] == [1, 2, 3, 4]
+        assert controller.in_flight == 0
+
+    def test_threaded_window_bounds_in_flight(self, sample_evaluation):
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def counting_completion(model, messages, **kwargs):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.005)
+            with lock:
+                in_flight -= 1
+            return example_dict()
+
+        sample_evaluation.completion_fn = counting_completion
+        controller = AdaptiveConcurrency(initial=2, maximum=2)
+
+        sample_evaluation.run_dataset(pd.DataFrame({"id": list(range(10))}), workers=controller)
+
+        assert peak <= 2
+
+    def test_throttling_shrinks_window(self, sample_evaluation):
+        sample_evaluation.completion_fn = MagicMock(side_effect=RateLimitError("slow down"))
+        controller = AdaptiveConcurrency(initial=8, maximum=8, cooldown=0)
+
+        with pytest.raises(RateLimitError):
+            sample_evaluation.run_dataset(pd.DataFrame({"id": [1]}), workers=controller)
+
+        assert controller.limit == 4
+        assert controller.in_flight == 0
+
+    def test_async_window(self, sample_evaluation):
+        in_flight = 0
+        peak = 0
+
+        async def completion(model, messages, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return example_dict()
+
+        sample_evaluation.completion_fn = completion
+        controller = AdaptiveConcurrency(initial=1, maximum=3)
+        df = pd.DataFrame({"id": list(range(12))})
+
+        outputs, _ = asyncio.run(sample_evaluation.arun_dataset(df, max_concurrency=controller))
+
+        assert list(outputs) == list(range(12))
+        assert controller.limit == 3
+        assert peak <= 3
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class TestRetryPolicy:
+    def test_without_policy_errors_raise(self, sample_evaluation):
+        sample_evaluation.completion_fn = MagicMock(side_effect=ServerError())
+
+        with pytest.raises(ServerError):
+            sample_evaluation.run_dataset(pd.DataFrame({"id": [1, 2]}))
+
+    def test_transient_error_retried(self, sample_evaluation):
+        sample_evaluation.completion_fn = MagicMock(side_effect=[ServerError(), example_dict(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        outputs, usage = sample_evaluation.run_dataset(pd.DataFrame({"id": [1, 2]}))
+
+        assert list(outputs) == [0, 1]
+        assert usage == TokenUsage(20, 10, 30)
+        assert sample_evaluation.failures == {}
+
+    def test_failed_rows_recorded(self, sample_evaluation):
+        error = ValueError("bad request")
+        sample_evaluation.completion_fn = MagicMock(side_effect=[example_dict(), error, example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        outputs, usage = sample_evaluation.run_dataset(pd.DataFrame({"id": [1, 2, 3]}))
+
+        assert list(outputs) == [0, 2]
+        assert usage == TokenUsage(20, 10, 30)
+        assert sample_evaluation.failures == {1: error}
+
+    def test_failed_rows_release_reservation(self, sample_evaluation):
+        # Each row reserves ~15 tokens; failed rows must not hold capacity from later ones
+        sample_evaluation.completion_fn = MagicMock(side_effect=[ServerError(), ServerError(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(max_attempts=1)
+
+        outputs, _ = sample_evaluation.run_dataset(pd.DataFrame({"id": [1, 2, 3]}), capacity=20)
+
+        assert list(outputs) == [2]
+        assert set(sample_evaluation.failures) == {0, 1}
+
+    def test_failed_rows_not_journaled(self, sample_evaluation, tmp_path):
+        sample_evaluation._checkpoint_dir = tmp_path
+        sample_evaluation.completion_fn = MagicMock(side_effect=[ServerError(), example_dict()])
+        sample_evaluation.retry_policy = RetryPolicy(max_attempts=1)
+        df = pd.DataFrame({"id": [1, 2]})
+
+        sample_evaluation.run_dataset(df, run_id="run")
+        sample_evaluation.completion_fn = MagicMock(return_value=example_dict())
+        outputs, _ = sample_evaluation.run_dataset(df, run_id="run")
+
+        assert list(outputs) == [0, 1]
+        assert sample_evaluation.completion_fn.call_count == 1
+        assert sample_evaluation.failures == {}
+
+    def test_threaded_timeout_does_not_stall(self, sample_evaluation):
+        release = threading.Event()
+
+        def completion(model, messages, **kwargs):
+            if messages == "stuck":
+                release.wait(5)
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: "stuck" if sample.id == 2 else "test prompt"
+        sample_evaluation.completion_fn = completion
+        sample_evaluation.retry_policy = RetryPolicy(max_attempts=1, timeout=0.05)
+
+        start = time.monotonic()
+        outputs, _ = sample_evaluation.run_dataset(pd.DataFrame({"id": [1, 2, 3]}), workers=2)
+        release.set()
+
+        assert time.monotonic() - start < 1
+        assert sorted(outputs) == [0, 2]
+        assert isinstance(sample_evaluation.failures[1], TimeoutError)
+
+    def test_async_failed_rows_recorded(self, sample_evaluation):
+        error = ValueError("bad request")
+
+        async def completion(model, messages, **kwargs):
+            if messages == "bad":
+                raise error
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: "bad" if sample.id == 2 else "test prompt"
+        sample_evaluation.completion_fn = completion
+        sample_evaluation.retry_policy = RetryPolicy(backoff=0)
+
+        outputs, _ = asyncio.run(sample_evaluation.arun_dataset(pd.DataFrame({"id": [1, 2, 3]})))
+
+        assert list(outputs) == [0, 2]
+        assert sample_evaluation.failures == {1: error}
+
+
+class TestBatch:
+    def test_write_batch(self, sample_evaluation, tmp_path):
+        sample_evaluation._model_args = {"temperature": 0}
+        df = pd.DataFrame({"id": [1, 2]}, index=["a", "b"])
+
+        written = sample_evaluation.write_batch(df, tmp_path / "requests.jsonl", model="gpt")
+
+        lines = [json.loads(line) for line in (tmp_path / "requests.jsonl").read_text().splitlines()]
+        assert written == 2
+        assert [line["custom_id"] for line in lines] == ['"a"', '"b"']
+        assert lines[0]["body"] == {"model": "gpt", "messages": "test prompt", "temperature": 0}
+
+    def test_write_batch_stops_at_capacity(self, sample_evaluation, tmp_path):
+        # Each row is projected at 3 prompt tokens plus max_tokens, so only one fits in 20
+        sample_evaluation._model_args = {"max_tokens": 10}
+        written = sample_evaluation.write_batch(pd.DataFrame({"id": [1, 2, 3]}), tmp_path / "r.jsonl", capacity=20)
+
+        assert written == 1
+
+    def test_run_batch_matches_run_dataset(self, sample_evaluation, tmp_path):
+        df = pd.DataFrame({"id": [1, 2, 3]}, index=[30, 10, 20])
+        expected = sample_evaluation.run_dataset(df)
+        submitter = LocalBatchSubmitter(MagicMock(return_value=example_dict()), output_dir=tmp_path / "batches")
+
+        outputs, usage = sample_evaluation.run_batch(df, submitter, batch_dir=tmp_path)
+
+        assert (outputs, usage) == expected
+        assert list(outputs) == [30, 10, 20]
+        assert (tmp_path / "requests.jsonl").exists()
+        assert (tmp_path / "results.jsonl").exists()
+
+    def test_run_batch_records_failures(self, sample_evaluation, tmp_path):
+        completion_fn = MagicMock(side_effect=[example_dict(), ValueError("broken")])
+        submitter = LocalBatchSubmitter(completion_fn, output_dir=tmp_path)
+
+        outputs, usage = sample_evaluation.run_batch(pd.DataFrame({"id": [1, 2]}), submitter)
+
+        assert list(outputs) == [0]
+        assert usage == TokenUsage(10, 5, 15)
+        assert list(sample_evaluation.failures) == [1]
+
+    @patch("evaluation_instruments._evaluation.time.sleep")
+    def test_run_batch_polls(self, mock_sleep, sample_evaluation, tmp_path):
+        class SlowSubmitter(BatchSubmitter):
+            def __init__(self):
+                self.checks = 0
+
+            def submit(self, input_path):
+                self.lines = input_path.read_text().splitlines()
+                return "batch-1"
+
+            def retrieve(self, batch_id, output_path):
+                self.checks += 1
+                if self.checks < 3:
+                    return False
+                body = {"status_code": 200, "body": example_dict()}
+                output_path.write_text(
+                    "".join(json.dumps({"custom_id": json.loads(line)["custom_id"], "response": body}) + "\n"
+                            for line in self.lines)
+                )
+                return True
+
+        outputs, _ = sample_evaluation.run_batch(pd.DataFrame({"id": [1]}), SlowSubmitter(), poll_interval=5)
+
+        assert list(outputs) == [0]
+        assert mock_sleep.call_count == 2
+        mock_sleep.assert_called_with(5)
+
+    def test_run_batch_empty(self, sample_evaluation):
+        submitter = MagicMock()
+
+        assert sample_evaluation.run_batch(pd.DataFrame(), submitter) == ({}, TokenUsage(0, 0, 0))
+        submitter.submit.assert_not_called()
+
+
+class TestReplayLogs:
+    @pytest.fixture
+    def logged_run(self, sample_evaluation, tmp_path):
+        sample_evaluation.post_fn = sample_evaluation.post_process_default
+        sample_evaluation.log_enabled = True
+        df = pd.DataFrame({"id": [1, 2, 3]}, index=[30, 10, 20])
+        with patch("tempfile.gettempdir", return_value=tmp_path):
+            expected = sample_evaluation.run_dataset(df)
+        return sample_evaluation, df, expected
+
+    def test_matches_run_dataset(self, logged_run):
+        evaluation, df, expected = logged_run
+
+        assert evaluation.replay_logs() == expected
+        assert evaluation.replay_logs(evaluation.tmp_dir, df=df.iloc[::-1]) == (
+            dict(reversed(expected[0].items())),
+            expected[1],
+        )
+        assert evaluation.completion_fn.call_count == 3
+
+    def test_does_not_log_again(self, logged_run):
+        evaluation, _, _ = logged_run
+        evaluation.replay_logs()
+        evaluation.flush_logs()
+
+        (segment,) = evaluation.tmp_dir.glob("responses-*.jsonl")
+        assert len(segment.read_text().splitlines()) == 3
+        assert evaluation.log_enabled
+
+    def test_new_post_fn(self, logged_run):
+        evaluation, _, _ = logged_run
+        evaluation.post_fn = lambda sample_ix, raw: ({"ix": sample_ix}, raw["usage"])
+
+        outputs, usage = evaluation.replay_logs()
+
+        assert outputs == {30: {"ix": 30}, 10: {"ix": 10}, 20: {"ix": 20}}
+        assert usage == TokenUsage(30, 15, 45)
+
+    def test_legacy_files(self, sample_evaluation, tmp_path):
+        sample_evaluation.post_fn = sample_evaluation.post_process_default
+        for sample_ix, timestamp in [("a", "090000"), ("b", "090001"), ("a", "090002")]:
+            (tmp_path / f"{sample_ix}_raw_{timestamp}.json").write_text(json.dumps(example_dict()))
+        df = pd.DataFrame({"id": [1, 2, 3]}, index=["b", "a", "c"])
+
+        outputs, usage = sample_evaluation.replay_logs(tmp_path, df=df)
+
+        assert list(outputs) == ["b", "a"]
+        assert usage == TokenUsage(20, 10, 30)
+
+    def test_records_failures(self, sample_evaluation, tmp_path):
+        (tmp_path / "1_raw_090000.json").write_text(json.dumps(example_dict()))
+        (tmp_path / "2_raw_090000.json").write_text("not json")
+        sample_evaluation.post_fn = sample_evaluation.post_process_default
+
+        outputs, usage = sample_evaluation.replay_logs(tmp_path)
+
+        assert outputs == {1: {"result": "success"}}
+        assert usage == TokenUsage(10, 5, 15)
+        assert list(sample_evaluation.failures) == [2]
+
+    def test_requires_log_dir(self, sample_evaluation):
+        with pytest.raises(ValueError, match="log_dir"):
+            sample_evaluation.replay_logs()
+
+
+class TestLogSinkLifecycle:
+    @pytest.fixture
+    def logging_evaluation(self, sample_evaluation, tmp_path):
+        sample_evaluation.post_fn = sample_evaluation.post_process_default
+        sample_evaluation.log_enabled = True
+        with patch("tempfile.gettempdir", return_value=tmp_path):
+            yield sample_evaluation
+
+    @staticmethod
+    def sink_threads():
+        return [thread for thread in threading.enumerate() if thread.name == "evaluation-log-sink"]
+
+    def test_runs_close_sink(self, logging_evaluation):
+        before = len(self.sink_threads())
+        df = pd.DataFrame({"id": [1, 2]})
+
+        for _ in range(5):
+            logging_evaluation.run_dataset(df)
+        asyncio.run(logging_evaluation.arun_dataset(df))
+
+        assert len(self.sink_threads()) == before
+        assert logging_evaluation._log_sink is None
+        index = [json.loads(line) for line in (logging_evaluation.tmp_dir / "index.jsonl").read_text().splitlines()]
+        assert [entry["entries"] for entry in index] == [2] * 6
+        assert len(list(logging_evaluation.tmp_dir.glob("responses-*.jsonl"))) == 6
+
+    def test_abandoned_iteration_closes_sink(self, logging_evaluation):
+        results = logging_evaluation.iter_dataset(pd.DataFrame({"id": [1, 2, 3]}))
+        next(results)
+        results.close()
+
+        assert logging_evaluation._log_sink is None
+        assert (logging_evaluation.tmp_dir / "index.jsonl").exists()
+
+    def test_context_manager_closes(self, logging_evaluation):
+        with logging_evaluation as evaluation:
+            evaluation._dump_to_temp(sample_ix="a", raw_content={"test": "data"})
+            sink = evaluation._log_sink
+            assert sink is not None
+
+        assert evaluation._log_sink is None
+        assert not sink._thread.is_alive()
+        assert (evaluation.tmp_dir / "index.jsonl").exists()
+
+    def test_close_without_logs(self, sample_evaluation):
+        sample_evaluation.close()
+
+        assert sample_evaluation.tmp_dir is None
+
+
+class TestPrefetch:
+    @staticmethod
+    def recording_prep(events, readahead):
+        def prep_fn(sample):
+            events.append(("prep", sample.Index))
+            return "test prompt"
+
+        prep_fn.prefetch = lambda sample: events.append(("prefetch", sample.Index))
+        prep_fn.readahead = readahead
+        return prep_fn
+
+    def test_prefetches_readahead_rows(self, sample_evaluation):
+        events = []
+        sample_evaluation.prep_fn = self.recording_prep(events, readahead=2)
+
+        sample_evaluation.run_dataset(pd.DataFrame({"id": range(4)}))
+
+        assert events == [
+            ("prefetch", 0), ("prefetch", 1), ("prefetch", 2), ("prep", 0),
+            ("prefetch", 3), ("prep", 1), ("prep", 2), ("prep", 3),
+        ]
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_every_row_prefetched_once(self, sample_evaluation, workers):
+        events = []
+        sample_evaluation.prep_fn = self.recording_prep(events, readahead=3)
+
+        outputs, _ = sample_evaluation.run_dataset(pd.DataFrame({"id": range(5)}), workers=workers)
+
+        assert sorted(ix for event, ix in events if event == "prefetch") == list(range(5))
+        assert list(outputs) == list(range(5))
+
+    def test_json_from_column_rows_prefetched(self, sample_evaluation, tmp_path):
+        from evaluation_instruments import prep
+
+        for guid in ("a", "b"):
+            (tmp_path / f"{guid}.json").write_text(json.dumps({"guid": guid}))
+        loader = prep.JsonLoader()
+        sample_evaluation.prep_fn = prep.json_from_column(
+            lambda data: data["guid"], namedtuple_key="guid", data_path=tmp_path, loader=loader
+        )
+
+        sample_evaluation.run_dataset(pd.DataFrame({"guid": ["a", "b"]}))
+
+        assert sample_evaluation.completion_fn.call_args_list[1].kwargs["messages"] == "b"
+        assert loader._executor is not None
+
+
+class TestRowSources:
+    @staticmethod
+    def records(consumed=None):
+        for guid in ["a", "b", "c"]:
+            if consumed is not None:
+                consumed.append(guid)
+            yield {"guid": guid}
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_run_dataset_records(self, sample_evaluation, workers):
+        sample_evaluation.prep_fn = lambda sample: sample.guid
+
+        outputs, usage = sample_evaluation.run_dataset(self.records(), workers=workers)
+
+        assert list(outputs) == [0, 1, 2]
+        assert usage == TokenUsage(30, 15, 45)
+        prompts = sorted(call.kwargs["messages"] for call in sample_evaluation.completion_fn.call_args_list)
+        assert prompts == ["a", "b", "c"]
+
+    def test_run_dataset_keyed_rows(self, sample_evaluation):
+        outputs, _ = sample_evaluation.run_dataset(iter_rows(self.records(), key="guid"))
+
+        assert list(outputs) == ["a", "b", "c"]
+
+    def test_run_dataset_chunked_reader(self, sample_evaluation):
+        reader = pd.read_csv(io.StringIO("guid\na\nb\nc\n"), chunksize=2)
+
+        outputs, _ = sample_evaluation.run_dataset(reader)
+
+        assert list(outputs) == [0, 1, 2]
+
+    def test_rows_consumed_lazily(self, sample_evaluation):
+        consumed = []
+
+        for _ in sample_evaluation.iter_dataset(self.records(consumed)):
+            break
+
+        assert consumed == ["a"]
+
+    def test_empty_iterable(self, sample_evaluation, caplog):
+        assert sample_evaluation.run_dataset(iter([])) == ({}, TokenUsage(0, 0, 0))
+        assert "Empty DataFrame" in caplog.text
+
+    def test_arun_dataset_records(self, sample_evaluation):
+        sample_evaluation.completion_fn = AsyncMock(return_value=example_dict())
+
+        outputs, usage = asyncio.run(sample_evaluation.arun_dataset(self.records(), max_concurrency=2))
+
+        assert list(outputs) == [0, 1, 2]
+        assert usage == TokenUsage(30, 15, 45)
+
+    def test_run_batch_records(self, sample_evaluation, tmp_path):
+        submitter = LocalBatchSubmitter(MagicMock(return_value=example_dict()), output_dir=tmp_path)
+
+        outputs, usage = sample_evaluation.run_batch(iter_rows(self.records(), key="guid"), submitter)
+
+        assert list(outputs) == ["a", "b", "c"]
+        assert usage == TokenUsage(30, 15, 45)
+
+
+class TestDryRun:
+    def test_projects_without_completion(self, sample_evaluation):
+        sample_evaluation.prep_fn = lambda sample: "x" * sample.size
+        sample_evaluation._model_args = {"max_tokens": 10}
+        df = pd.DataFrame({"size": [40, 400]}, index=["a", "b"])
+
+        report = sample_evaluation.dry_run(df, model="gpt")
+
+        sample_evaluation.completion_fn.assert_not_called()
+        assert report.rows == {"a": TokenUsage(10, 10, 20), "b": TokenUsage(100, 10, 110)}
+        assert report.total == TokenUsage(110, 20, 130)
+        assert report.percentiles[100] == TokenUsage(100, 10, 110)
+
+    def test_tokenizer(self, sample_evaluation):
+        report = sample_evaluation.dry_run(pd.DataFrame({"id": [1]}), tokenizer=lambda messages: 7)
+
+        assert report.total == TokenUsage(7, 0, 7)
+
+    def test_warns_over_capacity(self, sample_evaluation, caplog):
+        report = sample_evaluation.dry_run(pd.DataFrame({"id": range(5)}), capacity=10)
+
+        assert report.total == TokenUsage(15, 0, 15)
+        assert "exceeds capacity" in caplog.text
+
+    def test_empty(self, sample_evaluation):
+        assert sample_evaluation.dry_run(pd.DataFrame()).total == TokenUsage(0, 0, 0)
+
+
+class TestValidation:
+    @pytest.fixture
+    def validating_evaluation(self, sample_evaluation):
+        def prep_fn(sample):
+            return sample.text
+
+        prep_fn.validate = lambda samples: {s.Index: "empty text" for s in samples if not s.text}
+        sample_evaluation.prep_fn = prep_fn
+        return sample_evaluation
+
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame({"text": ["a", "", "c", ""]}, index=["w", "x", "y", "z"])
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_run_dataset_skips_invalid(self, validating_evaluation, df, workers, caplog):
+        outputs, usage = validating_evaluation.run_dataset(df, workers=workers)
+
+        assert list(outputs) == ["w", "y"]
+        assert usage == TokenUsage(20, 10, 30)
+        assert validating_evaluation.completion_fn.call_count == 2
+        assert validating_evaluation.invalid == {"x": "empty text", "z": "empty text"}
+        assert "Skipping 2 invalid rows of 4" in caplog.text
+
+    def test_arun_dataset_skips_invalid(self, validating_evaluation, df):
+        outputs, _ = asyncio.run(validating_evaluation.arun_dataset(df))
+
+        assert list(outputs) == ["w", "y"]
+        assert list(validating_evaluation.invalid) == ["x", "z"]
+
+    def test_validate_reports_without_running(self, validating_evaluation, df):
+        assert validating_evaluation.validate(df) == {"x": "empty text", "z": "empty text"}
+        validating_evaluation.completion_fn.assert_not_called()
+
+    def test_validated_in_chunks(self, validating_evaluation, df):
+        chunks = []
+        validate = validating_evaluation.prep_fn.validate
+        validating_evaluation.prep_fn.validate = lambda samples: chunks.append(len(samples)) or validate(samples)
+
+        with patch("evaluation_instruments._evaluation.VALIDATION_CHUNK", 3):
+            outputs, _ = validating_evaluation.run_dataset(df)
+
+        assert chunks == [3, 1]
+        assert list(outputs) == ["w", "y"]
+
+    def test_write_batch_and_dry_run_skip_invalid(self, validating_evaluation, df, tmp_path):
+        assert validating_evaluation.write_batch(df, tmp_path / "requests.jsonl") == 2
+        assert list(validating_evaluation.dry_run(df).rows) == ["w", "y"]
+
+    def test_prep_fn_without_hook(self, sample_evaluation, df):
+        assert sample_evaluation.validate(df) == {}
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_check_hook_skips_rows(self, sample_evaluation, df, workers, caplog):
+        def prep_fn(sample):
+            return sample.text
+
+        prep_fn.check = lambda sample: None if sample.text else "empty text"
+        sample_evaluation.prep_fn = prep_fn
+
+        outputs, _ = sample_evaluation.run_dataset(df, workers=workers)
+
+        assert list(outputs) == ["w", "y"]
+        assert sample_evaluation.completion_fn.call_count == 2
+        assert sample_evaluation.invalid == {"x": "empty text", "z": "empty text"}
+        assert "x-Skipping invalid row: empty text" in caplog.text
+        assert sample_evaluation.validate(df) == {"x": "empty text", "z": "empty text"}
+
+    def test_required_keys_read_each_file_once(self, sample_evaluation, tmp_path):
+        loader = prep.JsonLoader(readahead=2)
+        for guid in ["a", "b", "c"]:
+            (tmp_path / f"{guid}.json").write_text(json.dumps({"text": guid if guid != "b" else ""}))
+
+        @prep.json_from_column(namedtuple_key="guid", data_path=tmp_path, loader=loader, required_keys=["text"])
+        def prep_fn(payload):
+            return payload["text"]
+
+        sample_evaluation.prep_fn = prep_fn
+        outputs, _ = sample_evaluation.run_dataset(pd.DataFrame({"guid": ["a", "b", "c"]}))
+
+        assert list(outputs) == [0, 2]
+        assert list(sample_evaluation.invalid) == [1]
+        # The check waits on the prefetch of each file and the prep_fn finds the payload loaded
+        assert (loader.misses, loader.hits) == (3, 2)
+
+
+class TestIterDataset:
+    def test_yields_each_row(self, sample_evaluation):
+        df = pd.DataFrame({"id": [1, 2, 3]}, index=["a", "b", "c"])
+
+        results = list(sample_evaluation.iter_dataset(df))
+
+        assert [sample_ix for sample_ix, _, _ in results] == ["a", "b", "c"]
+        assert all(response == {"result": "success"} for _, response, _ in results)
+        assert all(usage == TokenUsage(10, 5, 15) for _, _, usage in results)
+
+    def test_is_lazy(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(10))})
+
+        iterator = sample_evaluation.iter_dataset(df)
+        assert sample_evaluation._completion_fn.call_count == 0
+
+        next(iterator)
+        next(iterator)
+        iterator.close()
+
+        assert sample_evaluation._completion_fn.call_count == 2
+
+    def test_early_stop_with_workers(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(100))})
+
+        for count, _ in enumerate(sample_evaluation.iter_dataset(df, workers=4), start=1):
+            if count == 5:
+                break
+
+        # Only the rows already in flight when iteration stopped are completed
+        assert sample_evaluation._completion_fn.call_count < 12
+
+    def test_workers_yield_in_completion_order(self, sample_evaluation):
+        def slow_completion(model, messages, **kwargs):
+            time.sleep(0.02 * (2 - messages))
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: sample.id
+        sample_evaluation.completion_fn = slow_completion
+        df = pd.DataFrame({"id": [0, 1, 2]})
+
+        order = [sample_ix for sample_ix, _, _ in sample_evaluation.iter_dataset(df, workers=3)]
+
+        assert order == [2, 1, 0]
+
+    def test_stops_at_capacity(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(100))})
+
+        results = list(sample_evaluation.iter_dataset(df, capacity=35))
+
+        assert len(results) == 2
+        assert sample_evaluation._prep_fn.call_count == 3
+
+    def test_empty(self, sample_evaluation):
+        assert list(sample_evaluation.iter_dataset(pd.DataFrame(columns=["id"]))) == []
+
+    def test_aiter_yields_as_completed(self, sample_evaluation):
+        async def slow_completion(model, messages, **kwargs):
+            await asyncio.sleep(0.01 * (3 - messages))
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: sample.id
+        sample_evaluation.completion_fn = slow_completion
+        df = pd.DataFrame({"id": [0, 1, 2, 3]})
+
+        async def consume():
+            return [sample_ix async for sample_ix, _, _ in sample_evaluation.aiter_dataset(df, max_concurrency=4)]
+
+        assert asyncio.run(consume()) == [3, 2, 1, 0]
+
+    def test_aiter_early_close_cancels(self, sample_evaluation):
+        started = 0
+
+        async def completion(model, messages, **kwargs):
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.001)
+            return example_dict()
+
+        sample_evaluation.completion_fn = completion
+        df = pd.DataFrame({"id": list(range(100))})
+
+        async def consume():
+            async with contextlib.aclosing(sample_evaluation.aiter_dataset(df, max_concurrency=2)) as results:
+                async for count, _ in aenumerate(results):
+                    if count == 3:
+                        break
+
+        asyncio.run(consume())
+        assert started < 10
+
+    def test_aiter_raises_completion_error(self, sample_evaluation):
+        sample_evaluation.completion_fn = AsyncMock(side_effect=RuntimeError("boom"))
+        df = pd.DataFrame({"id": list(range(3))})
+
+        async def consume():
+            return [item async for item in sample_evaluation.aiter_dataset(df)]
+
+        with pytest.raises(RuntimeError, match="boom"):
+            asyncio.run(consume())
+
+
+async def aenumerate(aiterable, start=1):
+    count = start
+    async for item in aiterable:
+        yield count, item
+        count += 1
+
+
+class TestArunDataset:
+    def test_arun_dataset_awaits_async_completion(self, sample_evaluation):
+        sample_evaluation.completion_fn = AsyncMock(return_value=example_dict())
+        df = pd.DataFrame({"id": [1, 2, 3]}, index=["a", "b", "c"])
+
+        outputs, usage = asyncio.run(sample_evaluation.arun_dataset(df, model="m", max_concurrency=2))
+
+        assert sample_evaluation.completion_fn.await_count == 3
+        assert list(outputs) == ["a", "b", "c"]
+        assert usage == TokenUsage(30, 15, 45)
+
+    def test_arun_dataset_runs_sync_completion(self, sample_evaluation):
+        df = pd.DataFrame({"id": [1, 2]})
+
+        outputs, usage = asyncio.run(sample_evaluation.arun_dataset(df))
+
+        assert sample_evaluation._completion_fn.call_count == 2
+        assert len(outputs) == 2
+        assert usage == TokenUsage(20, 10, 30)
+
+    def test_arun_dataset_bounds_in_flight_and_keeps_order(self, sample_evaluation):
+        in_flight = 0
+        peak = 0
+
+        async def slow_completion(model, messages, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            # Later rows finish first so completion order differs from row order
+            await asyncio.sleep(0.01 * (10 - messages))
+            in_flight -= 1
+            return example_dict()
+
+        sample_evaluation.prep_fn = lambda sample: sample.id
+        sample_evaluation.completion_fn = slow_completion
+        df = pd.DataFrame({"id": list(range(10))}, index=list(range(10, 0, -1)))
+
+        outputs, _ = asyncio.run(sample_evaluation.arun_dataset(df, max_concurrency=3))
+
+        assert peak == 3
+        assert list(outputs) == list(range(10, 0, -1))
+
+    def test_arun_dataset_stops_dispatch_after_capacity(self, sample_evaluation):
+        df = pd.DataFrame({"id": list(range(100))})
+
+        outputs, usage = asyncio.run(sample_evaluation.arun_dataset(df, capacity=15, max_concurrency=1))
+
+        assert len(outputs) == 1
+        assert usage.total_tokens == 15
+
+    def test_arun_dataset_empty(self, sample_evaluation, caplog):
+        with caplog.at_level(30, logger="evaluation"):
+            outputs, usage = asyncio.run(sample_evaluation.arun_dataset(pd.DataFrame(columns=["id"])))
+
+        assert outputs == {}
+        assert usage == TokenUsage(0, 0, 0)
+        assert "Empty DataFrame" in caplog.text
+
+    def test_arun_dataset_invalid_concurrency(self, sample_evaluation):
+        with pytest.raises(ValueError, match="max_concurrency"):
+            asyncio.run(sample_evaluation.arun_dataset(pd.DataFrame({"id": [1]}), max_concurrency=0))
+
+
 class Test_PostProcess:
     def test_post_process_default_with_valid_json(self):
         """Test the default post-processing function with valid JSON content."""
@@ -328,10 +1418,71 @@ class Test_PostProcess:
         assert TokenUsage(**usage) == expected_usage
         assert response == expected_output
 
+    def test_post_process_default_scans_prose(self):
+        eval_obj = Evaluation(log_enabled=False)
+        openai_json = {"choices": [{"message": {"content": 'Scores {1-5}: {"key": 1}\n{"other": 2}'}}]}
+
+        response, _ = eval_obj.post_process_default("ix", openai_json)
+
+        assert response == {"key": 1, "other": 2}
+
+    @pytest.mark.parametrize(
+        "content, expected", [('{"key": 1}', {"key": 1}), ('Scores: {"key": 1}', {}), ("[1]", {})]
+    )
+    def test_post_process_default_structured_output(self, content, expected):
+        eval_obj = Evaluation(log_enabled=False, response_format={"type": "json_schema", "json_schema": {}})
+
+        with patch("evaluation_instruments._evaluation.extract_json") as extract:
+            response, _ = eval_obj.post_process_default("ix", {"choices": [{"message": {"content": content}}]})
+
+        assert response == expected
+        extract.assert_not_called()
+
+
+class TestResponseFormat:
+    RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "Test", "schema": {}, "strict": True}}
+
+    def test_forwarded_in_model_args(self, sample_evaluation):
+        evaluation = Evaluation(
+            prep_fn=sample_evaluation.prep_fn,
+            completion_fn=sample_evaluation.completion_fn,
+            log_enabled=False,
+            model_args={"temperature": 0},
+            response_format=self.RESPONSE_FORMAT,
+        )
+
+        outputs, _ = evaluation.run_dataset(pd.DataFrame({"id": [1]}), model="m")
+
+        evaluation.completion_fn.assert_called_once_with(
+            model="m", messages="test prompt", temperature=0, response_format=self.RESPONSE_FORMAT
+        )
+        assert outputs == {0: {"result": "success"}}
+        assert evaluation.structured_output
+
+    def test_written_to_batch(self, tmp_path):
+        evaluation = Evaluation(prep_fn=static_prep, log_enabled=False, response_format=self.RESPONSE_FORMAT)
+
+        evaluation.write_batch(pd.DataFrame({"id": [1]}), tmp_path / "requests.jsonl", model="m")
+
+        request = json.loads((tmp_path / "requests.jsonl").read_text())
+        assert request["body"]["response_format"] == self.RESPONSE_FORMAT
+
+    @pytest.mark.parametrize(
+        "model_args, expected",
+        [
+            ({}, False),
+            ({"response_format": {"type": "text"}}, False),
+            ({"response_format": {"type": "json_object"}}, True),
+            ({"response_format": RESPONSE_FORMAT}, True),
+        ],
+    )
+    def test_structured_output(self, model_args, expected):
+        assert Evaluation(model_args=model_args).structured_output is expected
+
 
 @patch("tempfile.gettempdir")
 def test_dump_to_temp(mock_temp, sample_evaluation, tmp_path):
-    """Test that _dump_to_temp creates proper temp files."""
+    """Test that _dump_to_temp appends to a single response log."""
     mock_temp.return_value = tmp_path
 
     sample_evaluation._dump_to_temp(sample_ix="test_sample", raw_content={"test": "data"})
@@ -341,16 +1492,18 @@ def test_dump_to_temp(mock_temp, sample_evaluation, tmp_path):
     # Enable logging
     sample_evaluation.log_enabled = True
     sample_evaluation._dump_to_temp(sample_ix="test_01", raw_content={"test": "data"})
-    sample_evaluation._dump_to_temp(sample_ix="test_02", raw_content={"test": "data"})
+    log_dir = sample_evaluation._dump_to_temp(sample_ix="test_02", raw_content="not json")
+    sample_evaluation.flush_logs()
 
     tmp_dir_contents = list((tmp_path / "evaluation_logs").iterdir())
-    assert len(tmp_dir_contents) == 1
-
-    log_dir = tmp_dir_contents[0]
-    assert tmp_dir_contents[0].is_dir()
+    assert tmp_dir_contents == [log_dir]
+    assert log_dir.is_dir()
 
-    # Check that the files were created with the expected names
+    # Check that the responses were appended to one segment in order
     log_files = sorted(log_dir.iterdir())
-    assert len(log_files) == 2
-    assert log_files[0].name.startswith("test_01_raw_")
-    assert log_files[1].name.startswith("test_02_raw_")
+    assert len(log_files) == 1 and log_files[0].name.startswith("responses-00000-")
+    entries = [json.loads(line) for line in log_files[0].read_text().splitlines()]
+    assert [(entry["sample_ix"], entry["response"]) for entry in entries] == [
+        ("test_01", {"test": "data"}),
+        ("test_02", "not json"),
+    ]
@@ -0,0 +1,114 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from evaluation_instruments.execution import (
+    LocalBatchSubmitter,
+    OpenAIBatchSubmitter,
+    batch_request,
+    read_batch_results,
+)
+
+
+def write_lines(path, entries):
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+class Test_BatchRequest:
+    def test_format(self):
+        request = batch_request(3, "gpt", [{"role": "user", "content": "hi"}], {"temperature": 0})
+
+        assert request == {
+            "custom_id": "3",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0},
+        }
+
+    @pytest.mark.parametrize("sample_ix", [3, "note-1", ("a", 2)])
+    def test_custom_id_round_trips(self, tmp_path, sample_ix):
+        request = batch_request(sample_ix, "gpt", [], {})
+        path = tmp_path / "out.jsonl"
+        write_lines(path, [{"custom_id": request["custom_id"], "response": {"status_code": 200, "body": {}}}])
+
+        assert [ix for ix, _, _ in read_batch_results(path)] == [sample_ix]
+
+
+class Test_ReadBatchResults:
+    def test_success_and_failures(self, tmp_path):
+        path = tmp_path / "out.jsonl"
+        write_lines(
+            path,
+            [
+                {"custom_id": "1", "response": {"status_code": 200, "body": {"id": "a"}}, "error": None},
+                {"custom_id": "2", "response": None, "error": {"code": "bad", "message": "nope"}},
+                {"custom_id": "3", "response": {"status_code": 500, "body": {}}, "error": None},
+            ],
+        )
+
+        results = list(read_batch_results(path))
+
+        assert results[0] == (1, {"id": "a"}, None)
+        assert results[1][1] is None and "nope" in str(results[1][2])
+        assert results[2][1] is None and "500" in str(results[2][2])
+
+    def test_foreign_custom_id_kept(self, tmp_path):
+        path = tmp_path / "out.jsonl"
+        write_lines(path, [{"custom_id": "request-1", "response": {"status_code": 200, "body": {}}}])
+
+        assert next(read_batch_results(path))[0] == "request-1"
+
+
+class Test_LocalBatchSubmitter:
+    def test_runs_requests(self, tmp_path):
+        completion_fn = MagicMock(side_effect=[{"id": "a"}, ValueError("broken")])
+        submitter = LocalBatchSubmitter(completion_fn, output_dir=tmp_path / "batches")
+        input_path = tmp_path / "in.jsonl"
+        requests = [batch_request(1, "gpt", "one", {"temperature": 0}), batch_request(2, "gpt", "two", {})]
+        write_lines(input_path, requests)
+
+        batch_id = submitter.submit(input_path)
+        assert submitter.retrieve(batch_id, tmp_path / "out.jsonl")
+
+        completion_fn.assert_any_call(model="gpt", messages="one", temperature=0)
+        results = list(read_batch_results(tmp_path / "out.jsonl"))
+        assert results[0] == (1, {"id": "a"}, None)
+        assert results[1][0] == 2 and "broken" in str(results[1][2])
+
+
+class Test_OpenAIBatchSubmitter:
+    def test_submit(self, tmp_path):
+        client = MagicMock()
+        client.files.create.return_value.id = "file-1"
+        client.batches.create.return_value.id = "batch-1"
+        input_path = tmp_path / "in.jsonl"
+        input_path.write_text("{}\n")
+
+        assert OpenAIBatchSubmitter(client).submit(input_path) == "batch-1"
+        client.batches.create.assert_called_once_with(
+            input_file_id="file-1", endpoint="/v1/chat/completions", completion_window="24h"
+        )
+
+    def test_retrieve_pending(self, tmp_path):
+        client = MagicMock()
+        client.batches.retrieve.return_value.status = "in_progress"
+
+        assert not OpenAIBatchSubmitter(client).retrieve("batch-1", tmp_path / "out.jsonl")
+
+    def test_retrieve_failed(self, tmp_path):
+        client = MagicMock()
+        client.batches.retrieve.return_value.status = "expired"
+
+        with pytest.raises(RuntimeError, match="expired"):
+            OpenAIBatchSubmitter(client).retrieve("batch-1", tmp_path / "out.jsonl")
+
+    def test_retrieve_combines_output_and_errors(self, tmp_path):
+        client = MagicMock()
+        batch = client.batches.retrieve.return_value
+        batch.status, batch.output_file_id, batch.error_file_id = "completed", "out", "err"
+        contents = {"out": b'{"custom_id": "1"}', "err": b'{"custom_id": "2"}\n'}
+        client.files.content.side_effect = lambda file_id: MagicMock(content=contents[file_id])
+
+        assert OpenAIBatchSubmitter(client).retrieve("batch-1", tmp_path / "out.jsonl")
+        assert (tmp_path / "out.jsonl").read_text().splitlines() == ['{"custom_id": "1"}', '{"custom_id": "2"}']
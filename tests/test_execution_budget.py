@@ -0,0 +1,92 @@
+import pytest
+
+from evaluation_instruments.execution import TokenBudget, estimate_tokens
+from evaluation_instruments.model import TokenUsage
+
+
+class Test_EstimateTokens:
+    @pytest.mark.parametrize(
+        "messages, expected",
+        [
+            ("", 0),
+            ("abcd", 1),
+            ("abcde", 2),
+            ([{"role": "system", "content": "abcd"}, {"role": "user", "content": "abcdefgh"}], 3),
+            ([{"role": "user", "content": [{"type": "text", "text": "abcdefgh"}]}], 2),
+            (12345678, 2),
+        ],
+    )
+    def test_estimate_by_characters(self, messages, expected):
+        assert estimate_tokens(messages) == expected
+
+
+class Test_TokenBudget:
+    def test_reserve_within_capacity(self):
+        budget = TokenBudget(TokenUsage(None, None, 100), estimator=lambda m: 10)
+
+        first = budget.reserve("a")
+        second = budget.reserve("b")
+
+        assert first is not None and second is not None
+        assert first != second
+        assert budget.outstanding == TokenUsage(20, 0, 20)
+
+    def test_refusal_is_sticky(self):
+        budget = TokenBudget(TokenUsage(None, None, 25), estimator=lambda m: 10)
+
+        assert budget.reserve("a") is not None
+        assert budget.reserve("b") is not None
+        assert budget.reserve("c") is None
+        assert budget.exhausted
+
+        budget.release(0)
+        assert budget.reserve("d") is None
+
+    def test_reconcile_commits_actual_usage(self):
+        budget = TokenBudget(TokenUsage(None, None, 100), estimator=lambda m: 10)
+
+        reservation = budget.reserve("a")
+        budget.reconcile(reservation, TokenUsage(12, 8, 20))
+
+        assert budget.committed == TokenUsage(12, 8, 20)
+        assert budget.outstanding == TokenUsage(0, 0, 0)
+
+    def test_completion_estimate_follows_observed_mean(self):
+        budget = TokenBudget(TokenUsage(None, None, 1000), estimator=lambda m: 10, completion_tokens=50)
+        assert budget.estimate("a") == TokenUsage(10, 50, 60)
+
+        budget.reconcile(budget.reserve("a"), TokenUsage(10, 4))
+        budget.reconcile(budget.reserve("b"), TokenUsage(10, 7))
+
+        assert budget.estimate("c") == TokenUsage(10, 6, 16)
+
+    def test_release_drops_reservation(self):
+        budget = TokenBudget(TokenUsage(None, None, 100), estimator=lambda m: 10)
+
+        budget.release(budget.reserve("a"))
+
+        assert budget.outstanding == TokenUsage(0, 0, 0)
+        assert budget.committed == TokenUsage(0, 0, 0)
+
+    def test_exhausted_when_actual_exceeds_capacity(self):
+        budget = TokenBudget(TokenUsage(None, None, 15), estimator=lambda m: 1)
+
+        budget.reconcile(budget.reserve("a"), TokenUsage(10, 10))
+
+        assert budget.exhausted
+        assert budget.reserve("b") is None
+
+    def test_component_capacity(self):
+        budget = TokenBudget(TokenUsage(15, None, None), estimator=lambda m: 10)
+
+        assert budget.reserve("a") is not None
+        assert budget.reserve("b") is None
+
+    def test_commit_counts_toward_capacity(self):
+        budget = TokenBudget(TokenUsage(None, None, 30), estimator=lambda m: 1)
+
+        budget.commit(TokenUsage(10, 15))
+
+        assert budget.committed == TokenUsage(10, 15, 25)
+        assert budget.estimate("a") == TokenUsage(1, 15, 16)
+        assert budget.reserve("a") is None
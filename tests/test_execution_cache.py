@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from evaluation_instruments.execution import CompletionCache
+
+
+class ResponseObj:
+    def __init__(self, response_dict):
+        self.response_dict = response_dict
+
+    def json(self):
+        return json.dumps(self.response_dict)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(tmp_path / "cache.sqlite")
+    yield cache
+    cache.close()
+
+
+class Test_CompletionCache:
+    def test_key_is_content_addressed(self):
+        messages = [{"role": "user", "content": "hi"}]
+
+        key = CompletionCache.key("m", messages, {"temperature": 0, "seed": 1})
+
+        assert key == CompletionCache.key("m", [{"content": "hi", "role": "user"}], {"seed": 1, "temperature": 0})
+        assert key != CompletionCache.key("other", messages, {"temperature": 0, "seed": 1})
+        assert key != CompletionCache.key("m", messages, {"temperature": 1, "seed": 1})
+
+    def test_miss_returns_none(self, cache):
+        assert cache.get("missing") is None
+        assert cache.misses == 1
+
+    @pytest.mark.parametrize(
+        "raw_output, expected",
+        [
+            ({"choices": []}, {"choices": []}),
+            ('{"choices": []}', {"choices": []}),
+            (ResponseObj({"choices": []}), {"choices": []}),
+            ("not json", "not json"),
+        ],
+    )
+    def test_round_trip(self, cache, raw_output, expected):
+        cache.put("k", raw_output)
+
+        assert cache.get("k") == expected
+        assert cache.hits == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        first = CompletionCache(tmp_path / "cache.sqlite")
+        first.put("k", {"a": 1})
+        first.close()
+
+        second = CompletionCache(tmp_path / "cache.sqlite")
+        assert second.get("k") == {"a": 1}
+        assert second.size == len(json.dumps({"a": 1}))
+        second.close()
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        value = {"content": "x" * 10}
+        entry_size = len(json.dumps(value))
+        cache = CompletionCache(tmp_path / "cache.sqlite", max_bytes=entry_size * 2)
+
+        cache.put("old", value)
+        cache.put("used", value)
+        cache.get("old")  # refresh so "used" is now the least recently used
+        cache.put("new", value)
+
+        assert len(cache) == 2
+        assert cache.get("used") is None
+        assert cache.get("old") == value
+        assert cache.size <= entry_size * 2
+        cache.close()
+
+    def test_replace_does_not_double_count(self, cache):
+        cache.put("k", "abc")
+        cache.put("k", "abcdef")
+
+        assert len(cache) == 1
+        assert cache.size == 6
+
+    def test_clear(self, cache):
+        cache.put("k", "abc")
+        cache.clear()
+
+        assert len(cache) == 0
+        assert cache.size == 0
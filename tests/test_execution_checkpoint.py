@@ -0,0 +1,68 @@
+import numpy as np
+
+from evaluation_instruments.execution import RunJournal, journal_key
+from evaluation_instruments.model import TokenUsage
+
+
+class Test_JournalKey:
+    def test_numpy_and_python_match(self):
+        assert journal_key(np.int64(3)) == journal_key(3)
+
+    def test_tuple_and_list_match(self):
+        # MultiIndex values are tuples but round trip through json as lists
+        assert journal_key(("a", 1)) == journal_key(["a", 1])
+
+    def test_types_distinguished(self):
+        assert journal_key("1") != journal_key(1)
+
+
+class Test_RunJournal:
+    def test_load_missing_is_empty(self, tmp_path):
+        assert RunJournal(tmp_path / "run.jsonl").load() == {}
+
+    def test_append_and_load(self, tmp_path):
+        journal = RunJournal(tmp_path / "nested" / "run.jsonl")
+
+        journal.append("a", {"score": 1}, TokenUsage(10, 5, 15))
+        journal.append(np.int64(2), {"score": 2}, TokenUsage(1, 1))
+
+        loaded = RunJournal(tmp_path / "nested" / "run.jsonl").load()
+        assert loaded[journal_key("a")] == ({"score": 1}, TokenUsage(10, 5, 15))
+        assert loaded[journal_key(2)] == ({"score": 2}, TokenUsage(1, 1, 2))
+
+    def test_cached_tokens_round_trip(self, tmp_path):
+        journal = RunJournal(tmp_path / "run.jsonl")
+
+        journal.append("a", {"score": 1}, TokenUsage(10, 5, 15, cached_tokens=8))
+
+        _, usage = journal.load()[journal_key("a")]
+        assert usage.cached_tokens == 8
+
+    def test_latest_entry_wins(self, tmp_path):
+        journal = RunJournal(tmp_path / "run.jsonl")
+
+        journal.append("a", {"score": 1}, TokenUsage(1, 1))
+        journal.append("a", {"score": 3}, TokenUsage(2, 2))
+
+        assert journal.load() == {journal_key("a"): ({"score": 3}, TokenUsage(2, 2))}
+
+    def test_truncated_line_ignored(self, tmp_path, caplog):
+        journal = RunJournal(tmp_path / "run.jsonl")
+        journal.append("a", {"score": 1}, TokenUsage(1, 1))
+        with journal.path.open("a") as f:
+            f.write('{"sample_ix": "b", "resp')
+
+        with caplog.at_level(30, logger="evaluation"):
+            loaded = journal.load()
+
+        assert list(loaded) == [journal_key("a")]
+        assert "unreadable line 2" in caplog.text
+
+    def test_clear(self, tmp_path):
+        journal = RunJournal(tmp_path / "run.jsonl")
+        journal.append("a", {}, TokenUsage(1, 1))
+
+        journal.clear()
+
+        assert not journal.path.exists()
+        assert journal.load() == {}
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+
+import pytest
+
+from evaluation_instruments.execution import AdaptiveConcurrency, is_rate_limit_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class Test_IsRateLimitError:
+    @pytest.mark.parametrize(
+        "error, expected",
+        [
+            (RateLimitError(), True),
+            (StatusError(429), True),
+            (StatusError(500), False),
+            (ValueError(), False),
+        ],
+    )
+    def test_detection(self, error, expected):
+        assert is_rate_limit_error(error) == expected
+
+
+class Test_AdaptiveConcurrency:
+    @pytest.mark.parametrize(
+        "kwargs", [{"initial": 0}, {"initial": 5, "maximum": 4}, {"minimum": 3, "initial": 2}, {"decrease": 1.0}]
+    )
+    def test_invalid_configuration(self, kwargs):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrency(**kwargs)
+
+    def test_additive_increase_per_window(self):
+        controller = AdaptiveConcurrency(initial=2, maximum=10)
+
+        for _ in range(2):
+            controller.record(1.0)
+        assert controller.limit == 3
+
+        for _ in range(3):
+            controller.record(1.0)
+        assert controller.limit == 4
+
+    def test_increase_capped_at_maximum(self):
+        controller = AdaptiveConcurrency(initial=2, maximum=3)
+
+        for _ in range(20):
+            controller.record(1.0)
+
+        assert controller.limit == 3
+
+    def test_throttle_halves(self):
+        controller = AdaptiveConcurrency(initial=8, cooldown=0)
+
+        controller.record(1.0, throttled=True)
+
+        assert controller.limit == 4
+
+    def test_latency_spike_decreases(self):
+        controller = AdaptiveConcurrency(initial=8, maximum=8, latency_tolerance=2.0, cooldown=0)
+        for _ in range(10):
+            controller.record(1.0)
+
+        controller.record(5.0)
+        controller.record(5.0)
+        assert controller.limit == 8
+
+        controller.record(5.0)
+        assert controller.limit == 4
+
+    def test_single_slow_request_ignored(self):
+        controller = AdaptiveConcurrency(initial=8, maximum=8, cooldown=0)
+
+        for latency in [1.0] * 10 + [5.0, 1.0, 5.0, 5.0, 1.0]:
+            controller.record(latency)
+
+        assert controller.limit == 8
+
+    def test_spread_of_latencies_not_a_spike(self):
+        controller = AdaptiveConcurrency(initial=8, maximum=8, cooldown=0)
+
+        # Completions of varying length, from 0.5s to 8s, in no particular order
+        for i in range(200):
+            controller.record(0.5 * (1 + (i * 7) % 16))
+
+        assert controller.limit == 8
+        assert controller.baseline_latency == 7.5
+
+    def test_no_spike_before_baseline(self):
+        controller = AdaptiveConcurrency(initial=8, maximum=8, cooldown=0)
+
+        for latency in [0.001, 1.0, 1.0, 1.0]:
+            controller.record(latency)
+
+        assert controller.baseline_latency is None
+        assert controller.limit == 8
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [{"latency_percentile": 0}, {"latency_percentile": 101}, {"spike_requests": 0}, {"latency_window": 0}],
+    )
+    def test_invalid_spike_settings(self, kwargs):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrency(**kwargs)
+
+    def test_decrease_floored_at_minimum(self):
+        controller = AdaptiveConcurrency(initial=2, minimum=2, cooldown=0)
+
+        controller.record(1.0, throttled=True)
+
+        assert controller.limit == 2
+
+    def test_cooldown_counts_burst_once(self):
+        clock = FakeClock()
+        controller = AdaptiveConcurrency(initial=16, cooldown=5.0, clock=clock)
+
+        for _ in range(4):
+            controller.record(1.0, throttled=True)
+        assert controller.limit == 8
+
+        clock.now = 6.0
+        controller.record(1.0, throttled=True)
+        assert controller.limit == 4
+
+    def test_history_records_changes(self):
+        clock = FakeClock()
+        controller = AdaptiveConcurrency(initial=2, cooldown=0, clock=clock)
+
+        clock.now = 1.0
+        controller.record(0.5)
+        controller.record(0.5)
+        clock.now = 2.0
+        controller.record(0.5, throttled=True)
+
+        assert controller.history == [(0.0, 2), (1.0, 3), (2.0, 1)]
+
+    def test_window(self):
+        controller = AdaptiveConcurrency(initial=2)
+
+        assert controller.try_acquire()
+        assert controller.try_acquire()
+        assert not controller.try_acquire()
+
+        controller.release()
+        assert controller.in_flight == 1
+        assert controller.try_acquire()
+
+    def test_acquire_blocks_until_release(self):
+        controller = AdaptiveConcurrency(initial=1)
+        controller.acquire()
+        acquired = threading.Event()
+
+        thread = threading.Thread(target=lambda: (controller.acquire(), acquired.set()))
+        thread.start()
+        assert not acquired.wait(0.05)
+
+        controller.release()
+        assert acquired.wait(1)
+        thread.join()
+
+    def test_aacquire_waits_for_release(self):
+        controller = AdaptiveConcurrency(initial=1)
+
+        async def scenario():
+            await controller.aacquire()
+            waiting = asyncio.create_task(controller.aacquire())
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+
+            controller.release()
+            await asyncio.wait_for(waiting, 1)
+
+        asyncio.run(scenario())
+        assert controller.in_flight == 1
+
+    def test_aacquire_woken_by_increase(self):
+        controller = AdaptiveConcurrency(initial=1, maximum=2)
+
+        async def scenario():
+            await controller.aacquire()
+            waiting = asyncio.create_task(controller.aacquire())
+            await asyncio.sleep(0.01)
+
+            controller.record(0.1)  # completes a window, raising the limit to 2
+            await asyncio.wait_for(waiting, 1)
+
+        asyncio.run(scenario())
+        assert controller.in_flight == 2
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from evaluation_instruments.execution import DryRunReport, count_prompt_tokens, estimate_tokens, iter_rows
+from evaluation_instruments.model import TokenUsage
+
+
+def repeat_prep(sample):
+    """A picklable prep function rendering a prompt of sample.size characters."""
+    return "x" * sample.size
+
+
+class Test_DryRunReport:
+    def test_rows_and_total(self):
+        report = DryRunReport.from_prompt_tokens({"a": 10, "b": 30}, completion_tokens=5)
+
+        assert report.rows == {"a": TokenUsage(10, 5, 15), "b": TokenUsage(30, 5, 35)}
+        assert report.total == TokenUsage(40, 10, 50)
+
+    def test_percentiles_by_nearest_rank(self):
+        prompt_tokens = {ix: tokens for ix, tokens in enumerate(range(100, 0, -1))}
+
+        report = DryRunReport.from_prompt_tokens(prompt_tokens, completion_tokens=0, percentiles=(0, 50, 99, 100))
+
+        assert {p: usage.prompt_tokens for p, usage in report.percentiles.items()} == {0: 1, 50: 51, 99: 100, 100: 100}
+
+    def test_empty(self):
+        report = DryRunReport.from_prompt_tokens({}, completion_tokens=5)
+
+        assert report == DryRunReport()
+
+    def test_invalid_percentile(self):
+        with pytest.raises(ValueError, match="percentiles"):
+            DryRunReport.from_prompt_tokens({"a": 1}, completion_tokens=0, percentiles=(101,))
+
+
+class Test_CountPromptTokens:
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame({"size": [4 * n for n in range(1, 8)]}, index=[f"row{n}" for n in range(1, 8)])
+
+    def test_sequential(self, df):
+        counts = list(count_prompt_tokens(iter_rows(df), repeat_prep, estimate_tokens))
+
+        assert counts == [(f"row{n}", n) for n in range(1, 8)]
+
+    def test_tokenizer(self, df):
+        counts = list(count_prompt_tokens(iter_rows(df), repeat_prep, len))
+
+        assert counts[0] == ("row1", 4)
+
+    def test_process_pool_keeps_order(self, df):
+        counts = list(count_prompt_tokens(iter_rows(df), repeat_prep, estimate_tokens, processes=2, chunksize=2))
+
+        assert counts == list(count_prompt_tokens(iter_rows(df), repeat_prep, estimate_tokens))
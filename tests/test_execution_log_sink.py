@@ -0,0 +1,142 @@
+import gzip
+import json
+import threading
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from evaluation_instruments.execution import LogSink
+
+
+def read_entries(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def read_index(directory):
+    return [json.loads(line) for line in (directory / "index.jsonl").read_text().splitlines()]
+
+
+class TestLogSink:
+    def test_writes_in_order(self, tmp_path):
+        sink = LogSink(tmp_path)
+        sink.write(0, {"choices": []})
+        sink.write(np.int64(1), "raw text")
+        sink.flush()
+
+        entries = read_entries(sink.segments[0])
+        assert [(entry["sample_ix"], entry["response"]) for entry in entries] == [
+            (0, {"choices": []}),
+            (1, "raw text"),
+        ]
+        assert all(isinstance(entry["logged"], float) for entry in entries)
+        sink.close()
+
+    def test_write_does_not_block_on_disk(self, tmp_path):
+        sink = LogSink(tmp_path)
+        release = threading.Event()
+        original = sink._write_batch
+
+        def slow_write(batch):
+            release.wait()
+            return original(batch)
+
+        with patch.object(sink, "_write_batch", side_effect=slow_write):
+            for i in range(100):
+                sink.write(i, {"i": i})
+            release.set()
+            sink.close()
+
+        assert [entry["sample_ix"] for entry in read_entries(sink.segments[0])] == list(range(100))
+
+    def test_rolls_segments_with_index(self, tmp_path):
+        sink = LogSink(tmp_path, segment_bytes=200)
+        for i in range(10):
+            sink.write(i, {"content": "x" * 50})
+        sink.close()
+
+        segments = sink.segments
+        assert len(segments) > 1
+        index = read_index(tmp_path)
+        assert [entry["segment"] for entry in index] == [path.name for path in segments]
+        assert [ix for entry in index for ix in entry["sample_ix"]] == list(range(10))
+        assert sum(entry["entries"] for entry in index) == 10
+        assert [e["sample_ix"] for path in segments for e in read_entries(path)] == list(range(10))
+
+    def test_gzip(self, tmp_path):
+        sink = LogSink(tmp_path, compression="gzip")
+        sink.write("a", {"x": 1})
+        # Flushed gzip segments can be decompressed before the sink is closed
+        sink.flush()
+        compressed = sink.segments[0].read_bytes()
+        assert json.loads(zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(compressed))["response"] == {"x": 1}
+
+        sink.write("b", {"x": 2})
+        sink.close()
+        assert [e["sample_ix"] for e in read_entries(sink.segments[0])] == ["a", "b"]
+
+    def test_zstd(self, tmp_path):
+        zstandard = pytest.importorskip("zstandard")
+        sink = LogSink(tmp_path, compression="zstd")
+        sink.write("a", {"x": 1})
+        sink.close()
+
+        with open(sink.segments[0], "rb") as f:
+            content = zstandard.ZstdDecompressor().stream_reader(f).read()
+        assert json.loads(content)["sample_ix"] == "a"
+
+    def test_zstd_requires_package(self, tmp_path):
+        with patch.dict("sys.modules", {"zstandard": None}):
+            with pytest.raises(ImportError, match="zstandard"):
+                LogSink(tmp_path, compression="zstd")
+
+    def test_invalid_compression(self, tmp_path):
+        with pytest.raises(ValueError, match="compression"):
+            LogSink(tmp_path, compression="bz2")
+
+    def test_reused_directory_continues_segments(self, tmp_path):
+        for ix in ("first", "second"):
+            sink = LogSink(tmp_path)
+            sink.write(ix, {})
+            sink.close()
+
+        names = sorted(path.name for path in tmp_path.glob("responses-*"))
+        assert [name.split("-")[1] for name in names] == ["00000", "00001"]
+        assert [entry["sample_ix"] for entry in read_index(tmp_path)] == [["first"], ["second"]]
+
+    def test_shared_directory(self, tmp_path):
+        sinks = [LogSink(tmp_path), LogSink(tmp_path)]
+        for i, sink in enumerate(sinks):
+            sink.write(i, {"sink": i})
+        for sink in sinks:
+            sink.close()
+
+        # Both sinks start at the same number without writing to the same segment
+        segments = [path for sink in sinks for path in sink.segments]
+        assert len(set(segments)) == 2
+        assert all(path.name.startswith("responses-00000-") for path in segments)
+        assert [[entry["sample_ix"] for entry in read_entries(path)] for path in segments] == [[0], [1]]
+        assert sorted(entry["segment"] for entry in read_index(tmp_path)) == sorted(path.name for path in segments)
+
+    def test_closed(self, tmp_path):
+        sink = LogSink(tmp_path)
+        sink.close()
+        sink.close()
+        sink.flush()
+
+        with pytest.raises(RuntimeError, match="closed"):
+            sink.write(0, {})
+
+    def test_write_error_raised_on_flush(self, tmp_path):
+        sink = LogSink(tmp_path)
+        with patch("evaluation_instruments.execution._log_sink.json.dumps", side_effect=TypeError("bad")):
+            sink.write(0, {})
+            with pytest.raises(TypeError, match="bad"):
+                sink.flush()
+
+        sink.write(1, {})
+        sink.close()
+        assert [entry["sample_ix"] for entry in read_entries(sink.segments[0])] == [1]
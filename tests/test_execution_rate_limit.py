@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+
+from evaluation_instruments.execution import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_RateLimiter:
+    @pytest.mark.parametrize("kwargs", [{"requests_per_minute": 0}, {"tokens_per_minute": -5}])
+    def test_invalid_quota(self, kwargs):
+        with pytest.raises(ValueError, match="must be positive"):
+            RateLimiter(**kwargs)
+
+    def test_unlimited_never_waits(self):
+        limiter = RateLimiter()
+
+        assert all(limiter.try_acquire(10_000) == 0 for _ in range(100))
+
+    def test_request_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=60, clock=clock)
+
+        assert all(limiter.try_acquire() == 0 for _ in range(60))
+        assert limiter.try_acquire() == pytest.approx(1.0)
+
+        clock.now = 1.0
+        assert limiter.try_acquire() == 0
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=600, clock=clock)
+
+        assert limiter.try_acquire(500) == 0
+        # 400 more needs 300 refilled tokens at 10 per second
+        assert limiter.try_acquire(400) == pytest.approx(30.0)
+
+        clock.now = 30.0
+        assert limiter.try_acquire(400) == 0
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=100, clock=clock)
+
+        assert limiter.try_acquire(500) == 0
+        # Overdrawn by 400, then waits for the full 100 at 100 per minute
+        assert limiter.try_acquire(500) == pytest.approx(5 * 60.0)
+
+    def test_record_refunds_overestimate(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=100, clock=clock)
+
+        limiter.try_acquire(100)
+        limiter.record(estimated_tokens=100, actual_tokens=40)
+
+        assert limiter.try_acquire(60) == 0
+
+    def test_record_charges_underestimate(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=60, clock=clock)
+
+        limiter.try_acquire(10)
+        limiter.record(estimated_tokens=10, actual_tokens=70)
+
+        # The bucket is overdrawn by 10 tokens so 10 more takes 20 seconds
+        assert limiter.try_acquire(10) == pytest.approx(20.0)
+
+    def test_acquire_sleeps(self):
+        limiter = RateLimiter(requests_per_minute=600)
+        for _ in range(600):
+            limiter.acquire()
+
+        limiter.acquire()
+
+        assert limiter.waited == pytest.approx(0.1, abs=0.02)
+
+    def test_aacquire_sleeps(self):
+        limiter = RateLimiter(requests_per_minute=600)
+        for _ in range(600):
+            limiter.acquire()
+
+        asyncio.run(limiter.aacquire())
+
+        assert limiter.waited > 0
+
+    def test_shared_between_threads(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=50, clock=clock)
+        admitted = []
+
+        def take():
+            admitted.append(sum(limiter.try_acquire() == 0 for _ in range(20)))
+
+        threads = [threading.Thread(target=take) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(admitted) == 50
@@ -0,0 +1,117 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from evaluation_instruments.execution import LogSink, read_response_log
+
+
+def write_legacy(directory, sample_ix, timestamp, content):
+    path = directory / f"{sample_ix}_raw_{timestamp}.json"
+    path.write_text(json.dumps(content) if isinstance(content, dict) else content)
+    return path
+
+
+class TestReadResponseLog:
+    def test_segments(self, tmp_path):
+        sink = LogSink(tmp_path, segment_bytes=100)
+        for i in range(6):
+            sink.write(i, {"content": "x" * 40, "i": i})
+        sink.close()
+
+        assert len(sink.segments) > 1
+        assert list(read_response_log(tmp_path, workers=2)) == [(i, {"content": "x" * 40, "i": i}) for i in range(6)]
+
+    def test_latest_segment_entry_wins(self, tmp_path):
+        sink = LogSink(tmp_path, segment_bytes=100)
+        for i, sample_ix in enumerate(["a", "b", "a", ("t", 1), "b"]):
+            sink.write(sample_ix, {"attempt": i})
+        sink.close()
+
+        assert list(read_response_log(tmp_path)) == [
+            ("a", {"attempt": 2}),
+            (("t", 1), {"attempt": 3}),
+            ("b", {"attempt": 4}),
+        ]
+
+    def test_unfinished_segment(self, tmp_path):
+        sink = LogSink(tmp_path)
+        sink.write(0, {"i": 0})
+        sink.write(1, "raw text")
+        sink.flush()
+        # A partially written line, as from a crash mid-write
+        with open(sink.segments[0], "ab") as f:
+            f.write(b'{"sample_ix": 2, "resp')
+
+        assert not (tmp_path / "index.jsonl").exists()
+        assert list(read_response_log(tmp_path)) == [(0, {"i": 0}), (1, "raw text")]
+        sink.close()
+
+    def test_sinks_sharing_directory(self, tmp_path):
+        first, second = LogSink(tmp_path), LogSink(tmp_path)
+        first.write("a", {"sink": 1})
+        first.write("b", {"sink": 1})
+        first.close()
+        second.write("b", {"sink": 2})
+        second.close()
+        os.utime(first.segments[0], (0, 0))
+
+        # Both segments are numbered 0; the one written last holds the latest response
+        assert sorted(read_response_log(tmp_path)) == [("a", {"sink": 1}), ("b", {"sink": 2})]
+
+    def test_unfinished_gzip_segment(self, tmp_path):
+        sink = LogSink(tmp_path, compression="gzip")
+        sink.write("a", {"x": 1})
+        sink.write("b", {"x": 2})
+        sink.flush()
+
+        assert list(read_response_log(tmp_path)) == [("a", {"x": 1}), ("b", {"x": 2})]
+        sink.close()
+        assert list(read_response_log(tmp_path)) == [("a", {"x": 1}), ("b", {"x": 2})]
+
+    def test_truncated_gzip_segment(self, tmp_path):
+        content = b"".join(json.dumps({"sample_ix": i, "response": {"i": i}}).encode() + b"\n" for i in range(50))
+        compressed = gzip.compress(content)
+        (tmp_path / "responses-00000.jsonl.gz").write_bytes(compressed[: len(compressed) - 20])
+
+        responses = list(read_response_log(tmp_path))
+
+        assert 0 < len(responses) < 50
+        assert responses == [(i, {"i": i}) for i in range(len(responses))]
+
+    def test_zstd_segment(self, tmp_path):
+        pytest.importorskip("zstandard")
+        sink = LogSink(tmp_path, compression="zstd")
+        sink.write(0, {"x": 1})
+        sink.flush()
+
+        assert list(read_response_log(tmp_path)) == [(0, {"x": 1})]
+        sink.close()
+
+    def test_legacy_latest_file_wins(self, tmp_path):
+        write_legacy(tmp_path, 1, "093000", {"attempt": 1})
+        write_legacy(tmp_path, 1, "093005", {"attempt": 2})
+        write_legacy(tmp_path, "row2", "093002", "not json")
+        write_legacy(tmp_path, 3, "093001", {"attempt": 1})
+
+        assert list(read_response_log(tmp_path)) == [(3, {"attempt": 1}), ("row2", "not json"), (1, {"attempt": 2})]
+
+    def test_segments_supersede_legacy(self, tmp_path):
+        write_legacy(tmp_path, 1, "093000", {"attempt": "legacy"})
+        write_legacy(tmp_path, 2, "093000", {"attempt": "legacy"})
+        sink = LogSink(tmp_path)
+        sink.write(1, {"attempt": "segment"})
+        sink.close()
+
+        assert list(read_response_log(tmp_path)) == [(2, {"attempt": "legacy"}), (1, {"attempt": "segment"})]
+
+    def test_many_legacy_files_in_order(self, tmp_path):
+        for i in range(200):
+            write_legacy(tmp_path, i, f"{100000 + i}", {"i": i})
+
+        assert list(read_response_log(tmp_path, workers=3)) == [(i, {"i": i}) for i in range(200)]
+
+    def test_missing_directory(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            list(read_response_log(tmp_path / "missing"))
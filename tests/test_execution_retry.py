@@ -0,0 +1,242 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from evaluation_instruments.execution import RetryPolicy, is_retryable_error
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class Test_IsRetryableError:
+    @pytest.mark.parametrize(
+        "error, expected",
+        [
+            (TimeoutError(), True),
+            (ConnectionResetError(), True),
+            (APIConnectionError(), True),
+            (StatusError(429), True),
+            (StatusError(503), True),
+            (StatusError(400), False),
+            (ValueError(), False),
+        ],
+    )
+    def test_detection(self, error, expected):
+        assert is_retryable_error(error) == expected
+
+
+class Test_RetryPolicy:
+    @pytest.mark.parametrize(
+        "kwargs", [{"max_attempts": 0}, {"timeout": 0}, {"hedge_quantile": 1.0}, {"hedge_quantile": 0}]
+    )
+    def test_invalid_configuration(self, kwargs):
+        with pytest.raises(ValueError):
+            RetryPolicy(**kwargs)
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(backoff=1.0, max_backoff=3.0)
+
+        delays = [policy.backoff_delay(attempt) for attempt in (1, 2, 5) for _ in range(50)]
+
+        assert all(0 <= delay <= 1.0 for delay in delays[:50])
+        assert all(0 <= delay <= 2.0 for delay in delays[50:100])
+        assert all(0 <= delay <= 3.0 for delay in delays[100:])
+        assert len(set(delays)) > 1
+
+    def test_retries_transient_errors(self):
+        policy = RetryPolicy(max_attempts=3, backoff=0)
+        request = MagicMock(side_effect=[StatusError(503), TimeoutError(), "ok"])
+
+        assert policy.call(request) == "ok"
+        assert request.call_count == 3
+        assert policy.retries == 2
+
+    def test_gives_up_after_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2, backoff=0)
+        request = MagicMock(side_effect=StatusError(503))
+
+        with pytest.raises(StatusError):
+            policy.call(request)
+        assert request.call_count == 2
+
+    def test_does_not_retry_permanent_errors(self):
+        policy = RetryPolicy(max_attempts=3, backoff=0)
+        request = MagicMock(side_effect=StatusError(400))
+
+        with pytest.raises(StatusError):
+            policy.call(request)
+        assert request.call_count == 1
+
+    def test_timeout_abandons_stuck_request(self):
+        policy = RetryPolicy(max_attempts=1, timeout=0.05)
+        release = threading.Event()
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            policy.call(lambda: release.wait(5))
+        release.set()
+
+        assert time.monotonic() - start < 1
+
+    def test_timeout_is_retried(self):
+        policy = RetryPolicy(max_attempts=2, timeout=0.05, backoff=0)
+        calls = []
+
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(1)
+            return "ok"
+
+        assert policy.call(request) == "ok"
+        assert len(calls) == 2
+
+    def test_hedge_delay_requires_samples(self):
+        policy = RetryPolicy(hedge_quantile=0.9, hedge_min_samples=10)
+        for latency in range(9):
+            policy._record_latency(latency / 100)
+        assert policy.hedge_delay() is None
+
+        policy._record_latency(0.09)
+        assert policy.hedge_delay() == 0.09
+
+    def test_hedge_returns_first_result(self):
+        policy = RetryPolicy(hedge_quantile=0.5, hedge_min_samples=1)
+        policy._record_latency(0.01)
+        calls = []
+
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(1)
+                return "stuck"
+            return "hedge"
+
+        start = time.monotonic()
+        assert policy.call(request) == "hedge"
+        assert time.monotonic() - start < 0.5
+        assert policy.hedges == 1
+
+    def test_hedge_waits_for_other_request_after_failure(self):
+        policy = RetryPolicy(max_attempts=1, hedge_quantile=0.5, hedge_min_samples=1)
+        policy._record_latency(0.01)
+        calls = []
+
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise StatusError(503)
+            time.sleep(0.2)
+            return "hedge"
+
+        assert policy.call(request) == "hedge"
+
+    def test_admits_each_attempt_and_hedge(self):
+        policy = RetryPolicy(max_attempts=2, backoff=0, hedge_quantile=0.5, hedge_min_samples=1)
+        policy._record_latency(0.01)
+        admitted = []
+        calls = []
+
+        def request():
+            calls.append(1)
+            if len(calls) == 1:
+                raise StatusError(503)
+            if len(calls) == 2:
+                time.sleep(1)
+                return "stuck"
+            return "hedge"
+
+        assert policy.call(request, admit=lambda: admitted.append(1)) == "hedge"
+        assert len(admitted) == 3
+
+    def test_admission_wait_excluded_from_timeout(self):
+        policy = RetryPolicy(max_attempts=1, timeout=0.05)
+
+        assert policy.call(lambda: "ok", admit=lambda: time.sleep(0.1)) == "ok"
+
+
+class Test_RetryPolicyAsync:
+    def test_retries_transient_errors(self):
+        policy = RetryPolicy(max_attempts=3, backoff=0)
+        outcomes = [StatusError(429), "ok"]
+
+        async def request():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert asyncio.run(policy.acall(request)) == "ok"
+        assert policy.retries == 1
+
+    def test_timeout_cancels_request(self):
+        policy = RetryPolicy(max_attempts=1, timeout=0.05)
+        cancelled = []
+
+        async def request():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def scenario():
+            with pytest.raises(TimeoutError):
+                await policy.acall(request)
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+        assert cancelled == [True]
+
+    def test_hedge_cancels_loser(self):
+        policy = RetryPolicy(hedge_quantile=0.5, hedge_min_samples=1)
+        policy._record_latency(0.01)
+        started = []
+        cancelled = []
+
+        async def request():
+            started.append(1)
+            if len(started) == 1:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+            return "hedge"
+
+        async def scenario():
+            result = await policy.acall(request)
+            await asyncio.sleep(0)
+            return result
+
+        assert asyncio.run(scenario()) == "hedge"
+        assert cancelled == [True]
+        assert policy.hedges == 1
+
+    def test_admits_each_attempt(self):
+        policy = RetryPolicy(max_attempts=3, backoff=0, timeout=0.05)
+        outcomes = [StatusError(503), StatusError(503), "ok"]
+        admitted = []
+
+        async def admit():
+            await asyncio.sleep(0.1)
+            admitted.append(1)
+
+        async def request():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert asyncio.run(policy.acall(request, admit=admit)) == "ok"
+        assert len(admitted) == 3
@@ -0,0 +1,105 @@
+import io
+from collections import namedtuple
+
+import pandas as pd
+import pytest
+
+from evaluation_instruments.execution import iter_rows
+
+
+class FakeRecordBatch:
+    """Stands in for a pyarrow RecordBatch, which converts to a list of records."""
+
+    def __init__(self, records):
+        self.records = records
+
+    def to_pylist(self):
+        return list(self.records)
+
+
+class FakeTable(FakeRecordBatch):
+    """Stands in for a pyarrow Table, which is split into record batches."""
+
+    def __init__(self, *batches):
+        self.batches = batches
+
+    def to_batches(self):
+        return [FakeRecordBatch(batch) for batch in self.batches]
+
+    def to_pylist(self):
+        raise AssertionError("Tables should be read a batch at a time")
+
+
+def as_pairs(rows):
+    return [(row.Index, row.guid) for row in rows]
+
+
+class Test_IterRows:
+    def test_dataframe_matches_itertuples(self):
+        df = pd.DataFrame({"guid": ["a", "b"], "note text": ["x", "y"]}, index=[10, 20])
+
+        assert list(iter_rows(df)) == list(df.itertuples())
+
+    def test_dataframe_key(self):
+        df = pd.DataFrame({"guid": ["a", "b"]}, index=[10, 20])
+
+        assert as_pairs(iter_rows(df, key="guid")) == [("a", "a"), ("b", "b")]
+
+    def test_records_indexed_by_position(self):
+        rows = list(iter_rows({"guid": guid, "note text": "x"} for guid in "abc"))
+
+        assert as_pairs(rows) == [(0, "a"), (1, "b"), (2, "c")]
+        # Fields that are not identifiers are renamed like DataFrame.itertuples
+        assert rows[0]._2 == "x"
+
+    def test_records_key(self):
+        assert as_pairs(iter_rows([{"guid": "a"}, {"guid": "b"}], key="guid")) == [("a", "a"), ("b", "b")]
+
+    def test_records_with_different_fields(self):
+        rows = list(iter_rows([{"guid": "a"}, {"guid": "b", "extra": 1}]))
+
+        assert rows[1].extra == 1
+        assert not hasattr(rows[0], "extra")
+
+    def test_arrow_table_by_batch(self):
+        table = FakeTable([{"guid": "a"}, {"guid": "b"}], [{"guid": "c"}])
+
+        assert as_pairs(iter_rows(table)) == [(0, "a"), (1, "b"), (2, "c")]
+
+    def test_record_batch_and_reader(self):
+        batch = FakeRecordBatch([{"guid": "a"}])
+
+        assert as_pairs(iter_rows(batch)) == [(0, "a")]
+        assert as_pairs(iter_rows(iter([batch, FakeRecordBatch([{"guid": "b"}])]))) == [(0, "a"), (1, "b")]
+
+    def test_chunked_csv_reader(self):
+        reader = pd.read_csv(io.StringIO("guid,score\na,1\nb,2\nc,3\n"), chunksize=2)
+
+        assert as_pairs(iter_rows(reader)) == [(0, "a"), (1, "b"), (2, "c")]
+
+    def test_rows_pass_through(self):
+        Row = namedtuple("Row", ["Index", "guid"])
+        rows = [Row("x", "a"), Row("y", "b")]
+
+        assert list(iter_rows(rows)) == rows
+
+    def test_lazy(self):
+        consumed = []
+
+        def records():
+            for guid in "abc":
+                consumed.append(guid)
+                yield {"guid": guid}
+
+        rows = iter_rows(records())
+        next(rows)
+
+        assert consumed == ["a"]
+
+    def test_none_is_empty(self):
+        assert list(iter_rows(None)) == []
+
+    @pytest.mark.parametrize("source", [[1, 2], {"guid": "a"}])
+    def test_unsupported_rows(self, source):
+        with pytest.raises(TypeError):
+            list(iter_rows(source))
@@ -0,0 +1,139 @@
+import importlib
+import json
+from collections import namedtuple
+
+import pytest
+
+from evaluation_instruments import prep
+
+pdsqi = importlib.import_module("evaluation_instruments.instruments.pdsqi_9.pdsqi_prompt")
+draft_appeal = importlib.import_module("evaluation_instruments.instruments.epic_draft_appeal.draft_appeal_prompt")
+summary_of_care = importlib.import_module(
+    "evaluation_instruments.instruments.epic_summary_of_care.summary_of_care_prompt"
+)
+
+Sample = namedtuple("Sample", ["Index", "guid"])
+
+
+def pdsqi_record(i: int) -> dict:
+    return {
+        "summary": f"Summary {i}",
+        "notes": {"1": f"First note {i}", "2": f"Second note {i}"},
+        "target_specialty": "Cardiology" if i % 2 else "Oncology",
+    }
+
+
+def split_content(messages: list[dict]) -> tuple[str, str]:
+    """The prefix and suffix text of a prompt laid out by prep.prefix_cached_messages."""
+    prefix, suffix = messages[-1]["content"]
+    return prefix["text"], suffix["text"]
+
+
+@pytest.fixture
+def pdsqi_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for i in range(3):
+        (tmp_path / f"sample{i}.json").write_text(json.dumps(pdsqi_record(i)))
+    yield [Sample(i, f"sample{i}") for i in range(3)]
+    prep.json_loader.clear()
+
+
+class Test_PDSQI9CachedPrefix:
+    def test_prefix_identical_across_rows(self, pdsqi_files):
+        prompts = [pdsqi.pdsqi_from_file(sample, cache_prefix=True) for sample in pdsqi_files]
+
+        prefixes = {json.dumps(messages[-1]["content"][0]) for messages in prompts}
+        suffixes = {split_content(messages)[1] for messages in prompts}
+        assert len(prefixes) == 1
+        assert len(suffixes) == 3
+        assert all(messages[0] == {"role": "system", "content": pdsqi.SYSTEM_PROMPT} for messages in prompts)
+
+    @pytest.mark.parametrize("mode", [prep.OutputMode.SCORE, prep.OutputMode.EXPLAINED_SCORE])
+    def test_content_matches_uncached(self, mode):
+        record = pdsqi_record(1)
+        args = (record["summary"], list(record["notes"].values()), record["target_specialty"], mode)
+
+        uncached = pdsqi.resolve_prompt(*args)[-1]["content"]
+        prefix, suffix = split_content(pdsqi.resolve_prompt(*args, cache_prefix=True))
+
+        # The rubric and rules move ahead of the notes and summary, which are otherwise unchanged
+        instructions = prep.resolve_instructions(
+            pdsqi.INSTRUCTION_LIST, pdsqi.DETAIL_INSTRUCTIONS, default_mode=pdsqi.OUTPUT_MODE, mode=mode
+        )
+        for block in (pdsqi.RUBRIC_SET, instructions):
+            assert block in uncached and block in prefix
+        notes = uncached.split("<CLINICAL_NOTES>")[1].split("<\\CLINICAL_NOTES>")[0]
+        summary = uncached.split("<CLINICAL_SUMMARY>")[1].split("<\\CLINICAL_SUMMARY>")[0]
+        for block in (notes, summary, "specialty Cardiology"):
+            assert block in uncached and block in suffix
+        assert record["summary"] not in prefix
+
+
+class Test_PDSQI9PrepFn:
+    def test_binds_options_keeping_hooks(self, pdsqi_files):
+        prep_fn = pdsqi.pdsqi_prep_fn(cache_prefix=True)
+
+        assert prep_fn(pdsqi_files[0]) == pdsqi.pdsqi_from_file(pdsqi_files[0], cache_prefix=True)
+        assert callable(prep_fn.prefetch)
+        assert prep_fn.validate(pdsqi_files + [Sample(3, "missing")]) == {3: "Missing file missing.json"}
+
+    def test_packed(self, pdsqi_files, tmp_path, monkeypatch):
+        expected = pdsqi.pdsqi_from_file(pdsqi_files[1])
+        prep.pack_json_dir(tmp_path, tmp_path / "data.jsonl")
+        # Nothing is read from the working directory
+        (tmp_path / "elsewhere").mkdir()
+        monkeypatch.chdir(tmp_path / "elsewhere")
+
+        prep_fn = pdsqi.pdsqi_prep_fn(packed_path=tmp_path / "data.jsonl")
+
+        assert not hasattr(prep_fn, "prefetch")
+        assert prep_fn.validate(pdsqi_files + [Sample(3, "missing")]) == {3: "Missing file missing"}
+        assert prep_fn(pdsqi_files[1]) == expected
+
+    def test_packed_required_keys(self, tmp_path):
+        (tmp_path / "source").mkdir()
+        (tmp_path / "source" / "empty.json").write_text(json.dumps({**pdsqi_record(0), "summary": ""}))
+        prep.pack_json_dir(tmp_path / "source", tmp_path / "data.jsonl")
+
+        prep_fn = pdsqi.pdsqi_prep_fn(packed_path=tmp_path / "data.jsonl")
+
+        assert prep_fn.validate([Sample(0, "empty")]) == {}
+        assert prep_fn.check(Sample(0, "empty")) == "File empty has empty fields ['summary']"
+
+
+@pytest.mark.parametrize(
+    "instrument, record",
+    [
+        (draft_appeal, {"basis": "BASIS-MARKER", "notes": {"1": "A note"}, "denied procedures": ["MRI"]}),
+        (summary_of_care, {"summary": "SUMMARY-MARKER", "notes": {"1": "A note"}, "labs": {"2": "A lab"}}),
+    ],
+)
+class Test_EpicCachedPrefix:
+    def test_prefix_identical_across_rows(self, instrument, record, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        output_key = next(iter(record))
+        for i in range(3):
+            (tmp_path / f"sample{i}.json").write_text(json.dumps({**record, output_key: f"{record[output_key]} {i}"}))
+
+        try:
+            prompts = [instrument.to_cached_prompt(Sample(i, f"sample{i}")) for i in range(3)]
+        finally:
+            prep.json_loader.clear()
+
+        prefixes = {json.dumps(messages[-1]["content"][0]) for messages in prompts}
+        assert len(prefixes) == 1
+        assert len({split_content(messages)[1] for messages in prompts}) == 3
+
+    def test_content_matches_uncached(self, instrument, record):
+        output_key = next(iter(record))
+
+        uncached = instrument.resolve_prompt(record)
+        prefix, suffix = instrument.resolve_prompt_parts(record)
+
+        # The rubric and rules move ahead of the clinical data and output, which are otherwise unchanged
+        rubric = uncached.split("<RUBRIC_SET>")[1].split("<\\RUBRIC_SET>")[0]
+        rules = uncached.split("Rules to follow:")[1].split("OUTPUT:")[0].strip()
+        clinical_data = uncached.split("<CLINICAL_DATA>")[1].split("<\\CLINICAL_DATA>")[0]
+        assert rubric in prefix and rules in prefix
+        assert clinical_data in suffix and record[output_key] in suffix
+        assert record[output_key] not in prefix
@@ -0,0 +1,232 @@
+import importlib
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+import evaluation_instruments as ev
+
+pipeline = importlib.import_module("evaluation_instruments.instruments.5cs_clinical_documentation.run_5cs_pipeline")
+
+# The text each category prompt renders before the note
+PREFIXES = {
+    category: prompt.format(prompt_note="\0").split("\0")[0] for category, prompt in pipeline.CATEGORY_PROMPTS.items()
+}
+
+
+def grade(noteid: str, category: str) -> int:
+    return (len(noteid) + len(category)) % 2
+
+
+def response(grades: dict) -> dict:
+    return {
+        "choices": [{"message": {"content": json.dumps(grades)}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def category_of(messages) -> str:
+    content = messages[-1]["content"]
+    if isinstance(content, list):
+        content = "".join(part["text"] for part in content)
+    return next(category for category, prefix in PREFIXES.items() if content.startswith(prefix))
+
+
+def noteid_of(messages) -> str:
+    content = messages[-1]["content"]
+    if isinstance(content, list):
+        content = content[-1]["text"]
+    return content.split("note for ")[1].split(".")[0]
+
+
+@pytest.fixture
+def notes():
+    noteids = ["a", "bb", "ccc", "dddd"]
+    return pd.DataFrame({"notes": [f"The note for {noteid}." for noteid in noteids]}, index=noteids)
+
+
+class CountingCompletion:
+    """Grades each category from the prompt while counting the requests in flight."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = []
+
+    def __call__(self, model, messages, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.calls.append(messages)
+        time.sleep(self.delay_for(messages))
+        with self.lock:
+            self.in_flight -= 1
+
+        category = category_of(messages)
+        return response({category: grade(noteid_of(messages), category)})
+
+    def delay_for(self, messages) -> float:
+        return self.delay
+
+
+def expected_grades(noteids) -> dict:
+    return {
+        noteid: {category: grade(noteid, category) for category in pipeline.CATEGORY_PROMPTS} for noteid in noteids
+    }
+
+
+class Test_RunPromptTypes:
+    def test_categories_share_concurrency_bound(self, notes):
+        completion = CountingCompletion()
+
+        grades, _ = pipeline.run_prompt_types(
+            notes, completion, pipeline.PROMPT_TYPES, log_enabled=False, max_concurrency=3
+        )
+
+        assert len(completion.calls) == 20
+        assert 1 < completion.peak <= 3
+        assert grades == expected_grades(notes.index)
+
+    def test_each_request_reserved_once(self, notes):
+        completion = CountingCompletion(delay=0)
+        limiter = MagicMock(spec=ev.RateLimiter)
+
+        _, usage = pipeline.run_prompt_types(
+            notes, completion, pipeline.PROMPT_TYPES, log_enabled=False, rate_limiter=limiter
+        )
+
+        assert len(completion.calls) == 20
+        assert limiter.acquire.call_count == limiter.record.call_count == 20
+        assert usage == ev.TokenUsage(200, 100, 300)
+
+    def test_shared_adaptive_window_released(self, notes):
+        completion = CountingCompletion()
+        window = ev.AdaptiveConcurrency(initial=2, maximum=2)
+
+        grades, _ = pipeline.run_prompt_types(
+            notes, completion, pipeline.PROMPT_TYPES, log_enabled=False, max_concurrency=window
+        )
+
+        assert completion.peak <= 2
+        assert window.in_flight == 0
+        assert grades == expected_grades(notes.index)
+
+    def test_grades_in_input_order(self, notes):
+        class ReversedCompletion(CountingCompletion):
+            def delay_for(self, messages) -> float:
+                # Later notes finish first
+                return 0.005 * (5 - len(noteid_of(messages)))
+
+        grades = pipeline.run_pipeline(notes, ReversedCompletion(), log_enabled=False, max_concurrency=4)
+
+        assert list(grades) == list(notes.index)
+        assert grades == expected_grades(notes.index)
+
+
+class Test_CombinedMode:
+    def test_prompt_holds_every_rubric(self):
+        content = pipeline.create_combined_prompt("The note for a.")[0]["content"]
+
+        for number, (category, prompt) in enumerate(pipeline.CATEGORY_PROMPTS.items(), start=1):
+            rubric = prompt.format(prompt_note="").split("Return your final output as json")[0].strip()
+            assert rubric.replace("CURRENT TASK", f"TASK {number}: {category}") in content
+            assert f"# PART {number}: {category}" in content
+
+    def test_prompt_holds_one_note(self):
+        content = pipeline.create_combined_prompt("NOTE-MARKER")[0]["content"]
+
+        assert pipeline.COMBINED_PROMPT.count("{prompt_note}") == 1
+        assert content.count("NOTE-MARKER") == 1
+        assert content.endswith("NOTE-MARKER\n")
+
+    def test_prompt_holds_one_output_format(self):
+        content = pipeline.create_combined_prompt("The note for a.")[0]["content"]
+
+        assert content.count("Return your final output as") == 1
+        output_format = content.split("Return your final output as")[1].split("\n")[0]
+        assert all(category in output_format for category in pipeline.CATEGORY_PROMPTS)
+
+    @pytest.mark.parametrize("cache_prefix", [False, True])
+    def test_grades_match_category_mode(self, notes, cache_prefix):
+        requests = []
+
+        def combined_completion(model, messages, **kwargs):
+            requests.append(messages)
+            noteid = noteid_of(messages)
+            return response({category: grade(noteid, category) for category in pipeline.CATEGORY_PROMPTS})
+
+        grades = pipeline.run_pipeline(
+            notes, combined_completion, log_enabled=False, combined=True, cache_prefix=cache_prefix
+        )
+        by_category = pipeline.run_pipeline(notes, CountingCompletion(delay=0), log_enabled=False)
+
+        assert len(requests) == len(notes)
+        assert grades == by_category == expected_grades(notes.index)
+        assert list(pd.DataFrame.from_dict(grades, orient="index").columns) == list(pipeline.CATEGORY_PROMPTS)
+
+
+class Test_CachedPromptTypes:
+    @pytest.mark.parametrize("category", list(pipeline.CATEGORY_PROMPTS) + ["combined"])
+    def test_prefix_identical_across_rows(self, notes, category):
+        prompt_fxn = {**pipeline.CACHED_PROMPT_TYPES, **pipeline.CACHED_COMBINED_PROMPT_TYPES}[category]
+
+        prompts = [prompt_fxn(row) for row in notes.itertuples()]
+
+        prefixes = {json.dumps(messages[-1]["content"][0]) for messages in prompts}
+        assert len(prefixes) == 1
+        assert len({messages[-1]["content"][1]["text"] for messages in prompts}) == len(notes)
+
+    @pytest.mark.parametrize("category", list(pipeline.CATEGORY_PROMPTS) + ["combined"])
+    def test_content_matches_uncached(self, notes, category):
+        cached = {**pipeline.CACHED_PROMPT_TYPES, **pipeline.CACHED_COMBINED_PROMPT_TYPES}[category]
+        uncached = {**pipeline.PROMPT_TYPES, **pipeline.COMBINED_PROMPT_TYPES}[category]
+
+        for row in notes.itertuples():
+            prefix, suffix = cached(row)[-1]["content"]
+            assert prefix["text"] + suffix["text"] == uncached(row)[-1]["content"]
+            assert row.notes not in prefix["text"]
+
+
+class Test_ResponseFormat:
+    def test_combined_model_grades_every_category(self):
+        model = pipeline.response_model()
+        grades = expected_grades(["a"])["a"]
+
+        assert list(model.model_fields) == list(pipeline.CATEGORY_PROMPTS)
+        assert model.model_validate(grades).model_dump() == grades
+        with pytest.raises(ValidationError, match="less than or equal to 1"):
+            model.model_validate({**grades, "complete": 2})
+
+    @pytest.mark.parametrize("category", list(pipeline.CATEGORY_PROMPTS))
+    def test_category_model_grades_one_category(self, category):
+        schema = pipeline.response_format(category)["json_schema"]["schema"]
+
+        assert schema["required"] == [category]
+        assert schema["properties"][category] == {"type": "integer", "minimum": 0, "maximum": 1}
+
+    def test_unknown_category(self):
+        with pytest.raises(ValueError, match="category"):
+            pipeline.response_model("comprehensive")
+
+    @pytest.mark.parametrize("combined", [False, True])
+    def test_structured_output_sends_response_format(self, notes, combined):
+        formats = []
+
+        def completion(model, messages, **kwargs):
+            formats.append(kwargs["response_format"]["json_schema"]["schema"]["required"])
+            categories = pipeline.CATEGORY_PROMPTS if combined else [category_of(messages)]
+            return response({category: grade(noteid_of(messages), category) for category in categories})
+
+        grades = pipeline.run_pipeline(notes, completion, log_enabled=False, combined=combined, structured_output=True)
+
+        assert grades == expected_grades(notes.index)
+        if combined:
+            assert formats == [list(pipeline.CATEGORY_PROMPTS)] * len(notes)
+        else:
+            assert sorted(formats) == sorted([category] for category in pipeline.CATEGORY_PROMPTS for _ in notes.index)
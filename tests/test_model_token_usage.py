@@ -133,3 +133,50 @@ class Test_TokenUsage:
                 self.total_tokens = 7
 
         assert usage.validate_compatible(CompatibleObject()) is True
+
+
+class Test_TokenUsageCachedTokens:
+    @pytest.mark.parametrize(
+        "usage, expected",
+        [
+            ({"prompt_tokens": 10, "cached_tokens": 4}, 4),
+            ({"prompt_tokens": 10, "prompt_tokens_details": {"cached_tokens": 6, "audio_tokens": None}}, 6),
+            ({"prompt_tokens": 10, "prompt_tokens_details": None}, None),
+            ({"prompt_tokens": 10, "cache_read_input_tokens": 8}, 8),
+            ({"prompt_tokens": 10}, None),
+        ],
+    )
+    def test_cached_tokens_parsed(self, usage, expected):
+        """Test cached tokens are read from the provider-specific usage keys."""
+        assert TokenUsage(**usage).cached_tokens == expected
+
+    def test_cached_tokens_from_details_object(self):
+        """Test cached tokens are read from usage detail objects as well as dictionaries."""
+
+        class Details:
+            cached_tokens = 3
+
+        assert TokenUsage(prompt_tokens=10, prompt_tokens_details=Details()).cached_tokens == 3
+
+    def test_details_kept_in_other(self):
+        """Test the raw usage details remain available."""
+        usage = TokenUsage(prompt_tokens=10, prompt_tokens_details={"cached_tokens": 6})
+
+        assert usage.other == {"prompt_tokens_details": {"cached_tokens": 6}}
+
+    def test_repr_includes_cached_tokens(self):
+        """Test cached tokens are shown only when known."""
+        usage = TokenUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15, cached_tokens=4)
+
+        assert repr(usage) == "TokenUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15, cached_tokens=4)"
+
+    def test_addition_accumulates_cached_tokens(self):
+        """Test cached tokens are summed, treating unknown values as zero."""
+        total = TokenUsage(10, 5, 15, cached_tokens=4) + TokenUsage(10, 5, 15) + TokenUsage(10, 5, 15, cached_tokens=6)
+
+        assert total.cached_tokens == 10
+        assert (TokenUsage(10, 5, 15) + TokenUsage(10, 5, 15)).cached_tokens is None
+
+    def test_capacity_ignores_cached_tokens(self):
+        """Test cached tokens do not count toward a capacity threshold without a cached limit."""
+        assert not TokenUsage(10, 5, 15, cached_tokens=100) > TokenUsage(None, None, 20)
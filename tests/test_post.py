@@ -1,7 +1,24 @@
+import importlib
+import json
+import re
+import time
+
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal
+from pydantic import ValidationError
 
-from evaluation_instruments.post import frame_from_evals
+from evaluation_instruments.post import (
+    ScoreRange,
+    extract_json,
+    frame_from_evals,
+    iter_json_objects,
+    response_format,
+    response_model,
+    rubric_scores,
+    validated,
+)
+from evaluation_instruments.prep import OutputMode, resolve_instructions
 
 
 def evaluation_output():
@@ -92,3 +109,304 @@ def test_frame_from_evals_single_score_multiple_items():
 
     # Verify exact match with expected DataFrame
     assert_frame_equal(result_df, expected_df)
+
+
+RUBRIC_ANSWER = {
+    "citation": {"score": 4, "explanation": 'Cites the note, e.g. "BP 120/74" {vitals}.'},
+    "accuracy": {"score": 5, "explanation": "No errors found; see \\\"labs\\\" and {trailing brace"},
+}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        json.dumps(RUBRIC_ANSWER),
+        "```json\n" + json.dumps(RUBRIC_ANSWER, indent=2) + "\n```",
+        "Here is my evaluation:\n" + json.dumps(RUBRIC_ANSWER) + "\nLet me know if you need more detail.",
+        "I scored each {criterion} below.\n```json\n" + json.dumps(RUBRIC_ANSWER) + "\n```\nScores use {1-5}.",
+        "Scores range over {1-5 :\n" + json.dumps(RUBRIC_ANSWER),
+        'The note says "see {attached}".\n' + json.dumps(RUBRIC_ANSWER) + "\n}",
+    ],
+)
+def test_extract_json(content):
+    assert extract_json(content) == RUBRIC_ANSWER
+
+
+def test_extract_json_merges_multiple_objects():
+    content = "\n\n".join(f"```json\n{json.dumps({key: value})}\n```" for key, value in RUBRIC_ANSWER.items())
+
+    assert extract_json(content) == RUBRIC_ANSWER
+
+
+def test_extract_json_searches_within_unparsed_spans():
+    content = 'Result {as requested: {"score": 3}}'
+
+    assert extract_json(content) == {"score": 3}
+
+
+def test_extract_json_skips_truncated_object():
+    content = 'Earlier: {"overall": 2}\n{"citation": {"score": 4}, "accuracy": {"sco'
+
+    assert list(iter_json_objects(content)) == [{"overall": 2}]
+
+
+@pytest.mark.parametrize("content", ["not json", "", "{not: json}", '{"citation": {"score": 4}'])
+def test_extract_json_without_object(content):
+    with pytest.raises(ValueError, match="No JSON object"):
+        extract_json(content)
+
+
+def response_corpus(count=2000):
+    """Builds response contents shaped like rubric answers from a range of models."""
+    shapes = [
+        lambda answer: json.dumps(answer),
+        lambda answer: "```json\n" + json.dumps(answer, indent=2) + "\n```",
+        lambda answer: "Here is my evaluation of the summary:\n\n" + json.dumps(answer, indent=2) + "\n\nThanks!",
+        lambda answer: "Per the rubric {1-5}, my scores:\n```json\n" + json.dumps(answer) + "\n```",
+        lambda answer: "\n".join(json.dumps({key: value}) for key, value in answer.items()),
+        lambda answer: json.dumps(answer) + "\nNote: scores reflect the {target} specialty.",
+    ]
+    corpus = []
+    for i in range(count):
+        answer = {
+            f"criterion_{c}": {"score": (i + c) % 5 + 1, "explanation": f"Row {i}: " + "supported by the note. " * 8}
+            for c in range(8)
+        }
+        corpus.append((answer, shapes[i % len(shapes)](answer)))
+    return corpus
+
+
+def test_extraction_parse_rate_and_throughput():
+    """Benchmark of extracting rubric answers, run with -s to see the parse rates and MB/s."""
+
+    def slice_braces(content):
+        return json.loads(content[content.find("{") : content.rfind("}") + 1])  # noqa: E203
+
+    corpus = response_corpus()
+    megabytes = sum(len(content.encode()) for _, content in corpus) / 2**20
+
+    results = {}
+    for name, extract in (("first-to-last brace", slice_braces), ("extract_json", extract_json)):
+        parsed = 0
+        start = time.perf_counter()
+        for answer, content in corpus:
+            try:
+                parsed += extract(content) == answer
+            except ValueError:
+                pass
+        elapsed = time.perf_counter() - start
+        results[name] = parsed / len(corpus)
+        print(f"{name}: parsed {results[name]:.0%} of {len(corpus)} responses at {megabytes / elapsed:,.1f} MB/s")
+
+    assert results["extract_json"] == 1
+    assert results["first-to-last brace"] < 1
+
+
+RUBRIC = """
+<citation>
+DESCRIPTION: Are the assertions cited?
+
+GRADES:
+1 = No citations
+5 = Every assertion is cited
+<\\citation>
+
+<synthesized>
+GRADES:
+NA = There is no need for abstraction.
+1 = Incorrect reasoning
+5 = Fully integrated
+<\\synthesized>
+
+<voice>
+GRADES:
+0 = No stigmatizing words
+1 = Stigmatizing words
+<\\voice>
+"""
+
+
+def test_rubric_scores_from_sections():
+    assert rubric_scores(RUBRIC) == {
+        "citation": ScoreRange(1, 5),
+        "synthesized": ScoreRange(1, 5, ("NA",)),
+        "voice": ScoreRange(0, 1),
+    }
+
+
+def test_rubric_scores_from_mapping():
+    rubric = {"Tone": "<Tone>\nGRADES:\n1 = Poor\n2 = Fair\n3 = Good\n<\\Tone>"}
+
+    assert rubric_scores(rubric) == {"Tone": ScoreRange(1, 3)}
+
+
+def test_rubric_scores_requires_grades():
+    with pytest.raises(ValueError, match="Tone"):
+        rubric_scores({"Tone": "DESCRIPTION: no grades"})
+
+
+@pytest.mark.parametrize(
+    "response, expected",
+    [
+        ({"citation": 5, "synthesized": "NA", "voice": 0}, {"citation": 5, "synthesized": "NA", "voice": 0}),
+        ({"citation": "4", "synthesized": 1, "voice": 1, "note": ""}, {"citation": 4, "synthesized": 1, "voice": 1}),
+        ({"Citation": 5, "SYNTHESIZED": 1, "voice": 0}, {"citation": 5, "synthesized": 1, "voice": 0}),
+        ({"Citation": 1, "citation": 5, "synthesized": 1, "voice": 0}, {"citation": 5, "synthesized": 1, "voice": 0}),
+    ],
+)
+def test_response_model_score(response, expected):
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE)
+
+    assert model.model_validate(response).model_dump() == expected
+
+
+@pytest.mark.parametrize(
+    "response, error",
+    [
+        ({"citation": 6, "synthesized": 1, "voice": 0}, "less than or equal to 5"),
+        ({"citation": 1, "synthesized": "N/A", "voice": 0}, "synthesized"),
+        ({"citation": 1, "synthesized": 1}, "voice"),
+        ({"citation": {"score": 1}, "synthesized": 1, "voice": 0}, "citation"),
+    ],
+)
+def test_response_model_flags_invalid(response, error):
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE)
+
+    with pytest.raises(ValidationError, match=error):
+        model.model_validate(response)
+
+
+def test_response_model_explained():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE, OutputMode.EXPLAINED_SCORE)
+    response = {key: {"explanation": "Because.", "score": 1} for key in ("citation", "synthesized", "voice")}
+
+    assert model.model_validate(response).citation.score == 1
+    with pytest.raises(ValidationError, match="explanation"):
+        model.model_validate({**response, "voice": {"score": 1}})
+
+
+def test_response_model_cached():
+    scores = rubric_scores(RUBRIC)
+
+    assert response_model("Test", scores, OutputMode.SCORE) is response_model("Test", dict(scores), OutputMode.SCORE)
+    assert response_model("Test", scores, OutputMode.SCORE) is not response_model(
+        "Test", scores, OutputMode.EXPLAINED_SCORE
+    )
+
+
+def test_validated_post_fn():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE)
+    usage = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    responses = {
+        "a": {"citation": 5, "synthesized": 1, "voice": 0},
+        "b": {"citation": 9, "synthesized": 1, "voice": 0},
+    }
+    post_fn = validated(lambda sample_ix, raw: (responses[sample_ix], usage), model)
+
+    record, record_usage = post_fn("a", None)
+    flagged, _ = post_fn("b", None)
+
+    assert isinstance(record, model)
+    assert record_usage == usage
+    assert flagged == responses["b"]
+    assert list(post_fn.invalid) == ["b"]
+    assert isinstance(post_fn.invalid["b"], ValidationError)
+
+
+def test_validated_restore():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE)
+    post_fn = validated(lambda sample_ix, raw: (raw, {}), model)
+    journaled = post_fn("a", {"citation": 5, "synthesized": 1, "voice": 0})[0].model_dump()
+
+    assert post_fn.restore("a", journaled) == post_fn("a", journaled)[0]
+    assert post_fn.restore("b", {"citation": 9}) == {"citation": 9}
+    assert list(post_fn.invalid) == ["b"]
+
+
+def test_frame_from_evals_with_records():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.EXPLAINED_SCORE)
+    explained = {"explanation": "Because.", "score": 1}
+    outputs = {"sample1": model.model_validate({"citation": explained, "synthesized": explained, "voice": explained})}
+
+    result_df = frame_from_evals(outputs)
+
+    assert result_df.loc["sample1", ("citation", "score")] == 1
+    assert list(result_df.columns.levels[0]) == ["citation", "synthesized", "voice"]
+
+
+@pytest.mark.parametrize(
+    "module, rubric, criteria",
+    [
+        ("pdsqi_9.pdsqi_prompt", "RUBRIC_SET", 11),
+        ("epic_draft_appeal.draft_appeal_prompt", "EPIC_DRAFT_APPEAL_RUBRIC", 11),
+        ("epic_summary_of_care.summary_of_care_prompt", "EPIC_SUMMARY_OF_CARE_RUBRIC", 10),
+    ],
+)
+def test_instrument_response_models(module, rubric, criteria):
+    instrument = importlib.import_module(f"evaluation_instruments.instruments.{module}")
+
+    for mode in (OutputMode.SCORE, OutputMode.EXPLAINED_SCORE):
+        model = instrument.response_model(mode)
+        assert len(model.model_fields) == criteria
+        scores = {criterion: grades.lowest for criterion, grades in instrument.RUBRIC_SCORES.items()}
+        if mode == OutputMode.EXPLAINED_SCORE:
+            scores = {criterion: {"explanation": "", "score": score} for criterion, score in scores.items()}
+        assert model.model_validate(scores)
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["pdsqi_9.pdsqi_prompt", "epic_draft_appeal.draft_appeal_prompt", "epic_summary_of_care.summary_of_care_prompt"],
+)
+def test_instrument_instructions_name_rubric_keys(module):
+    instrument = importlib.import_module(f"evaluation_instruments.instruments.{module}")
+
+    for mode in (OutputMode.SCORE, OutputMode.EXPLAINED_SCORE):
+        instructions = resolve_instructions(
+            instrument.INSTRUCTION_LIST, instrument.DETAIL_INSTRUCTIONS, default_mode=instrument.OUTPUT_MODE, mode=mode
+        )
+        examples = re.findall(r'\(e\.g\., "(\w+)"\)', instructions)
+        assert examples
+        fields = {key.lower() for key in instrument.response_model(mode).model_fields}
+        assert {key.lower() for key in examples} <= fields
+
+
+def test_response_format_score():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.SCORE)
+
+    actual = response_format(model)
+
+    schema = actual["json_schema"]["schema"]
+    assert actual["type"] == "json_schema"
+    assert actual["json_schema"]["name"] == "Test"
+    assert actual["json_schema"]["strict"] is True
+    assert schema["required"] == ["citation", "synthesized", "voice"]
+    assert schema["additionalProperties"] is False
+    assert schema["properties"]["citation"] == {"type": "integer", "minimum": 1, "maximum": 5}
+    assert {"type": "string", "enum": ["NA"]} in schema["properties"]["synthesized"]["anyOf"]
+    assert "title" not in json.dumps(schema)
+
+
+def test_response_format_explained():
+    model = response_model("Test", rubric_scores(RUBRIC), OutputMode.EXPLAINED_SCORE)
+
+    schema = response_format(model, strict=False)["json_schema"]["schema"]
+
+    assert all(definition["additionalProperties"] is False for definition in schema["$defs"].values())
+    assert all(definition["required"] == ["explanation", "score"] for definition in schema["$defs"].values())
+    assert schema["properties"]["citation"] == {"$ref": "#/$defs/ExplainedScore1To5"}
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["pdsqi_9.pdsqi_prompt", "epic_draft_appeal.draft_appeal_prompt", "epic_summary_of_care.summary_of_care_prompt"],
+)
+def test_instrument_response_formats(module):
+    instrument = importlib.import_module(f"evaluation_instruments.instruments.{module}")
+
+    score = instrument.response_format(OutputMode.SCORE)["json_schema"]["schema"]
+    explained = instrument.response_format(OutputMode.EXPLAINED_SCORE)["json_schema"]["schema"]
+
+    assert score["required"] == explained["required"] == list(instrument.RUBRIC_SCORES)
+    assert "$defs" not in score
+    assert len(json.dumps(score)) < len(json.dumps(explained))
@@ -1,4 +1,7 @@
 import json
+import os
+import threading
+import time
 from collections import namedtuple
 from unittest.mock import mock_open, patch
 from pathlib import PureWindowsPath, PurePosixPath
@@ -63,6 +66,344 @@ class TestJsonFromColumnDecorator:
             def test_fn(json_data):
                 return json_data
 
+    def test_carries_prefetch_hook(self, tmp_path):
+        """Test the wrapped function prefetches the file of a sample into its loader."""
+        (tmp_path / "a.json").write_text(json.dumps({"testkey": "value"}))
+        loader = undertest.JsonLoader(readahead=3)
+
+        @undertest.json_from_column(namedtuple_key="file_id", data_path=tmp_path, loader=loader)
+        def test_fn(json_data):
+            return json_data
+
+        Sample = namedtuple("Sample", ["file_id"])
+        test_fn.prefetch(Sample(file_id="a"))
+
+        assert test_fn.readahead == 3
+        assert test_fn(Sample(file_id="a")) == {"testkey": "value"}
+        assert (loader.misses, len(loader)) == (1, 1)
+
+
+class TestJsonLoader:
+    """Tests for the prefetching JsonLoader."""
+
+    @pytest.fixture
+    def files(self, tmp_path):
+        paths = []
+        for i in range(3):
+            paths.append(tmp_path / f"{i}.json")
+            paths[-1].write_text(json.dumps({"id": i}))
+        return paths
+
+    def test_load_caches(self, files):
+        loader = undertest.JsonLoader()
+
+        first = loader.load(files[0])
+        second = loader.load(str(files[0]))
+
+        assert first is second
+        assert (loader.misses, loader.hits) == (1, 1)
+
+    def test_changed_file_reread(self, files):
+        loader = undertest.JsonLoader()
+        loader.load(files[0])
+        loader.load(files[1])
+
+        files[0].write_text(json.dumps({"id": "changed"}))
+        # Same size, only the modification time differs
+        files[1].write_text(json.dumps({"id": 9}))
+        os.utime(files[1], ns=(0, files[1].stat().st_mtime_ns + 1))
+
+        assert loader.load(files[0]) == {"id": "changed"}
+        assert loader.load(files[1]) == {"id": 9}
+        assert (loader.misses, loader.hits) == (4, 0)
+
+    def test_changed_after_prefetch_reread(self, files):
+        loader = undertest.JsonLoader()
+        loader.prefetch([files[0]])
+        loader._pending[os.path.abspath(files[0])].result()
+
+        files[0].write_text(json.dumps({"id": "changed"}))
+
+        assert loader.load(files[0]) == {"id": "changed"}
+
+    def test_clear_rereads(self, files):
+        loader = undertest.JsonLoader()
+        loader.load(files[0])
+        files[0].write_text(json.dumps({"id": "changed"}))
+
+        loader.clear()
+
+        assert loader.load(files[0]) == {"id": "changed"}
+
+    def test_evicts_least_recently_used(self, files):
+        loader = undertest.JsonLoader(max_entries=2)
+        loader.load(files[0])
+        loader.load(files[1])
+        loader.load(files[0])
+
+        loader.load(files[2])
+        loader.load(files[0])
+        loader.load(files[1])
+
+        assert (loader.misses, loader.hits) == (4, 2)
+        assert len(loader) == 2
+
+    def test_prefetch_reads_in_background(self, files):
+        loader = undertest.JsonLoader()
+
+        read = undertest._loader._read
+        threads = []
+
+        def recording_read(path):
+            threads.append(threading.current_thread().name)
+            return read(path)
+
+        with patch("evaluation_instruments.prep._loader._read", side_effect=recording_read):
+            loader.prefetch(files)
+            loader.prefetch(files)
+            results = [loader.load(path) for path in files]
+
+        assert results == [{"id": 0}, {"id": 1}, {"id": 2}]
+        assert len(threads) == 3
+        assert all(name.startswith("evaluation-json") for name in threads)
+
+    def test_missing_file(self, tmp_path):
+        loader = undertest.JsonLoader()
+        loader.prefetch([tmp_path / "missing.json"])
+
+        with pytest.raises(FileNotFoundError):
+            loader.load(tmp_path / "missing.json")
+        assert loader.load(tmp_path / "missing.json", default={}) == {}
+        assert len(loader) == 0
+
+    def test_invalid_json_raises(self, tmp_path):
+        (tmp_path / "bad.json").write_text("{not json")
+
+        with pytest.raises(ValueError):
+            undertest.JsonLoader().load(tmp_path / "bad.json")
+
+    @pytest.mark.parametrize("content", [b'{"a": [1, 2.5, "x"]}', b'{"score": NaN}', b"[]"])
+    def test_parse_json_matches_json(self, content):
+        assert json.dumps(undertest.parse_json(content)) == json.dumps(json.loads(content))
+
+
+class TestPackedJson:
+    """Tests for packing a directory of JSON files and reading records back by key."""
+
+    @pytest.fixture
+    def packed(self, tmp_path):
+        source = tmp_path / "data"
+        (source / "nested").mkdir(parents=True)
+        (source / "a.json").write_text(json.dumps({"summary": "first\nline", "notes": {"1": "ü"}}, indent=2))
+        (source / "b.json").write_text(json.dumps({"summary": "second"}))
+        (source / "nested" / "c.json").write_text(json.dumps([1, 2]))
+        (source / "ignored.txt").write_text("not json")
+
+        count = undertest.pack_json_dir(source, tmp_path / "data.jsonl")
+        assert count == 3
+        return tmp_path / "data.jsonl"
+
+    def test_one_record_per_line(self, packed):
+        lines = packed.read_text(encoding="utf-8").splitlines()
+
+        assert [json.loads(line) for line in lines] == [
+            {"summary": "first\nline", "notes": {"1": "ü"}},
+            {"summary": "second"},
+            [1, 2],
+        ]
+
+    @pytest.mark.parametrize(
+        "key,expected",
+        [
+            ("a", {"summary": "first\nline", "notes": {"1": "ü"}}),
+            ("b.json", {"summary": "second"}),
+            ("nested/c", [1, 2]),
+        ],
+    )
+    def test_load(self, packed, key, expected):
+        with undertest.PackedJson(packed) as pack:
+            assert pack.load(key) == expected
+            assert key in pack
+
+    def test_missing_key(self, packed):
+        with undertest.PackedJson(packed) as pack:
+            with pytest.raises(KeyError, match="missing"):
+                pack.load("missing")
+            assert pack.load("missing", default={}) == {}
+            assert sorted(pack.keys()) == ["a", "b", "nested/c"]
+            assert len(pack) == 3
+
+    def test_stale_index_raises(self, packed):
+        with packed.open("a") as f:
+            f.write("{}\n")
+
+        with pytest.raises(ValueError, match="pack the directory again"):
+            undertest.PackedJson(packed)
+
+    def test_empty_directory(self, tmp_path):
+        (tmp_path / "empty").mkdir()
+
+        assert undertest.pack_json_dir(tmp_path / "empty", tmp_path / "empty.jsonl") == 0
+        with undertest.PackedJson(tmp_path / "empty.jsonl") as pack:
+            assert pack.load("a", default=None) is None
+
+    def test_open_packed_is_shared(self, packed):
+        first = undertest.open_packed(packed)
+
+        assert undertest.open_packed(str(packed)) is first
+        assert undertest.open_packed(packed, reload=True) is not first
+
+    def test_json_from_column_reads_pack(self, packed):
+        Sample = namedtuple("Sample", ["file_id"])
+
+        @undertest.json_from_column(namedtuple_key="file_id", data_path=packed)
+        def test_fn(json_data):
+            return json_data
+
+        assert test_fn(Sample(file_id="b")) == {"summary": "second"}
+        assert test_fn(Sample(file_id="missing")) == {}
+        assert not hasattr(test_fn, "prefetch")
+
+    def test_main(self, packed, tmp_path, capsys):
+        undertest.pack.main([str(tmp_path / "data"), str(tmp_path / "cli.jsonl")])
+
+        assert "Packed 3 records" in capsys.readouterr().out
+        assert (tmp_path / "cli.jsonl").read_bytes() == packed.read_bytes()
+
+
+class TestValidateJsonRows:
+    """Tests for the bulk validation of the JSON files of rows."""
+
+    Sample = namedtuple("Sample", ["Index", "guid"])
+
+    @pytest.fixture
+    def data(self, tmp_path):
+        payloads = {
+            "good": {"summary": "text", "notes": {"1": "note"}},
+            "blank": {"summary": "   ", "notes": {"1": "note"}},
+            "no_notes": {"summary": "text", "notes": {}},
+            "partial": {"summary": "text"},
+            "list": ["summary"],
+        }
+        for guid, payload in payloads.items():
+            (tmp_path / f"{guid}.json").write_text(json.dumps(payload))
+        (tmp_path / "broken.json").write_text("{not json")
+        return tmp_path
+
+    def samples(self, *guids):
+        return [self.Sample(guid, guid) for guid in guids]
+
+    def test_missing_files(self, data):
+        invalid = undertest.validate_json_rows(self.samples("good", "absent"), lambda s: data / f"{s.guid}.json")
+
+        assert invalid == {"absent": f"Missing file {data / 'absent.json'}"}
+
+    def test_listing_miss_checks_filesystem(self, data):
+        # As on a case-insensitive filesystem, where GOOD.json opens good.json but is not listed
+        with patch("evaluation_instruments.prep._validation.os.path.isfile", return_value=True) as isfile:
+            invalid = undertest.validate_json_rows(self.samples("good", "GOOD"), lambda s: data / f"{s.guid}.json")
+
+        assert invalid == {}
+        isfile.assert_called_once_with(str(data / "GOOD.json"))
+
+    def test_missing_directory(self, tmp_path):
+        invalid = undertest.validate_json_rows(self.samples("a"), lambda s: tmp_path / "none" / f"{s.guid}.json")
+
+        assert list(invalid) == ["a"]
+
+    @pytest.mark.parametrize(
+        "guid,reason",
+        [
+            ("good", None),
+            ("blank", "has empty fields ['summary']"),
+            ("no_notes", "has empty fields ['notes']"),
+            ("partial", "is missing keys ['notes']"),
+            ("list", "does not hold a JSON object"),
+            ("broken", "Unreadable file"),
+        ],
+    )
+    def test_required_keys(self, data, guid, reason):
+        invalid = undertest.validate_json_rows(
+            self.samples(guid), lambda s: data / f"{s.guid}.json", ["summary", "notes"], undertest.JsonLoader()
+        )
+
+        if reason is None:
+            assert invalid == {}
+        else:
+            assert reason in invalid[guid]
+
+    def test_packed(self, data, tmp_path):
+        (data / "broken.json").unlink()
+        undertest.pack_json_dir(data, tmp_path / "packed.jsonl")
+
+        with undertest.PackedJson(tmp_path / "packed.jsonl") as pack:
+            invalid = undertest.validate_json_rows(
+                self.samples("good", "blank", "absent"), lambda s: s.guid, ["summary"], pack=pack
+            )
+
+        assert sorted(invalid) == ["absent", "blank"]
+
+    @pytest.mark.parametrize("value,expected", [(None, True), ("", True), (" \n", True), ([], True), ({}, True),
+                                                ("x", False), (0, False), (False, False), ([0], False)])
+    def test_is_empty(self, value, expected):
+        assert undertest.is_empty(value) == expected
+
+    def test_json_from_column_carries_hook(self, data):
+        @undertest.json_from_column(namedtuple_key="guid", data_path=data, required_keys=["summary"])
+        def test_fn(json_data):
+            return json_data
+
+        assert list(test_fn.validate(self.samples("good", "blank", "absent"))) == ["absent"]
+        assert test_fn.check(self.samples("good")[0]) is None
+        assert "has empty fields ['summary']" in test_fn.check(self.samples("blank")[0])
+
+    def test_validate_hook_does_not_read(self, data):
+        loader = undertest.JsonLoader()
+
+        @undertest.json_from_column(namedtuple_key="guid", data_path=data, loader=loader, required_keys=["summary"])
+        def test_fn(json_data):
+            return json_data
+
+        assert test_fn.validate(self.samples("good", "blank")) == {}
+        assert loader.misses == 0 and len(loader) == 0
+
+    def test_check_reads_once(self, data):
+        loader = undertest.JsonLoader()
+
+        @undertest.json_from_column(namedtuple_key="guid", data_path=data, loader=loader, required_keys=["summary"])
+        def test_fn(json_data):
+            return json_data
+
+        sample = self.samples("good")[0]
+        assert test_fn.check(sample) is None
+        assert test_fn(sample) == {"summary": "text", "notes": {"1": "note"}}
+        assert (loader.misses, loader.hits) == (1, 1)
+
+    @pytest.mark.parametrize(
+        "guid,reason", [("good", None), ("partial", "is missing keys ['notes']"), ("absent", "Missing file")]
+    )
+    def test_check_json_row(self, data, guid, reason):
+        invalid = undertest.check_json_row(
+            self.samples(guid)[0], lambda s: data / f"{s.guid}.json", ["summary", "notes"], undertest.JsonLoader()
+        )
+
+        if reason is None:
+            assert invalid is None
+        else:
+            assert reason in invalid
+
+    def test_check_json_row_packed(self, data, tmp_path):
+        (data / "broken.json").unlink()
+        undertest.pack_json_dir(data, tmp_path / "packed.jsonl")
+
+        with undertest.PackedJson(tmp_path / "packed.jsonl") as pack:
+            reasons = [
+                undertest.check_json_row(sample, lambda s: s.guid, ["summary"], pack=pack)
+                for sample in self.samples("good", "blank", "absent")
+            ]
+
+        assert reasons == [None, "File blank has empty fields ['summary']", "Missing file absent"]
+
 
 class TestToUserMessagesDecorator:
     """Tests for the to_user_messages decorator functionality."""
@@ -107,6 +448,96 @@ class TestToUserMessagesDecorator:
         assert result[0] == {"role": "user", "content": "Prompt with value1 and value2"}
 
 
+class TestFromColumnsDecorator:
+    """Tests for the from_columns decorator functionality."""
+
+    def test_mapped_columns(self):
+        """Test from_columns passes only the mapped columns as keyword arguments."""
+        Sample = namedtuple("Sample", ["Index", "notes", "author"])
+        sample = Sample(Index=3, notes="note text", author="someone")
+
+        @undertest.from_columns(columns={"note": "notes", "note_id": "Index"})
+        def test_fn(note, note_id):
+            return f"{note_id}: {note}"
+
+        assert test_fn(sample) == "3: note text"
+
+    def test_column_list(self):
+        """Test from_columns with a list of columns passed under their own names."""
+        Sample = namedtuple("Sample", ["notes", "author"])
+
+        def test_fn(notes, author):
+            return (notes, author)
+
+        result = undertest.from_columns(test_fn, columns=["notes", "author"])(Sample("note text", "someone"))
+
+        assert result == ("note text", "someone")
+
+    def test_row_not_embedded(self):
+        """Test from_columns keeps the rest of the row out of the prompt."""
+        Sample = namedtuple("Sample", ["Index", "notes", "large"])
+        sample = Sample(Index=1, notes="note text", large="x" * 1000)
+
+        @undertest.from_columns(columns={"note": "notes"})
+        def test_fn(note):
+            return "Clinical Note: {note}".format(note=note)
+
+        assert test_fn(sample) == "Clinical Note: note text"
+
+    def test_missing_column(self):
+        """Test from_columns raises KeyError naming the missing column."""
+        Sample = namedtuple("Sample", ["notes"])
+
+        @undertest.from_columns(columns={"note": "text"})
+        def test_fn(note):
+            return note
+
+        with pytest.raises(KeyError, match="text"):
+            test_fn(Sample("note text"))
+
+    def test_columns_required(self):
+        """Test from_columns raises ValueError without columns."""
+        with pytest.raises(ValueError):
+            undertest.from_columns(lambda note: note)
+
+
+class TestPrefixCachedMessages:
+    """Tests for laying out prompts for provider prompt caching."""
+
+    def test_layout(self):
+        """Test the static prefix and row suffix are separate parts, with the prefix marked for caching."""
+        result = undertest.prefix_cached_messages("rubric", "note", system_message="System instructions")
+
+        assert result == [
+            {"role": "system", "content": "System instructions"},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "rubric", "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": "note"},
+                ],
+            },
+        ]
+
+    def test_without_cache_control(self):
+        """Test the prefix can be left unmarked for providers that cache automatically."""
+        result = undertest.prefix_cached_messages("rubric", "note", cache_control=False)
+
+        content = [{"type": "text", "text": "rubric"}, {"type": "text", "text": "note"}]
+        assert result == [{"role": "user", "content": content}]
+
+    def test_prefix_identical_across_rows(self):
+        """Test rows differing only in the suffix share a byte-identical prefix."""
+        first = undertest.prefix_cached_messages("rubric", "note 1")
+        second = undertest.prefix_cached_messages("rubric", "note 2")
+
+        assert json.dumps(first[0]["content"][0]) == json.dumps(second[0]["content"][0])
+
+    def test_prompt_cache_args(self):
+        """Test the cache key is passed as the provider hint."""
+        assert undertest.prompt_cache_args("pdsqi_9") == {"prompt_cache_key": "pdsqi_9"}
+
+
 class TestPromptCompilation:
     """Tests for the prompt_compilation function."""
 
@@ -214,6 +645,99 @@ class TestResolveInstructions:
 
         assert actual == expected
 
+class TestTemplateCache:
+    PATTERN = "Evaluate the {OUTPUT_TEXT}.\n{RUBRIC_SET}\n{{instruction_set}}\n{{clinical_data}}"
+    RUBRICS = {"clarity": "Evaluate clarity.", "accuracy": "Evaluate accuracy."}
+
+    def test_prompt_compilation_matches_uncached(self):
+        cache = undertest.TemplateCache()
+
+        actual = cache.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, self.RUBRICS, ["accuracy"])
+
+        expected = undertest.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, self.RUBRICS, ["accuracy"])
+        assert actual == expected
+
+    def test_prompt_compilation_compiles_once(self):
+        cache = undertest.TemplateCache()
+        pattern_kwargs = {"OUTPUT_TEXT": "summary"}
+
+        first = cache.prompt_compilation(self.PATTERN, pattern_kwargs, self.RUBRICS)
+        second = cache.prompt_compilation(self.PATTERN, pattern_kwargs, self.RUBRICS)
+
+        assert first is second
+        assert (cache.misses, cache.hits) == (1, 1)
+        assert pattern_kwargs == {"OUTPUT_TEXT": "summary"}
+
+    @pytest.mark.parametrize(
+        "pattern_kwargs,rubrics,rubric_keys",
+        [
+            ({"OUTPUT_TEXT": "draft"}, RUBRICS, None),
+            ({"OUTPUT_TEXT": "summary"}, {**RUBRICS, "clarity": "Evaluate brevity."}, None),
+            ({"OUTPUT_TEXT": "summary"}, RUBRICS, ["clarity"]),
+        ],
+    )
+    def test_prompt_compilation_keyed_on_content(self, pattern_kwargs, rubrics, rubric_keys):
+        cache = undertest.TemplateCache()
+        baseline = cache.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, self.RUBRICS)
+
+        actual = cache.prompt_compilation(self.PATTERN, pattern_kwargs, rubrics, rubric_keys)
+
+        assert actual != baseline
+        assert actual == undertest.prompt_compilation(self.PATTERN, dict(pattern_kwargs), rubrics, rubric_keys)
+        assert len(cache) == 2
+
+    @pytest.mark.parametrize("mode", [OutputMode.DEFAULT, OutputMode.SCORE, OutputMode.EXPLAINED_SCORE])
+    def test_resolve_instructions_matches_uncached(self, mode):
+        cache = undertest.TemplateCache()
+        instructions, overrides = ["First instruction.", "Second instruction."], {0: "Updated first instruction."}
+
+        actual = cache.resolve_instructions(instructions, overrides, OutputMode.SCORE, mode)
+        cache.resolve_instructions(instructions, overrides, OutputMode.SCORE, mode)
+
+        assert actual == undertest.resolve_instructions(instructions, overrides, OutputMode.SCORE, mode)
+        assert (cache.misses, cache.hits) == (1, 1)
+
+    def test_clear_recompiles(self):
+        cache = undertest.TemplateCache()
+        first = cache.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, self.RUBRICS)
+
+        cache.clear()
+        second = cache.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, self.RUBRICS)
+
+        assert first == second
+        assert (cache.misses, cache.hits) == (2, 0)
+        assert len(cache) == 1
+
+    def test_rendering_rows_per_second(self):
+        """Micro-benchmark of rendering a rubric-sized prompt per row, run with -s to see the rates."""
+        rubrics = {f"criterion_{i}": f"<criterion_{i}>\n" + "Score 1 to 5 on this criterion. " * 40 for i in range(10)}
+        instructions = [f"Instruction {i}." for i in range(20)]
+        rows = [{"clinical_data": f"Note {i}: " + "vitals stable, labs reviewed. " * 50} for i in range(2000)]
+        cache = undertest.TemplateCache()
+
+        def uncached(row):
+            pattern = undertest.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, rubrics)
+            instruction_set = undertest.resolve_instructions(instructions, {}, OutputMode.SCORE)
+            return pattern.format(instruction_set=instruction_set, **row)
+
+        def cached(row):
+            pattern = cache.prompt_compilation(self.PATTERN, {"OUTPUT_TEXT": "summary"}, rubrics)
+            instruction_set = cache.resolve_instructions(instructions, {}, OutputMode.SCORE)
+            return pattern.format(instruction_set=instruction_set, **row)
+
+        rates = {}
+        for name, render in (("uncached", uncached), ("cached", cached)):
+            start = time.perf_counter()
+            rendered = [render(row) for row in rows]
+            rates[name] = len(rows) / (time.perf_counter() - start)
+            rates[f"{name}_output"] = rendered
+
+        print(f"Prompt rendering: {rates['uncached']:,.0f} rows/s uncached, {rates['cached']:,.0f} rows/s cached")
+
+        assert rates["cached_output"] == rates["uncached_output"]
+        assert cache.misses == 2
+
+
 @pytest.mark.parametrize('default',[
     (OutputMode.SCORE),
     (OutputMode.EXPLAINED_SCORE),